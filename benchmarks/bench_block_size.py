@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+# ############################################################################
+# This benchmark measures the upload throughput of a MultipartEncoder sent
+# directly (read by httplib 8192 bytes at a time) and sent through
+# MultipartEncoder.iter_chunks with different block sizes, against a local
+# server.
+#
+# Run it with:
+#
+#     python benchmarks/bench_block_size.py [size in MiB]
+# ############################################################################
+
+import os
+import sys
+import tempfile
+import time
+
+import requests
+
+from requests_toolbelt import MultipartEncoder
+
+import localserver
+
+BLOCK_SIZES = [64 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024]
+
+
+def upload(url, fd, size, block_size=None):
+    fd.seek(0)
+    encoder = MultipartEncoder({'file': ('file.bin', fd)})
+    data = encoder if block_size is None else encoder.iter_chunks(block_size)
+    with requests.Session() as session:
+        start = time.time()
+        session.post(url, data=data,
+                     headers={'Content-Type': encoder.content_type})
+        return time.time() - start
+
+
+def main():
+    size = (int(sys.argv[1]) if len(sys.argv) > 1 else 512) * 1024 * 1024
+    url, server = localserver.start()
+
+    with tempfile.TemporaryFile() as fd:
+        block = os.urandom(1024 * 1024)
+        for _ in range(size // len(block)):
+            fd.write(block)
+        fd.flush()
+
+        upload(url, fd, size)  # warm the page cache
+        print('{:>20} {:>10}'.format('body', 'MB/s'))
+        elapsed = upload(url, fd, size)
+        print('{:>20} {:>10.1f}'.format('encoder', size / elapsed / 1e6))
+        for block_size in BLOCK_SIZES:
+            elapsed = upload(url, fd, size, block_size)
+            print('{:>20} {:>10.1f}'.format(
+                'iter_chunks({})'.format(block_size), size / elapsed / 1e6))
+
+    server.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+# ############################################################################
+# This benchmark compares the chunk-deque ChunkBuffer used by the
+# MultipartEncoder and StreamingIterator with the CustomBytesIO buffer they
+# used previously. A producer appends 16 KiB chunks and a consumer reads them
+# back at the read sizes used by http.client (8 KiB) and by larger readers.
+#
+# Run it with:
+#
+#     python benchmarks/bench_buffer.py
+# ############################################################################
+
+import timeit
+
+from requests_toolbelt.multipart.encoder import (
+    ChunkBuffer, CustomBytesIO, total_len
+)
+
+TOTAL = 64 * 1024 * 1024
+PRODUCER_CHUNK = b'a' * 16 * 1024
+READ_SIZES = [8 * 1024, 64 * 1024, 1024 * 1024]
+
+
+def drain_custom_bytes_io(read_size):
+    buffer = CustomBytesIO()
+    produced = 0
+    while True:
+        buffer.smart_truncate()
+        while total_len(buffer) < read_size and produced < TOTAL:
+            produced += buffer.append(PRODUCER_CHUNK)
+        if not buffer.read(read_size):
+            break
+
+
+def drain_chunk_buffer(read_size):
+    buffer = ChunkBuffer()
+    produced = 0
+    while True:
+        while buffer.len < read_size and produced < TOTAL:
+            produced += buffer.append(PRODUCER_CHUNK)
+        if not buffer.read(read_size):
+            break
+
+
+def main():
+    print('{:>10} {:>16} {:>16} {:>8}'.format(
+        'read size', 'CustomBytesIO', 'ChunkBuffer', 'speedup'))
+    for read_size in READ_SIZES:
+        old = min(timeit.repeat(
+            lambda: drain_custom_bytes_io(read_size), number=1, repeat=3))
+        new = min(timeit.repeat(
+            lambda: drain_chunk_buffer(read_size), number=1, repeat=3))
+        print('{:>10} {:>13.1f}MB/s {:>13.1f}MB/s {:>7.2f}x'.format(
+            read_size, TOTAL / old / 1e6, TOTAL / new / 1e6, old / new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+# ############################################################################
+# This benchmark compares the email-based header parser of the multipart
+# decoder with the fast parser that handles the common header blocks, on the
+# header blocks of a form part, of a batch sub-response and of a folded
+# header, then decodes a body with many small parts.
+#
+# Run it with:
+#
+#     python benchmarks/bench_header_parser.py
+# ############################################################################
+
+import timeit
+
+from requests.structures import CaseInsensitiveDict
+
+from requests_toolbelt import MultipartEncoder
+from requests_toolbelt.multipart import decoder
+
+BLOCKS = [
+    ('form field', b'Content-Disposition: form-data; name="field"'),
+    ('batch part', b'Content-Type: application/http\r\n'
+                   b'Content-ID: <response-item1>\r\n'
+                   b'Content-Transfer-Encoding: binary'),
+    ('folded', b'Content-Type: multipart/related;\r\n'
+               b' boundary="xyz";\r\n type="text/html"'),
+]
+NUMBER = 20000
+PARTS = 20000
+
+
+def email_parser(block, encoding='utf-8'):
+    return CaseInsensitiveDict(decoder._header_parser(block, encoding))
+
+
+def fast_parser(block, encoding='utf-8'):
+    return decoder._parse_headers(block, encoding)
+
+
+def main():
+    print('{:>12} {:>14} {:>14} {:>8}'.format(
+        'block', 'email us/block', 'fast us/block', 'speedup'))
+    for name, block in BLOCKS:
+        assert email_parser(block) == fast_parser(block)
+        slow = min(timeit.repeat(lambda: email_parser(block),
+                                 number=NUMBER, repeat=3))
+        fast = min(timeit.repeat(lambda: fast_parser(block),
+                                 number=NUMBER, repeat=3))
+        print('{:>12} {:>14.2f} {:>14.2f} {:>7.1f}x'.format(
+            name, slow * 1e6 / NUMBER, fast * 1e6 / NUMBER, slow / fast))
+
+    encoder = MultipartEncoder(
+        [('field{}'.format(i), 'value') for i in range(PARTS)])
+    body, content_type = encoder.to_string(), encoder.content_type
+    timings = {}
+    for name, fast in [('email', lambda block, encoding: None),
+                       ('fast', decoder._fast_header_parser)]:
+        original = decoder._fast_header_parser
+        # Without the fast parser, every block goes to the email parser
+        decoder._fast_header_parser = fast
+        try:
+            timings[name] = min(timeit.repeat(
+                lambda: decoder.MultipartDecoder(body, content_type),
+                number=1, repeat=3))
+        finally:
+            decoder._fast_header_parser = original
+    print('\nDecoding {} parts: email {:.3f}s, fast {:.3f}s ({:.1f}x)'.format(
+        PARTS, timings['email'], timings['fast'],
+        timings['email'] / timings['fast']))
+
+
+if __name__ == '__main__':
+    main()
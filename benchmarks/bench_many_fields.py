@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+# ############################################################################
+# This benchmark encodes forms made of many small string fields with the
+# MultipartEncoder and with urllib3's encode_multipart_formdata. It reports
+# the time spent creating the encoder and the time spent reading the whole
+# body with to_string() separately.
+#
+# Run it with:
+#
+#     python benchmarks/bench_many_fields.py
+# ############################################################################
+
+import timeit
+
+from requests_toolbelt import MultipartEncoder
+from requests_toolbelt._compat import filepost
+
+BOUNDARY = 'this-is-a-boundary'
+FIELD_COUNTS = [10000, 100000]
+
+
+def make_fields(count):
+    return [('field{}'.format(i), 'value {}'.format(i)) for i in range(count)]
+
+
+def best_of(function, repeat=3):
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def main():
+    print('{:>8} {:>12} {:>12} {:>12} {:>12}'.format(
+        'fields', 'construct', 'to_string', 'total', 'urllib3'))
+    for count in FIELD_COUNTS:
+        fields = make_fields(count)
+        encoders = []
+
+        construct = best_of(
+            lambda: encoders.append(MultipartEncoder(fields, BOUNDARY)))
+        to_string = best_of(lambda: encoders.pop().to_string())
+        urllib3 = best_of(
+            lambda: filepost.encode_multipart_formdata(fields, BOUNDARY))
+
+        assert (MultipartEncoder(fields, BOUNDARY).to_string() ==
+                filepost.encode_multipart_formdata(fields, BOUNDARY)[0])
+        print('{:>8} {:>11.3f}s {:>11.3f}s {:>11.3f}s {:>11.3f}s'.format(
+            count, construct, to_string, construct + to_string, urllib3))
+
+
+if __name__ == '__main__':
+    main()
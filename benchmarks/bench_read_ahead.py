@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+# ############################################################################
+# This benchmark relays a file from a simulated download to a simulated
+# upload through a FileFromURLWrapper, with and without read-ahead. Both
+# links are throttled by sleeping, so without read-ahead the relay takes
+# about the sum of the download and upload times, and with read-ahead about
+# the time of the slower link.
+#
+# Run it with:
+#
+#     python benchmarks/bench_read_ahead.py
+# ############################################################################
+
+import time
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from requests_toolbelt.multipart.encoder import FileFromURLWrapper
+
+TOTAL = 8 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# Speed of the simulated links in bytes per second
+DOWNLOAD_SPEED = 16 * 1024 * 1024
+UPLOAD_SPEED = 12 * 1024 * 1024
+READ_AHEADS = [0, 1, 4, 16]
+
+
+class ThrottledRaw(object):
+    """A response body that is downloaded at DOWNLOAD_SPEED."""
+
+    def __init__(self):
+        self.left = TOTAL
+
+    def read(self, size):
+        size = min(size, self.left)
+        time.sleep(size / float(DOWNLOAD_SPEED))
+        self.left -= size
+        return b'a' * size
+
+    def close(self):
+        pass
+
+
+def relay(read_ahead):
+    response = mock.Mock(headers={'content-length': str(TOTAL)},
+                         raw=ThrottledRaw())
+    session = mock.Mock(**{'get.return_value': response})
+    wrapper = FileFromURLWrapper('http://example.com/file', session,
+                                 read_ahead=read_ahead, chunk_size=CHUNK_SIZE)
+    start = time.time()
+    while wrapper.len:
+        chunk = wrapper.read(CHUNK_SIZE)
+        # Upload the chunk
+        time.sleep(len(chunk) / float(UPLOAD_SPEED))
+    return time.time() - start
+
+
+def main():
+    download = TOTAL / float(DOWNLOAD_SPEED)
+    upload = TOTAL / float(UPLOAD_SPEED)
+    print('download alone: {:.2f}s, upload alone: {:.2f}s'.format(
+        download, upload))
+    print('{:>10} {:>8}'.format('read-ahead', 'relay'))
+    for read_ahead in READ_AHEADS:
+        print('{:>10} {:>7.2f}s'.format(read_ahead, relay(read_ahead)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+# ############################################################################
+# This benchmark compares the client CPU time spent uploading a file part of a
+# MultipartEncoder with the default HTTPAdapter and with the SendfileAdapter.
+# The server runs in a separate process and discards the body, so the CPU
+# time reported is the client's alone.
+#
+# Run it with:
+#
+#     python benchmarks/bench_sendfile.py [size in MiB]
+# ############################################################################
+
+import os
+import sys
+import tempfile
+import time
+
+import requests
+
+from requests_toolbelt import MultipartEncoder
+from requests_toolbelt.adapters.sendfile import SendfileAdapter
+
+import localserver
+
+
+def upload(session, url, fd):
+    fd.seek(0)
+    encoder = MultipartEncoder({'file': ('file.bin', fd)})
+    cpu = time.process_time()
+    wall = time.time()
+    session.post(url, data=encoder,
+                 headers={'Content-Type': encoder.content_type})
+    return time.process_time() - cpu, time.time() - wall
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    url, server = localserver.start()
+
+    with tempfile.TemporaryFile() as fd:
+        block = os.urandom(1024 * 1024)
+        for _ in range(size):
+            fd.write(block)
+        fd.flush()
+
+        print('{:>16} {:>14} {:>10}'.format('adapter', 'CPU s/GiB', 'MB/s'))
+        for name, session in [('HTTPAdapter', requests.Session()),
+                              ('SendfileAdapter', requests.Session())]:
+            if name == 'SendfileAdapter':
+                session.mount('http://', SendfileAdapter())
+            upload(session, url, fd)  # warm the page cache and connection
+            cpu, wall = upload(session, url, fd)
+            # The server handles one connection at a time
+            session.close()
+            print('{:>16} {:>14.3f} {:>10.1f}'.format(
+                name, cpu * 1024 / size, size * 1.048576 / wall))
+
+    server.terminate()
+
+
+if __name__ == '__main__':
+    main()
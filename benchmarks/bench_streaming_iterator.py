@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+# ############################################################################
+# This benchmark compares reading a StreamingIterator with the previous
+# _IteratorAsBinaryFile, which always went through its ChunkBuffer, and with
+# the current one, which passes chunks of the requested size through and can
+# read into a caller-provided buffer. A producer yields 64 KiB chunks and a
+# consumer reads them at the size of the chunks, at httplib's 8 KiB and in
+# 1 MiB blocks.
+#
+# Run it with:
+#
+#     python benchmarks/bench_streaming_iterator.py
+# ############################################################################
+
+import itertools
+import timeit
+
+from requests_toolbelt.multipart.encoder import ChunkBuffer, encode_with
+from requests_toolbelt.streaming_iterator import _IteratorAsBinaryFile
+
+TOTAL = 256 * 1024 * 1024
+PRODUCER_CHUNK = b'a' * 64 * 1024
+READ_SIZES = [64 * 1024, 8 * 1024, 1024 * 1024]
+
+
+class PreviousIteratorAsBinaryFile(object):
+    """The _IteratorAsBinaryFile before the passthrough and readinto."""
+
+    def __init__(self, iterator, encoding='utf-8'):
+        self.iterator = iterator
+        self.encoding = encoding
+        self._buffer = ChunkBuffer()
+
+    def _get_bytes(self):
+        try:
+            return encode_with(next(self.iterator), self.encoding)
+        except StopIteration:
+            return b''
+
+    def _load_bytes(self, size):
+        amount_to_load = size - self._buffer.len
+        bytes_to_append = True
+
+        while amount_to_load > 0 and bytes_to_append:
+            bytes_to_append = self._get_bytes()
+            amount_to_load -= self._buffer.append(bytes_to_append)
+
+    def read(self, size=-1):
+        size = int(size)
+        if size == -1:
+            return b''.join(self.iterator)
+
+        self._load_bytes(size)
+        return self._buffer.read(size)
+
+
+def chunks():
+    return itertools.repeat(PRODUCER_CHUNK, TOTAL // len(PRODUCER_CHUNK))
+
+
+def drain_read(cls, read_size):
+    reader = cls(chunks())
+    while reader.read(read_size):
+        pass
+
+
+def drain_readinto(read_size):
+    reader = _IteratorAsBinaryFile(chunks())
+    buffer = bytearray(read_size)
+    while reader.readinto(buffer):
+        pass
+
+
+def best(function, *args):
+    return min(timeit.repeat(lambda: function(*args), number=1, repeat=3))
+
+
+def main():
+    print('{:>10} {:>14} {:>14} {:>14} {:>12}'.format(
+        'read size', 'previous', 'read', 'readinto', 'read speedup'))
+    for read_size in READ_SIZES:
+        old = best(drain_read, PreviousIteratorAsBinaryFile, read_size)
+        new = best(drain_read, _IteratorAsBinaryFile, read_size)
+        into = best(drain_readinto, read_size)
+        row = '{:>10} {:>10.0f}MB/s {:>10.0f}MB/s {:>10.0f}MB/s {:>11.2f}x'
+        print(row.format(read_size, TOTAL / old / 1e6, TOTAL / new / 1e6,
+                         TOTAL / into / 1e6, old / new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+# ############################################################################
+# This benchmark counts the file-related system calls (fstat, lseek and
+# read) made per MiB of body while a MultipartEncoder is read 8192 bytes at
+# a time, as httplib does. The file is opened through a FileIO subclass that
+# counts its calls, and os.fstat is wrapped to count the size lookups.
+#
+# Run it with:
+#
+#     python benchmarks/bench_syscalls.py [size in MiB]
+# ############################################################################
+
+import collections
+import io
+import os
+import sys
+import tempfile
+
+from requests_toolbelt import MultipartEncoder
+
+counts = collections.Counter()
+
+
+class CountingFileIO(io.FileIO):
+    def readinto(self, buffer):
+        counts['read'] += 1
+        return super(CountingFileIO, self).readinto(buffer)
+
+    def read(self, size=-1):
+        counts['read'] += 1
+        return super(CountingFileIO, self).read(size)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        counts['lseek'] += 1
+        return super(CountingFileIO, self).seek(offset, whence)
+
+    def tell(self):
+        counts['lseek'] += 1
+        return super(CountingFileIO, self).tell()
+
+
+def counting_fstat(fstat):
+    def wrapper(fd):
+        counts['fstat'] += 1
+        return fstat(fd)
+    return wrapper
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    with tempfile.NamedTemporaryFile() as tmp:
+        block = os.urandom(1024 * 1024)
+        for _ in range(size):
+            tmp.write(block)
+        tmp.flush()
+
+        fd = io.BufferedReader(CountingFileIO(tmp.name))
+        fstat = os.fstat
+        os.fstat = counting_fstat(fstat)
+        try:
+            encoder = MultipartEncoder({'file': ('file.bin', fd)})
+            while encoder.read(8192):
+                pass
+        finally:
+            os.fstat = fstat
+            fd.close()
+
+    print('{:>8} {:>12}'.format('syscall', 'calls/MiB'))
+    for name in ('fstat', 'lseek', 'read'):
+        print('{:>8} {:>12.1f}'.format(name, counts[name] / float(size)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+# ############################################################################
+# A local HTTP server used by the benchmarks. It reads and discards request
+# bodies and answers 204 No Content, and answers GET requests with the
+# bodies registered in its ``bodies`` dictionary. It runs either in a
+# separate process (start) or in a thread of the benchmark (start_thread).
+# ############################################################################
+
+import multiprocessing
+import socket
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+class DiscardHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # The headers and the body are written separately, Nagle's algorithm
+    # would hold the body back until the headers are acknowledged
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        while length > 0:
+            length -= len(self.rfile.read(min(length, 1024 * 1024)))
+        self.send_response(204)
+        self.end_headers()
+
+    do_PUT = do_PATCH = do_POST
+
+    def do_GET(self):
+        bodies = getattr(self.server, 'bodies', {})
+        if self.path not in bodies:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        content_type, body = bodies[self.path]
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def _serve(port):
+    HTTPServer(('127.0.0.1', port), DiscardHandler).serve_forever()
+
+
+def _free_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def start():
+    """Start the server and return its URL and process.
+
+    The server handles one connection at a time, so close your session once
+    you are done with it.
+    """
+    port = _free_port()
+    process = multiprocessing.Process(target=_serve, args=(port,))
+    process.daemon = True
+    process.start()
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port)).close()
+            break
+        except socket.error:
+            time.sleep(0.05)
+    return 'http://127.0.0.1:{}/'.format(port), process
+
+
+def start_thread():
+    """Start the server in a daemon thread and return its URL and server.
+
+    Register bodies to download with ``server.bodies[path] = (content_type,
+    body)`` and stop the server with ``server.shutdown()``.
+    """
+    server = ThreadingServer(('127.0.0.1', 0), DiscardHandler)
+    server.bodies = {}
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return 'http://127.0.0.1:{}/'.format(server.server_port), server
@@ -0,0 +1,488 @@
+# -*- coding: utf-8 -*-
+
+# ############################################################################
+# A reproducible benchmark suite for the multipart encoder, the multipart
+# decoder and the StreamingIterator. Every scenario is run offline, uploads
+# and downloads going to a server running in a thread of this process (see
+# localserver.py), and reports:
+#
+# - the best wall time of a few runs and the matching throughput,
+# - the peak memory allocated while it runs, measured with tracemalloc,
+# - the system calls it makes: reads, seeks and fstat calls on the files of
+#   file parts, and send/recv calls on sockets.
+#
+# Memory and system calls are measured in a separate, instrumented run so
+# that they do not slow down the timed runs.
+#
+# The results are written as JSON so that two commits can be compared:
+#
+#     python benchmarks/suite.py --output before.json
+#     git checkout other-branch
+#     python benchmarks/suite.py --output after.json
+#     python benchmarks/suite.py --compare before.json after.json
+#
+# Use --quick for a smaller grid and --filter to run some benchmarks only,
+# e.g., --filter decode.
+# ############################################################################
+
+import argparse
+import collections
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import requests
+
+import requests_toolbelt
+from requests_toolbelt import MultipartEncoder, StreamingIterator
+from requests_toolbelt.multipart.decoder import (
+    MultipartDecoder, StreamingMultipartDecoder
+)
+
+import localserver
+
+KiB = 1024
+MiB = 1024 * KiB
+BOUNDARY = 'this-is-a-benchmark-boundary'
+
+PART_COUNTS = [1, 16, 256]
+PART_SIZES = [1 * KiB, 64 * KiB, 1 * MiB]
+READ_SIZES = [8 * KiB, 64 * KiB, 1 * MiB]
+SOURCES = ['bytes', 'file']
+
+QUICK_PART_COUNTS = [1, 16]
+QUICK_PART_SIZES = [1 * KiB, 1 * MiB]
+QUICK_READ_SIZES = [8 * KiB, 1 * MiB]
+
+syscalls = collections.Counter()
+
+
+class CountingFileIO(io.FileIO):
+    """A file that counts its read and seek system calls."""
+
+    counting = False
+
+    def readinto(self, buffer):
+        if self.counting:
+            syscalls['file_read'] += 1
+        return super(CountingFileIO, self).readinto(buffer)
+
+    def read(self, size=-1):
+        if self.counting:
+            syscalls['file_read'] += 1
+        return super(CountingFileIO, self).read(size)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if self.counting:
+            syscalls['file_lseek'] += 1
+        return super(CountingFileIO, self).seek(offset, whence)
+
+    def tell(self):
+        if self.counting:
+            syscalls['file_lseek'] += 1
+        return super(CountingFileIO, self).tell()
+
+
+def _counting(name, function, thread):
+    def wrapper(*args, **kwargs):
+        # The server runs in other threads of this process
+        if threading.current_thread() is thread:
+            syscalls[name] += 1
+        return function(*args, **kwargs)
+    return wrapper
+
+
+@contextlib.contextmanager
+def count_syscalls():
+    """Count the system calls made by the current thread."""
+    thread = threading.current_thread()
+    patched = [(os, 'fstat', 'file_fstat')] + [
+        (socket.socket, method, 'socket_' + method)
+        for method in ('send', 'sendall', 'recv', 'recv_into')
+    ]
+    # Methods inherited from _socket.socket are restored by deleting the
+    # wrappers set on the subclass
+    originals = [(owner, attribute, owner.__dict__.get(attribute))
+                 for owner, attribute, _ in patched]
+    for owner, attribute, name in patched:
+        setattr(owner, attribute,
+                _counting(name, getattr(owner, attribute), thread))
+    CountingFileIO.counting = True
+    syscalls.clear()
+    try:
+        yield syscalls
+    finally:
+        CountingFileIO.counting = False
+        for owner, attribute, original in originals:
+            if original is None:
+                delattr(owner, attribute)
+            else:
+                setattr(owner, attribute, original)
+
+
+class Scenario(object):
+    """One point of the benchmark grid."""
+
+    def __init__(self, benchmark, parts, part_size, read_size=None,
+                 source='bytes'):
+        self.benchmark = benchmark
+        self.parts = parts
+        self.part_size = part_size
+        self.read_size = read_size
+        self.source = source
+
+    @property
+    def key(self):
+        return '{}/{}/parts={}/part_size={}/read_size={}'.format(
+            self.benchmark, self.source, self.parts, self.part_size,
+            self.read_size)
+
+    @property
+    def size(self):
+        return self.parts * self.part_size
+
+
+class Fixtures(object):
+    """Data shared by the scenarios: part bodies, files and the server."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.url, self.server = localserver.start_thread()
+        self.session = requests.Session()
+        self._paths = {}
+        self._bodies = {}
+        self._encoded = {}
+
+    def close(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def body(self, size):
+        if size not in self._bodies:
+            # A random block repeated, to keep the fixtures cheap to build
+            block = os.urandom(min(size, 64 * KiB))
+            self._bodies[size] = (block * (size // len(block) + 1))[:size]
+        return self._bodies[size]
+
+    def path(self, size):
+        if size not in self._paths:
+            path = os.path.join(self.directory, '{}.bin'.format(size))
+            with open(path, 'wb') as fd:
+                fd.write(self.body(size))
+            self._paths[size] = path
+        return self._paths[size]
+
+    @contextlib.contextmanager
+    def fields(self, scenario):
+        """The fields of an encoder for the scenario."""
+        files = []
+        try:
+            fields = []
+            for i in range(scenario.parts):
+                name = 'part{}'.format(i)
+                if scenario.source == 'file':
+                    fd = io.BufferedReader(
+                        CountingFileIO(self.path(scenario.part_size)))
+                    files.append(fd)
+                    fields.append((name, (name + '.bin', fd)))
+                else:
+                    fields.append((name, (name + '.bin',
+                                          self.body(scenario.part_size))))
+            yield fields
+        finally:
+            for fd in files:
+                fd.close()
+
+    def encoded(self, scenario):
+        """The encoded body and content type of the scenario's parts."""
+        key = (scenario.parts, scenario.part_size)
+        if key not in self._encoded:
+            encoder = MultipartEncoder(
+                [('part{}'.format(i), self.body(scenario.part_size))
+                 for i in range(scenario.parts)], boundary=BOUNDARY)
+            self._encoded[key] = encoder.to_string(), encoder.content_type
+        return self._encoded[key]
+
+    def encoded_path(self, scenario):
+        """The path of a file holding the scenario's encoded body."""
+        body, content_type = self.encoded(scenario)
+        path = os.path.join(self.directory, 'encoded-{}-{}.bin'.format(
+            scenario.parts, scenario.part_size))
+        if not os.path.exists(path):
+            with open(path, 'wb') as fd:
+                fd.write(body)
+        return path, content_type
+
+
+def bench_encode(fixtures, scenario):
+    with fixtures.fields(scenario) as fields:
+        encoder = MultipartEncoder(fields, boundary=BOUNDARY)
+        while encoder.read(scenario.read_size):
+            pass
+
+
+def bench_upload(fixtures, scenario):
+    with fixtures.fields(scenario) as fields:
+        encoder = MultipartEncoder(fields, boundary=BOUNDARY)
+        response = fixtures.session.post(
+            fixtures.url, data=encoder,
+            headers={'Content-Type': encoder.content_type})
+        response.raise_for_status()
+
+
+def bench_decode(fixtures, scenario):
+    body, content_type = fixtures.encoded(scenario)
+    decoder = MultipartDecoder(body, content_type)
+    assert len(decoder.parts) == scenario.parts
+
+
+def bench_decode_zero_copy(fixtures, scenario):
+    body, content_type = fixtures.encoded(scenario)
+    decoder = MultipartDecoder(body, content_type, zero_copy=True)
+    assert len(decoder.parts) == scenario.parts
+
+
+def bench_decode_lazy_get(fixtures, scenario):
+    body, content_type = fixtures.encoded(scenario)
+    decoder = MultipartDecoder(body, content_type, lazy=True)
+    name = 'part{}'.format(scenario.parts - 1)
+    assert len(decoder.get(name).content_view) == scenario.part_size
+
+
+def bench_decode_file(fixtures, scenario):
+    path, content_type = fixtures.encoded_path(scenario)
+    decoder = MultipartDecoder.from_file(path, content_type)
+    assert len(decoder.parts) == scenario.parts
+
+
+def download_url(fixtures, scenario):
+    path = '/' + scenario.key
+    if path not in fixtures.server.bodies:
+        body, content_type = fixtures.encoded(scenario)
+        fixtures.server.bodies[path] = (content_type, body)
+    return fixtures.url.rstrip('/') + path
+
+
+def bench_download_decode(fixtures, scenario):
+    response = fixtures.session.get(download_url(fixtures, scenario))
+    decoder = MultipartDecoder.from_response(response)
+    assert len(decoder.parts) == scenario.parts
+
+
+def bench_stream_decode(fixtures, scenario):
+    response = fixtures.session.get(download_url(fixtures, scenario),
+                                    stream=True)
+    decoder = StreamingMultipartDecoder.from_response(response)
+    parts = 0
+    for part in decoder:
+        for _ in part.iter_content():
+            pass
+        parts += 1
+    assert parts == scenario.parts
+
+
+def bench_stream_decode_spool(fixtures, scenario):
+    response = fixtures.session.get(download_url(fixtures, scenario),
+                                    stream=True)
+    decoder = StreamingMultipartDecoder.from_response(
+        response, spool=True, spool_max_size=256 * KiB)
+    parts = list(decoder)
+    assert len(parts) == scenario.parts
+    for part in parts:
+        part.stream.close()
+
+
+def bench_streaming_iterator(fixtures, scenario):
+    chunk = fixtures.body(scenario.part_size)
+    iterator = StreamingIterator(scenario.size,
+                                 itertools.repeat(chunk, scenario.parts))
+    while iterator.read(scenario.read_size):
+        pass
+
+
+BENCHMARKS = collections.OrderedDict([
+    ('encode', bench_encode),
+    ('upload', bench_upload),
+    ('decode', bench_decode),
+    ('decode_zero_copy', bench_decode_zero_copy),
+    ('decode_lazy_get', bench_decode_lazy_get),
+    ('decode_file', bench_decode_file),
+    ('download_decode', bench_download_decode),
+    ('stream_decode', bench_stream_decode),
+    ('stream_decode_spool', bench_stream_decode_spool),
+    ('streaming_iterator', bench_streaming_iterator),
+])
+
+
+def scenarios(quick=False, max_size=64 * MiB):
+    """Generate the grid of scenarios, without those larger than max_size."""
+    counts = QUICK_PART_COUNTS if quick else PART_COUNTS
+    sizes = QUICK_PART_SIZES if quick else PART_SIZES
+    reads = QUICK_READ_SIZES if quick else READ_SIZES
+    for parts, part_size in itertools.product(counts, sizes):
+        if parts * part_size > max_size:
+            continue
+        for source in SOURCES:
+            for read_size in reads:
+                yield Scenario('encode', parts, part_size, read_size, source)
+            # httplib reads the body 8192 bytes at a time
+            yield Scenario('upload', parts, part_size, 8 * KiB, source)
+        yield Scenario('decode', parts, part_size)
+        yield Scenario('decode_zero_copy', parts, part_size)
+        yield Scenario('decode_lazy_get', parts, part_size)
+        yield Scenario('decode_file', parts, part_size)
+        yield Scenario('download_decode', parts, part_size)
+        yield Scenario('stream_decode', parts, part_size)
+        yield Scenario('stream_decode_spool', parts, part_size)
+        for read_size in reads:
+            yield Scenario('streaming_iterator', parts, part_size, read_size)
+
+
+def run(fixtures, scenario, repeat):
+    """Run a scenario and return its results."""
+    function = BENCHMARKS[scenario.benchmark]
+
+    def timed():
+        start = time.time()
+        function(fixtures, scenario)
+        return time.time() - start
+
+    timed()  # Warm up caches, connections and lazily built fixtures
+    seconds = min(timed() for _ in range(repeat))
+
+    with count_syscalls() as counts:
+        tracemalloc.start()
+        try:
+            function(fixtures, scenario)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        counts = dict(counts)
+
+    return {
+        'key': scenario.key,
+        'benchmark': scenario.benchmark,
+        'source': scenario.source,
+        'parts': scenario.parts,
+        'part_size': scenario.part_size,
+        'read_size': scenario.read_size,
+        'bytes': scenario.size,
+        'seconds': seconds,
+        'throughput_mib_s': scenario.size / MiB / seconds if seconds else None,
+        'peak_memory': peak,
+        'syscalls': counts,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.STDOUT,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(args):
+    return {
+        'commit': git_commit(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': sys.version,
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'requests': requests.__version__,
+        'requests_toolbelt': requests_toolbelt.__version__,
+        'repeat': args.repeat,
+        'quick': args.quick,
+    }
+
+
+def ratio(after, before):
+    if not before:
+        return '{:>10}'.format('-')
+    return '{:>9.2f}x'.format(after / float(before))
+
+
+def compare(before_path, after_path):
+    """Print the ratios of the results of two runs."""
+    with open(before_path) as fd:
+        before = {r['key']: r for r in json.load(fd)['results']}
+    with open(after_path) as fd:
+        after = json.load(fd)['results']
+
+    print('{:<70} {:>10} {:>10} {:>10}'.format(
+        'scenario', 'time', 'memory', 'syscalls'))
+    for result in after:
+        old = before.get(result['key'])
+        if old is None:
+            continue
+        print('{:<70} {} {} {}'.format(
+            result['key'],
+            ratio(result['seconds'], old['seconds']),
+            ratio(result['peak_memory'], old['peak_memory']),
+            ratio(sum(result['syscalls'].values()),
+                  sum(old['syscalls'].values())),
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', default='benchmark-results.json',
+                        help='path of the JSON results')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of timed runs of each scenario')
+    parser.add_argument('--quick', action='store_true',
+                        help='run a smaller grid of scenarios')
+    parser.add_argument('--max-size', type=int, default=64,
+                        help='skip scenarios larger than this many MiB')
+    parser.add_argument('--filter', default='',
+                        help='only run scenarios whose key contains this')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='compare two JSON results instead of running')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    directory = tempfile.mkdtemp()
+    fixtures = Fixtures(directory)
+    results = []
+    try:
+        print('{:<70} {:>10} {:>12} {:>10}'.format(
+            'scenario', 'MiB/s', 'peak KiB', 'syscalls'))
+        for scenario in scenarios(args.quick, args.max_size * MiB):
+            if args.filter not in scenario.key:
+                continue
+            result = run(fixtures, scenario, args.repeat)
+            results.append(result)
+            print('{:<70} {:>10.1f} {:>12.1f} {:>10}'.format(
+                scenario.key, result['throughput_mib_s'],
+                result['peak_memory'] / float(KiB),
+                sum(result['syscalls'].values())))
+    finally:
+        fixtures.close()
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+    with open(args.output, 'w') as fd:
+        json.dump({'metadata': metadata(args), 'results': results}, fd,
+                  indent=2, sort_keys=True)
+    print('Wrote {} results to {}'.format(len(results), args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -13,10 +13,12 @@ import sys
 import requests
 
 try:
+    from requests.packages.urllib3 import connectionpool
     from requests.packages.urllib3 import fields
     from requests.packages.urllib3 import filepost
     from requests.packages.urllib3 import poolmanager
 except ImportError:
+    from urllib3 import connectionpool
     from urllib3 import fields
     from urllib3 import filepost
     from urllib3 import poolmanager
@@ -58,6 +60,12 @@ try:
 except NameError:
     basestring = (str, bytes)
 
+try:
+    from os import PathLike
+except ImportError:
+    # Nothing is an instance of an empty tuple of classes
+    PathLike = ()
+
 
 class HTTPHeaderDict(MutableMapping):
     """
@@ -289,8 +297,10 @@ class HTTPHeaderDict(MutableMapping):
 
 
 __all__ = (
+    'PathLike',
     'basestring',
     'connection',
+    'connectionpool',
     'fields',
     'filepost',
     'poolmanager',
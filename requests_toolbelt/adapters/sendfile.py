@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+requests_toolbelt.adapters.sendfile
+===================================
+
+This file contains an implementation of the SendfileAdapter.
+"""
+import io
+import os
+import socket
+
+from requests.adapters import HTTPAdapter
+
+from .._compat import connection, connectionpool
+from ..multipart.encoder import FileWrapper, MultipartEncoder
+
+try:
+    import ssl
+except ImportError:  # pragma: no cover
+    ssl = None
+
+
+def _supports_sendfile(sock):
+    """Determine whether file bodies can be sent with ``sendfile``."""
+    if not hasattr(os, 'sendfile') or not hasattr(sock, 'sendfile'):
+        return False
+    if ssl is not None and isinstance(sock, ssl.SSLSocket):
+        return False
+    return isinstance(sock, socket.socket)
+
+
+def _is_binary_file(fd):
+    try:
+        fd.fileno()
+    except (AttributeError, TypeError, ValueError, io.UnsupportedOperation):
+        return False
+    return 'b' in getattr(fd, 'mode', 'b')
+
+
+class SendfileHTTPConnection(connection.HTTPConnection):
+    """An HTTPConnection that sends MultipartEncoder file parts with sendfile.
+
+    The request line and headers are sent as usual. The body is then sent by
+    this connection: boundaries, part headers and in-memory parts are sent
+    in blocks of :attr:`block_size` bytes, while part bodies that are real
+    files are handed to :meth:`socket.socket.sendfile` so that the kernel
+    copies them directly from the page cache to the socket.
+    """
+
+    #: Size of the blocks used to send everything that is not a file body
+    block_size = 64 * 1024
+
+    def request(self, method, url, body=None, headers=None, *args, **kwargs):
+        if not (isinstance(body, MultipartEncoder) and
+                not kwargs.get('chunked') and
+                _has_content_length(headers)):
+            return super(SendfileHTTPConnection, self).request(
+                method, url, body, headers, *args, **kwargs
+            )
+
+        # Send the request line and headers only, the Content-Length header
+        # is already set by requests.
+        super(SendfileHTTPConnection, self).request(
+            method, url, None, headers, *args, **kwargs
+        )
+        self._send_encoder(body)
+
+    def _send_encoder(self, encoder):
+        use_sendfile = _supports_sendfile(self.sock)
+        for segment in encoder._iter_segments(self.block_size):
+            if not isinstance(segment, FileWrapper):
+                self.send(segment)
+            elif use_sendfile and _is_binary_file(segment.fd):
+                offset = segment.tell()
+                count = segment.len
+                sent = self.sock.sendfile(segment.fd, offset, count)
+                # Keep the wrapper's count of bytes left to read up to date
+                segment.seek(offset + sent)
+                if sent < count:
+                    # The file ended early (e.g., it was truncated), there
+                    # is nothing left to send
+                    segment._consumed(0)
+            else:
+                while segment.len > 0:
+                    chunk = segment.read(self.block_size)
+                    if not chunk:
+                        break
+                    self.send(chunk)
+
+
+def _has_content_length(headers):
+    return any(k.lower() == 'content-length' for k in headers or {})
+
+
+class SendfileHTTPConnectionPool(connectionpool.HTTPConnectionPool):
+    ConnectionCls = SendfileHTTPConnection
+
+
+class SendfileAdapter(HTTPAdapter):
+    """
+    A HTTP Adapter for Python Requests that uploads file parts of a
+    :class:`~requests_toolbelt.multipart.encoder.MultipartEncoder` using
+    ``sendfile``.
+
+    When the body of a request is a ``MultipartEncoder`` sent over a plain
+    HTTP connection, the bodies of parts that wrap a file opened in binary
+    mode never pass through Python: they are sent with
+    :meth:`socket.socket.sendfile`. Every other request, including HTTPS
+    requests, requests sent through a proxy, and bodies wrapped in a
+    :class:`~requests_toolbelt.multipart.encoder.MultipartEncoderMonitor`,
+    uses the regular buffered path.
+
+    Example usage:
+
+    .. code-block:: python
+
+        import requests
+        from requests_toolbelt import MultipartEncoder
+        from requests_toolbelt.adapters.sendfile import SendfileAdapter
+
+        s = requests.Session()
+        s.mount('http://', SendfileAdapter())
+        encoder = MultipartEncoder({'file': open('large.iso', 'rb')})
+        r = s.post('http://example.com/upload', data=encoder,
+                   headers={'Content-Type': encoder.content_type})
+
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(SendfileAdapter, self).init_poolmanager(*args, **kwargs)
+        pool_classes_by_scheme = dict(self.poolmanager.pool_classes_by_scheme)
+        pool_classes_by_scheme['http'] = SendfileHTTPConnectionPool
+        self.poolmanager.pool_classes_by_scheme = pool_classes_by_scheme
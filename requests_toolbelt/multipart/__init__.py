@@ -8,8 +8,10 @@ See https://toolbelt.readthedocs.io/ for documentation
 :license: Apache v2.0, see LICENSE for more details
 """
 
-from .encoder import MultipartEncoder, MultipartEncoderMonitor
-from .decoder import MultipartDecoder
+from .encoder import (
+    MultipartEncoder, MultipartEncoderMonitor, MultipartMixedEncoder
+    )
+from .decoder import MultipartDecoder, StreamingMultipartDecoder
 from .decoder import ImproperBodyPartContentException
 from .decoder import NonMultipartContentTypeException
 
@@ -21,7 +23,9 @@ __copyright__ = 'Copyright 2014 Ian Cordasco, Cory Benfield'
 __all__ = [
     'MultipartEncoder',
     'MultipartEncoderMonitor',
+    'MultipartMixedEncoder',
     'MultipartDecoder',
+    'StreamingMultipartDecoder',
     'ImproperBodyPartContentException',
     'NonMultipartContentTypeException',
     '__title__',
@@ -8,17 +8,73 @@ This holds all the implementation details of the MultipartDecoder
 
 """
 
+import binascii
+import io
+import mmap
+import os
+import re
 import sys
+import tempfile
+import threading
+import zlib
 import email.parser
 from .encoder import encode_with
+from .._compat import PY3, queue
 from requests.structures import CaseInsensitiveDict
 
+#: Default size of the chunks read by :class:`StreamingMultipartDecoder`
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+#: Largest header block of a part :class:`StreamingMultipartDecoder` accepts
+MAX_HEADER_SIZE = 64 * 1024
+
+#: Default size above which spooled parts are written to disk
+DEFAULT_SPOOL_MAX_SIZE = 1024 * 1024
+
+# Header names the email parser accepts: printable ASCII without the colon
+_header_name = re.compile(r'[\041-\071\073-\176]+\Z').match
+
+# The (possibly folded) Content-Disposition header in a header block
+_disposition_header = re.compile(
+    br'^content-disposition:([^\r\n]*(?:\r\n[ \t][^\r\n]*)*)',
+    re.IGNORECASE | re.MULTILINE
+).search
+
+# The name parameter of a Content-Disposition header
+_disposition_name = re.compile(
+    br'(?:^|;)\s*name\s*=\s*(?:"((?:[^"\\]|\\.)*)"|([^;\s]+))', re.IGNORECASE
+).search
+
 
 def _split_on_find(content, bound):
     point = content.find(bound)
     return content[:point], content[point + len(bound):]
 
 
+def _find_boundary(content_type, encoding):
+    """Return the encoded boundary of a multipart ``content_type``.
+
+    :returns: bytes -- the boundary, or ``None`` if there is none
+    :raises NonMultipartContentTypeException: if the media type is not
+        ``multipart``
+    """
+    ct_info = tuple(x.strip() for x in content_type.split(';'))
+    mimetype = ct_info[0]
+    if mimetype.split('/')[0].lower() != 'multipart':
+        raise NonMultipartContentTypeException(
+            "Unexpected mimetype in content-type: '{}'".format(mimetype)
+        )
+    boundary = None
+    for item in ct_info[1:]:
+        attr, value = _split_on_find(
+            item,
+            '='
+        )
+        if attr.lower() == 'boundary':
+            boundary = encode_with(value.strip('"'), encoding)
+    return boundary
+
+
 class ImproperBodyPartContentException(Exception):
     pass
 
@@ -27,6 +83,128 @@ class NonMultipartContentTypeException(Exception):
     pass
 
 
+def _iter_part_offsets(buffer, boundary, start=0, end=None):
+    """Find the parts of the multipart body in ``buffer[start:end]``.
+
+    The buffer is only scanned, nothing is copied out of it.
+
+    :param buffer: an object with a ``find`` method, e.g., ``bytes``,
+        ``bytearray`` or :class:`mmap.mmap`
+    :param bytes boundary: the boundary of the parts
+    :returns: an iterator of ``(start, end)`` offsets of each part, from the
+        end of the boundary preceding it to the start of the next one
+    """
+    if end is None:
+        end = len(buffer)
+    delimiter = b'\r\n--' + boundary
+    if buffer[start:start + len(delimiter) - 2] == delimiter[2:]:
+        # The body starts with the boundary, without the preceding CRLF
+        position = start + len(delimiter) - 2
+    else:
+        position = buffer.find(delimiter, start, end)
+        if position == -1:
+            return
+        position += len(delimiter)
+
+    while buffer[position:position + 2] != b'--':
+        next_delimiter = buffer.find(delimiter, position, end)
+        part_end = end if next_delimiter == -1 else next_delimiter
+        if (part_end - position > 2 or
+                buffer[position:part_end] not in (b'', b'\r\n')):
+            yield position, part_end
+        if next_delimiter == -1:
+            return
+        position = next_delimiter + len(delimiter)
+
+
+def _decode_transfer_encoding(content, encoding):
+    encoding = encoding.strip().lower()
+    if encoding == b'base64':
+        return binascii.a2b_base64(content)
+    if encoding == b'quoted-printable':
+        return binascii.a2b_qp(content)
+    # 7bit, 8bit and binary content, or unknown encodings, is left as is
+    return content
+
+
+def _decode_content_encoding(content, encoding):
+    if not PY3 and isinstance(content, memoryview):
+        # Python 2's zlib only accepts strings and read-only buffers
+        content = content.tobytes()
+    for coding in reversed(encoding.split(b',')):
+        coding = coding.strip().lower()
+        if coding in (b'gzip', b'x-gzip'):
+            content = zlib.decompress(content, 16 + zlib.MAX_WBITS)
+        elif coding == b'deflate':
+            try:
+                content = zlib.decompress(content)
+            except zlib.error:
+                # Some servers send raw deflate streams without the header
+                content = zlib.decompress(content, -zlib.MAX_WBITS)
+        elif coding != b'identity':
+            # Unknown codings are left as is, like requests does
+            break
+    return content
+
+
+def _decode_part(part):
+    """Undo the transfer- and content-encodings of a :class:`BodyPart`."""
+    transfer_encoding = part.headers.get(b'content-transfer-encoding')
+    content_encoding = part.headers.get(b'content-encoding')
+    if transfer_encoding is None and content_encoding is None:
+        return
+    content = view = part.content_view
+    try:
+        if transfer_encoding is not None:
+            content = _decode_transfer_encoding(content, transfer_encoding)
+        if content_encoding is not None:
+            content = _decode_content_encoding(content, content_encoding)
+    except (binascii.Error, zlib.error) as exc:
+        raise ImproperBodyPartContentException(
+            'Failed to decode the content of a part: {}'.format(exc)
+        )
+    if content is not view:
+        part.content = bytes(content)
+
+
+def _decode_parts(parts, workers):
+    """Decode the parts, in ``workers`` threads if there are several.
+
+    zlib releases the GIL while it decompresses, so compressed parts are
+    decompressed in parallel.
+    """
+    if workers < 2 or len(parts) < 2:
+        for part in parts:
+            _decode_part(part)
+        return
+
+    pending = queue.Queue()
+    for part in parts:
+        pending.put(part)
+    errors = []
+
+    def work():
+        while not errors:
+            try:
+                part = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                _decode_part(part)
+            except Exception as exc:
+                errors.append(exc)
+
+    threads = [threading.Thread(target=work)
+               for _ in range(min(workers, len(parts)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
 def _header_parser(string, encoding):
     major = sys.version_info[0]
     if major == 3:
@@ -38,6 +216,58 @@ def _header_parser(string, encoding):
     )
 
 
+def _fast_header_parser(string, encoding):
+    """Parse a block of header lines without the email package.
+
+    This gives the same results as :func:`_header_parser` for the blocks it
+    handles: lines separated by CRLF, each a header name, a colon and a
+    value, or a folded continuation of the previous value, which is kept as
+    is. Anything else is left to :func:`_header_parser`.
+
+    :returns: list -- ``(name, value)`` tuples of bytes, or ``None`` when
+        the block must be parsed by :func:`_header_parser`
+    """
+    major = sys.version_info[0]
+    if major == 3:
+        string = string.decode(encoding)
+    headers = []
+    for line in string.split('\r\n'):
+        if '\n' in line or '\r' in line:
+            return None
+        if line[:1] in (' ', '\t'):
+            if not headers:
+                return None
+            headers[-1][1] += '\r\n' + line
+            continue
+        name, colon, value = line.partition(':')
+        if not (colon and _header_name(name)):
+            return None
+        headers.append([name, value.lstrip(' \t')])
+    return [
+        (encode_with(name, encoding), encode_with(value, encoding))
+        for name, value in headers
+    ]
+
+
+def _parse_headers(string, encoding):
+    """Parse a block of header lines into a ``CaseInsensitiveDict``.
+
+    The block is parsed by :func:`_fast_header_parser`, falling back to the
+    email parser for the blocks it does not handle.
+    """
+    headers = _fast_header_parser(string, encoding)
+    if headers is None:
+        headers = _header_parser(string, encoding)
+    return CaseInsensitiveDict(headers)
+
+
+def _parse_part_headers(first, encoding):
+    """Parse the header section of a part, which may be empty."""
+    if first == b'':
+        return CaseInsensitiveDict()
+    return _parse_headers(first.lstrip(), encoding)
+
+
 class BodyPart(object):
     """
 
@@ -49,27 +279,122 @@ class BodyPart(object):
     ``content`` to access bytes, ``text`` to access unicode, and ``encoding``
     to access the unicode codec.
 
+    Parts created with :meth:`from_buffer` do not copy their content out of
+    the body: ``content_view`` is a :class:`memoryview` of it, and
+    ``content`` only creates ``bytes`` the first time it is accessed.
+
+    The content of parts which are themselves multipart bodies can be
+    decoded with :attr:`multipart`.
+
     """
 
+    __slots__ = ('encoding', 'headers', '_content', '_view', '_window',
+                 '_multipart')
+
     def __init__(self, content, encoding):
         self.encoding = encoding
-        headers = {}
+        self._view = None
+        self._window = None
+        self._multipart = None
         # Split into header section (if any) and the content
         if b'\r\n\r\n' in content:
-            first, self.content = _split_on_find(content, b'\r\n\r\n')
-            if first != b'':
-                headers = _header_parser(first.lstrip(), encoding)
+            first, self._content = _split_on_find(content, b'\r\n\r\n')
+            self.headers = _parse_part_headers(first, encoding)
         else:
             raise ImproperBodyPartContentException(
                 'content does not contain CR-LF-CR-LF'
             )
-        self.headers = CaseInsensitiveDict(headers)
+
+    @classmethod
+    def from_buffer(cls, buffer, start, end, encoding):
+        """Create a part out of ``buffer[start:end]`` without copying it.
+
+        Only the headers are copied to be parsed, the content stays a window
+        of ``buffer``.
+
+        :param buffer: ``bytes``, a ``bytearray`` or a :class:`mmap.mmap`
+        :param int start: where the part starts, after the boundary
+        :param int end: where the part ends, before the next boundary
+        :param str encoding: the codec of the headers and ``text``
+        """
+        index = buffer.find(b'\r\n\r\n', start, end)
+        if index == -1:
+            raise ImproperBodyPartContentException(
+                'content does not contain CR-LF-CR-LF'
+            )
+        part = cls.__new__(cls)
+        part.encoding = encoding
+        part._content = None
+        part._view = memoryview(buffer)[index + 4:end]
+        # Where the content is in the buffer, for nested multipart bodies
+        part._window = (buffer, index + 4, end)
+        part._multipart = None
+        part.headers = _parse_part_headers(bytes(buffer[start:index]),
+                                           encoding)
+        return part
+
+    @property
+    def content(self):
+        """Content of the ``BodyPart`` in bytes."""
+        if self._content is None:
+            self._content = self._view.tobytes()
+        return self._content
+
+    @content.setter
+    def content(self, content):
+        self._content = content
+        self._view = None
+        self._window = None
+        self._multipart = None
+
+    @property
+    def content_view(self):
+        """Content of the ``BodyPart`` as a :class:`memoryview`.
+
+        For parts created with :meth:`from_buffer`, this is a window of the
+        original body and accessing it does not copy anything.
+        """
+        if self._view is None:
+            return memoryview(self._content)
+        return self._view
 
     @property
     def text(self):
         """Content of the ``BodyPart`` in unicode."""
         return self.content.decode(self.encoding)
 
+    @property
+    def multipart(self):
+        """Lazy :class:`MultipartDecoder` of a multipart content.
+
+        The decoder scans the content where it is, in the body the part
+        was decoded from, so nested bodies are decoded without copying
+        them. Its parts are only parsed when they are accessed, and can be
+        multipart themselves.
+
+        :returns: the decoder, or ``None`` if the ``Content-Type`` of the
+            part is not multipart with a boundary
+        """
+        if self._multipart is None:
+            content_type = self.headers.get(b'content-type')
+            if content_type is None:
+                return None
+            content_type = content_type.decode(self.encoding)
+            try:
+                boundary = _find_boundary(content_type, self.encoding)
+            except NonMultipartContentTypeException:
+                return None
+            if boundary is None:
+                return None
+            if self._window is None:
+                buffer, start, end = self.content, 0, len(self.content)
+            else:
+                buffer, start, end = self._window
+            self._multipart = MultipartDecoder._from_window(
+                buffer, start, end, content_type, self.encoding
+            )
+        return self._multipart
+
 
 class MultipartDecoder(object):
     """
@@ -99,31 +424,190 @@ class MultipartDecoder(object):
     a string, which is the name of the unicode codec to use (default is
     ``'utf-8'``).
 
+    With ``zero_copy=True``, the parts are located by scanning the content
+    for boundaries, and their content is not copied out of it: each part's
+    ``content_view`` is a :class:`memoryview` window of ``content``, and
+    ``bytes`` are only created when a part's ``content`` is accessed. The
+    parts then keep the whole ``content`` alive. In this mode, ``content``
+    can also be a ``bytearray`` or a :class:`mmap.mmap`, and
+    :meth:`from_file` decodes a body stored in a file by mapping it.
+
+    With ``lazy=True``, nothing is parsed up front. The decoder only scans
+    the content for boundaries the first time a part is looked up, and the
+    headers of a part are only parsed when it is accessed, which is much
+    cheaper when only some parts of a large body are needed:
+
+    .. code-block:: python
+
+        decoder = MultipartDecoder.from_response(response, lazy=True)
+        metadata = decoder.get('metadata')
+        last = decoder[len(decoder) - 1]
+
+    Lazy parts are zero-copy parts. ``parts`` can still be used and parses
+    every part.
+
+    With ``decode_content=True``, the ``base64`` and ``quoted-printable``
+    transfer-encodings and the ``gzip`` and ``deflate`` content-encodings
+    of the parts are decoded, as declared by their
+    ``Content-Transfer-Encoding`` and ``Content-Encoding`` headers. The
+    headers are left as they are. With ``decode_workers`` greater than one,
+    the parts parsed together are decoded by that many threads, which is
+    faster for compressed parts as zlib releases the GIL:
+
+    .. code-block:: python
+
+        decoder = MultipartDecoder.from_response(
+            response, decode_content=True, decode_workers=4)
+
     """
-    def __init__(self, content, content_type, encoding='utf-8'):
+    def __init__(self, content, content_type, encoding='utf-8',
+                 zero_copy=False, lazy=False, decode_content=False,
+                 decode_workers=1):
         #: Original Content-Type header
         self.content_type = content_type
         #: Response body encoding
         self.encoding = encoding
-        #: Parsed parts of the multipart response body
-        self.parts = tuple()
+        #: Whether the parts are windows of the content instead of copies
+        self.zero_copy = zero_copy or lazy
+        #: Whether the parts are only parsed when they are accessed
+        self.lazy = lazy
+        #: Whether the transfer- and content-encodings of the parts are
+        #: decoded
+        self.decode_content = decode_content
+        #: Number of threads decoding the parts
+        self.decode_workers = decode_workers
+        self._parts = None
+        # Offsets of the parts in the content, and the lazy parts accessed
+        self._content = None
+        self._window = (0, None)
+        self._offsets = None
+        self._lazy_parts = {}
+        # Index of the first part with each Content-Disposition name, and
+        # the names of the parts that were not indexed yet
+        self._names = {}
+        self._unindexed_names = None
         self._find_boundary()
-        self._parse_body(content)
+        if lazy:
+            self._content = content
+        else:
+            self._parse_body(content)
 
-    def _find_boundary(self):
-        ct_info = tuple(x.strip() for x in self.content_type.split(';'))
-        mimetype = ct_info[0]
-        if mimetype.split('/')[0].lower() != 'multipart':
-            raise NonMultipartContentTypeException(
-                "Unexpected mimetype in content-type: '{}'".format(mimetype)
-            )
-        for item in ct_info[1:]:
-            attr, value = _split_on_find(
-                item,
-                '='
+    @property
+    def parts(self):
+        """Parsed parts of the multipart response body."""
+        if self._parts is None:
+            missing = [i for i in range(len(self))
+                       if i not in self._lazy_parts]
+            self._add_lazy_parts(missing)
+            self._parts = tuple(self[i] for i in range(len(self)))
+        return self._parts
+
+    @parts.setter
+    def parts(self, parts):
+        self._parts = parts
+
+    def _index(self):
+        """Return the offsets of the parts, scanning the content once."""
+        if self._offsets is None:
+            start, end = self._window
+            self._offsets = list(
+                _iter_part_offsets(self._content, self.boundary, start, end)
             )
-            if attr.lower() == 'boundary':
-                self.boundary = encode_with(value.strip('"'), self.encoding)
+        return self._offsets
+
+    def __len__(self):
+        if self._parts is not None:
+            return len(self._parts)
+        return len(self._index())
+
+    def __getitem__(self, index):
+        """Return the part at ``index``, parsing it if needed."""
+        if isinstance(index, slice):
+            return tuple(self[i] for i in range(*index.indices(len(self))))
+        if self._parts is not None:
+            return self._parts[index]
+
+        offsets = self._index()
+        if index < 0:
+            index += len(offsets)
+        if not 0 <= index < len(offsets):
+            raise IndexError('part index out of range')
+        if index not in self._lazy_parts:
+            self._add_lazy_parts([index])
+        return self._lazy_parts[index]
+
+    def _add_lazy_parts(self, indexes):
+        """Parse and decode the lazy parts at ``indexes``."""
+        offsets = self._index()
+        parts = [
+            BodyPart.from_buffer(self._content, offsets[i][0], offsets[i][1],
+                                 self.encoding)
+            for i in indexes
+        ]
+        if self.decode_content:
+            _decode_parts(parts, self.decode_workers)
+        self._lazy_parts.update(zip(indexes, parts))
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def _disposition_names(self):
+        """Yield the Content-Disposition name of every part, or ``None``.
+
+        Lazy parts that were not accessed yet are not parsed: their header
+        block is only searched for the header.
+        """
+        for i in range(len(self)):
+            if self._parts is not None or i in self._lazy_parts:
+                value = self[i].headers.get(b'content-disposition')
+            else:
+                start, end = self._offsets[i]
+                block_end = self._content.find(b'\r\n\r\n', start, end)
+                match = _disposition_header(
+                    bytes(self._content[start:block_end])
+                ) if block_end != -1 else None
+                value = match and match.group(1)
+            match = value and _disposition_name(value)
+            if match:
+                name = match.group(1)
+                if name is None:
+                    name = match.group(2)
+                else:
+                    name = re.sub(br'\\(.)', br'\1', name)
+                yield name.decode(self.encoding)
+            else:
+                yield None
+
+    def get(self, name, default=None):
+        """Return the first part with the ``name`` in its Content-Disposition.
+
+        This is how the fields of a ``multipart/form-data`` body are named,
+        e.g., ``Content-Disposition: form-data; name="metadata"``.
+
+        :param str name: the name of the part
+        :param default: (optional), what to return if there is no such part
+        :returns: the :class:`BodyPart` or ``default``
+        """
+        if isinstance(name, bytes):
+            name = name.decode(self.encoding)
+        if self._unindexed_names is None:
+            self._unindexed_names = enumerate(self._disposition_names())
+        # Only scan the parts up to the first one with that name
+        while name not in self._names:
+            for i, part_name in self._unindexed_names:
+                if part_name is not None:
+                    self._names.setdefault(part_name, i)
+                if part_name == name:
+                    break
+            else:
+                break
+        index = self._names.get(name)
+        return default if index is None else self[index]
+
+    def _find_boundary(self):
+        boundary = _find_boundary(self.content_type, self.encoding)
+        if boundary is not None:
+            self.boundary = boundary
 
     @staticmethod
     def _fix_first_part(part, boundary_marker):
@@ -134,6 +618,17 @@ class MultipartDecoder(object):
             return part
 
     def _parse_body(self, content):
+        if self.zero_copy:
+            self.parts = tuple(
+                BodyPart.from_buffer(content, start, end, self.encoding)
+                for start, end in _iter_part_offsets(content, self.boundary)
+            )
+        else:
+            self._split_body(content)
+        if self.decode_content:
+            _decode_parts(self.parts, self.decode_workers)
+
+    def _split_body(self, content):
         boundary = b''.join((b'--', self.boundary))
 
         def body_part(part):
@@ -150,7 +645,397 @@ class MultipartDecoder(object):
         self.parts = tuple(body_part(x) for x in parts if test_part(x))
 
     @classmethod
-    def from_response(cls, response, encoding='utf-8'):
+    def from_response(cls, response, encoding='utf-8', zero_copy=False,
+                      lazy=False, decode_content=False, decode_workers=1):
         content = response.content
         content_type = response.headers.get('content-type', None)
-        return cls(content, content_type, encoding)
+        return cls(content, content_type, encoding, zero_copy, lazy,
+                   decode_content, decode_workers)
+
+    @classmethod
+    def _from_window(cls, buffer, start, end, content_type, encoding):
+        """Lazily decode the multipart body in ``buffer[start:end]``."""
+        decoder = cls(buffer, content_type, encoding, lazy=True)
+        decoder._window = (start, end)
+        return decoder
+
+    @classmethod
+    def from_file(cls, path, content_type, encoding='utf-8', lazy=False,
+                  decode_content=False, decode_workers=1):
+        """Decode a multipart body stored in a file without reading it.
+
+        The file is memory-mapped and the parts are windows of the mapping,
+        as with ``zero_copy``, so decoding it only reads the pages of the
+        file that are accessed, through the page cache. The mapping is
+        released once the decoder and its parts are garbage collected.
+
+        :param path: the path of the file holding the body
+        :param str content_type: the ``Content-Type`` of the body
+        :param str encoding: (optional), the codec of the headers and
+            ``text``
+        :param bool lazy: (optional), whether to only parse the parts that
+            are accessed
+        :param bool decode_content: (optional), whether to decode the
+            transfer- and content-encodings of the parts
+        :param int decode_workers: (optional), the number of threads
+            decoding the parts
+        """
+        with open(path, 'rb') as fd:
+            if os.fstat(fd.fileno()).st_size:
+                content = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                # Empty files cannot be mapped
+                content = b''
+        return cls(content, content_type, encoding, zero_copy=True,
+                   lazy=lazy, decode_content=decode_content,
+                   decode_workers=decode_workers)
+
+
+class StreamingBodyPart(object):
+    """
+
+    A part of a multipart body read by a :class:`StreamingMultipartDecoder`.
+
+    The ``headers`` are parsed when the part is reached, while its content is
+    read from the decoder's input as it is consumed with :meth:`read` or
+    :meth:`iter_content`. The ``content`` and ``text`` attributes read the
+    whole content into memory instead, like those of a :class:`BodyPart`,
+    and can only be used if none of it was read before.
+
+    The content can only be read until the decoder moves on to the next
+    part, after which whatever was left of it is discarded, unless the
+    decoder spools its parts. The content of spooled parts was already
+    written to their ``stream``, which :meth:`read` reads from, and their
+    ``content`` is read from the start of the ``stream``.
+
+    """
+
+    def __init__(self, decoder, headers, encoding):
+        self._decoder = decoder
+        self._content = None
+        self.encoding = encoding
+        self.headers = headers
+        #: Whether the whole content was read
+        self.finished = False
+        # Whether some of the content was read from the decoder
+        self._consumed = False
+        #: File object holding the content of a spooled part, ``None`` if
+        #: the part is not spooled
+        self.stream = None
+
+    def read(self, size=-1):
+        """Read up to ``size`` bytes of the content.
+
+        :param int size: (optional), the maximum number of bytes to return,
+            everything that is left by default
+        :returns: bytes -- ``b''`` once the content was read to its end
+        """
+        if self.stream is not None:
+            return self.stream.read(-1 if size is None else size)
+        if self.finished:
+            return b''
+        if size is None or size < 0:
+            chunks = []
+            chunk = self._decoder._read(-1)
+            while chunk:
+                chunks.append(chunk)
+                chunk = self._decoder._read(-1)
+            self.finished = True
+            self._consumed = self._consumed or bool(chunks)
+            return b''.join(chunks)
+
+        chunk = self._decoder._read(size) if size else b''
+        if size and not chunk:
+            self.finished = True
+        self._consumed = self._consumed or bool(chunk)
+        return chunk
+
+    def iter_content(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Iterate over the rest of the content in chunks.
+
+        :param int chunk_size: (optional), the maximum size of the chunks
+        """
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    @property
+    def content(self):
+        """Content of the part, read into memory.
+
+        :raises RuntimeError: if the part is not spooled and some of its
+            content was already read
+        """
+        if self._content is not None:
+            return self._content
+        if self.stream is not None:
+            position = self.stream.tell()
+            self.stream.seek(0)
+            self._content = self.stream.read()
+            self.stream.seek(position)
+        elif self._consumed:
+            raise RuntimeError(
+                'The content of this part was already consumed')
+        else:
+            self._content = self.read()
+        return self._content
+
+    @property
+    def text(self):
+        """Content of the part in unicode."""
+        return self.content.decode(self.encoding)
+
+    def _drain(self):
+        """Discard what is left of the content."""
+        if self.stream is not None:
+            return
+        while self.read(DEFAULT_CHUNK_SIZE):
+            pass
+
+    def _spool(self, fd):
+        """Write the rest of the content to ``fd`` and read it from there."""
+        for chunk in self.iter_content():
+            fd.write(chunk)
+        try:
+            fd.seek(0)
+        except (AttributeError, io.UnsupportedOperation):
+            pass
+        self.stream = fd
+
+
+class StreamingMultipartDecoder(object):
+    """
+
+    The ``StreamingMultipartDecoder`` parses a multipart body incrementally,
+    from an iterable of chunks, and yields its parts as soon as their headers
+    have been received. Their content can then be streamed as well, so the
+    memory used does not depend on the size of the body:
+
+    .. code-block:: python
+
+        import requests
+        from requests_toolbelt.multipart.decoder import (
+            StreamingMultipartDecoder
+        )
+
+        response = requests.get(url, stream=True)
+        decoder = StreamingMultipartDecoder.from_response(response)
+        for part in decoder:
+            with open(part.headers[b'X-File-Name'], 'wb') as fd:
+                for chunk in part.iter_content():
+                    fd.write(chunk)
+
+    Parts are read in order: moving on to the next part discards whatever was
+    left of the content of the current one.
+
+    With ``spool``, the content of each part is read as soon as the part is
+    reached, and written to a :class:`tempfile.SpooledTemporaryFile` that
+    is kept in memory up to ``spool_max_size`` bytes and written to disk
+    beyond that. The parts remain readable after the decoder has moved on,
+    from their ``stream``, so even bodies with parts larger than the memory
+    available can be split into their parts:
+
+    .. code-block:: python
+
+        decoder = StreamingMultipartDecoder.from_response(response,
+                                                          spool=True)
+        parts = list(decoder)
+        archive = parts[1].stream
+
+    With ``sink``, the content of each part is written to the file object
+    ``sink(part)`` returns instead, which becomes the part's ``stream``.
+
+    :param chunks: an iterable of ``bytes`` making up the body
+    :param str content_type: the ``Content-Type`` of the body
+    :param str encoding: (optional), the codec of the headers and ``text``
+    :param int max_header_size: (optional), the largest header block of a
+        part that is accepted
+    :param bool spool: (optional), whether to spool the content of the parts
+    :param int spool_max_size: (optional), the size above which spooled
+        parts are written to disk
+    :param sink: (optional), a callable returning the file object to write
+        the content of a part to, which implies ``spool``
+    """
+
+    def __init__(self, chunks, content_type, encoding='utf-8',
+                 max_header_size=MAX_HEADER_SIZE, spool=False,
+                 spool_max_size=DEFAULT_SPOOL_MAX_SIZE, sink=None):
+        #: Original Content-Type header
+        self.content_type = content_type
+        #: Response body encoding
+        self.encoding = encoding
+        #: Boundary of the parts
+        self.boundary = _find_boundary(content_type, encoding)
+        if self.boundary is None:
+            raise NonMultipartContentTypeException(
+                "No boundary in content-type: '{}'".format(content_type)
+            )
+        self.max_header_size = max_header_size
+        self.spool = spool or sink is not None
+        self.spool_max_size = spool_max_size
+        self.sink = sink
+        #: Whether the closing boundary was reached
+        self.finished = False
+
+        self._chunks = iter(chunks)
+        self._delimiter = b'\r\n--' + self.boundary
+        # A body may start with the boundary without the CRLF preceding it
+        self._buffer = bytearray(b'\r\n')
+        # Where the next delimiter starts in the buffer, -1 if unknown
+        self._end = -1
+        # Number of bytes at the start of the buffer known to hold no
+        # delimiter
+        self._scanned = 0
+        self._exhausted = False
+        self._current = None
+
+    @classmethod
+    def from_response(cls, response, encoding='utf-8',
+                      chunk_size=DEFAULT_CHUNK_SIZE, **kwargs):
+        """Decode the body of a response as it is downloaded.
+
+        The response should be requested with ``stream=True``, otherwise its
+        whole body is downloaded before it is decoded.
+        """
+        content_type = response.headers.get('content-type', None)
+        return cls(response.iter_content(chunk_size), content_type, encoding,
+                   **kwargs)
+
+    def _fill(self):
+        """Append the next chunk to the buffer.
+
+        :returns: bool -- ``False`` once the input is exhausted
+        """
+        while not self._exhausted:
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                self._exhausted = True
+                break
+            if chunk:
+                self._buffer += chunk
+                return True
+        return False
+
+    def _consume(self, amount):
+        """Remove ``amount`` bytes from the start of the buffer."""
+        del self._buffer[:amount]
+        self._scanned = max(self._scanned - amount, 0)
+        if self._end != -1:
+            self._end -= amount
+
+    def _scan(self):
+        """Look for the next delimiter in the buffer.
+
+        :returns: int -- the number of bytes at the start of the buffer
+            that belong to the current part
+        """
+        if self._end == -1:
+            self._end = self._buffer.find(self._delimiter, self._scanned)
+        if self._end != -1:
+            return self._end
+        # The end of the buffer may be the start of a delimiter
+        self._scanned = max(len(self._buffer) - len(self._delimiter) + 1, 0)
+        return self._scanned
+
+    def _find(self, separator):
+        """Return the index of ``separator`` in the buffer, filling it."""
+        start = 0
+        while True:
+            index = self._buffer.find(separator, start)
+            if index != -1:
+                return index
+            if len(self._buffer) > self.max_header_size:
+                raise ImproperBodyPartContentException(
+                    'The headers of a part are larger than {} bytes'.format(
+                        self.max_header_size)
+                )
+            start = max(len(self._buffer) - len(separator) + 1, 0)
+            if not self._fill():
+                return -1
+
+    def _read(self, size):
+        """Read up to ``size`` bytes of the current part's content.
+
+        :returns: bytes -- ``b''`` at the end of the content
+        """
+        while True:
+            available = self._scan()
+            if available or self._end != -1:
+                break
+            if not self._fill():
+                # Without a closing boundary the content ends with the body
+                available = len(self._buffer)
+                break
+
+        if size >= 0:
+            available = min(available, size)
+        data = bytes(self._buffer[:available])
+        self._consume(available)
+        return data
+
+    def _next_part(self):
+        """Skip to the next part and parse its headers.
+
+        :returns: the :class:`StreamingBodyPart`, or ``None`` after the last
+            one
+        """
+        while self._scan() or self._end == -1:
+            # Discard the preamble or the rest of the previous part
+            self._consume(self._scan())
+            if self._end == -1 and not self._fill():
+                return None
+        self._consume(len(self._delimiter))
+        self._end = -1
+        self._scanned = 0
+
+        while len(self._buffer) < 2 and self._fill():
+            pass
+        if self._buffer[:2] == b'--':
+            self.finished = True
+            return None
+
+        # Skip the rest of the boundary line
+        index = self._find(b'\r\n')
+        if index == -1:
+            return None
+        self._consume(index + 2)
+
+        while len(self._buffer) < 2 and self._fill():
+            pass
+        headers = CaseInsensitiveDict()
+        if self._buffer[:2] == b'\r\n':
+            self._consume(2)
+        else:
+            index = self._find(b'\r\n\r\n')
+            if index == -1:
+                raise ImproperBodyPartContentException(
+                    'content does not contain CR-LF-CR-LF'
+                )
+            headers = _parse_part_headers(bytes(self._buffer[:index]),
+                                          self.encoding)
+            self._consume(index + 4)
+        return StreamingBodyPart(self, headers, self.encoding)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._current is not None:
+            self._current._drain()
+            self._current = None
+        if not self.finished:
+            self._current = self._next_part()
+        if self._current is None:
+            raise StopIteration
+        if self.spool:
+            if self.sink is not None:
+                fd = self.sink(self._current)
+            else:
+                fd = tempfile.SpooledTemporaryFile(self.spool_max_size)
+            self._current._spool(fd)
+        return self._current
+
+    next = __next__
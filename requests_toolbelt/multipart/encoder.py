@@ -7,14 +7,31 @@ requests_toolbelt.multipart.encoder
 This holds all of the implementation details of the MultipartEncoder
 
 """
+import base64
+import collections
 import contextlib
+import functools
+import hashlib
 import io
 import os
+import tempfile
+import threading
+import time
 from uuid import uuid4
 
 import requests
 
-from .._compat import fields
+from .._compat import basestring, fields, PathLike, queue
+
+#: Default size of the blocks yielded by ``iter_chunks``
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+#: In-memory values up to this size are joined with their neighbours into a
+#: single block instead of being written one part at a time
+INLINE_PART_SIZE = 64 * 1024
+
+# Clock used to measure the throughput of uploads
+_clock = getattr(time, 'monotonic', time.time)
 
 
 class FileNotSupportedError(Exception):
@@ -74,17 +91,67 @@ class MultipartEncoder(object):
         This object will end up directly in :mod:`httplib`. Currently,
         :mod:`httplib` has a hard-coded read size of **8192 bytes**. This
         means that it will loop until the file has been read and your upload
-        could take a while. This is **not** a bug in requests. A feature is
-        being considered for this object to allow you, the user, to specify
-        what size should be returned on a read. If you have opinions on this,
-        please weigh in on `this issue`_.
+        could take a while. This is **not** a bug in requests. To send larger
+        blocks, pass the result of :meth:`iter_chunks` to requests instead of
+        the encoder (see `this issue`_):
+
+        .. code-block:: python
+
+            r = requests.post('https://httpbin.org/post',
+                              data=encoder.iter_chunks(1024 * 1024),
+                              headers={'Content-Type': encoder.content_type})
 
     .. _this issue:
         https://github.com/requests/toolbelt/issues/75
 
+    The encoder can also compute a digest of every part and of the whole
+    body while they are read, so that files do not have to be read once to
+    be hashed and once to be uploaded. The digests are available once the
+    body has been sent:
+
+    .. code-block:: python
+
+        encoder = MultipartEncoder({'file': open('large.bin', 'rb')},
+                                   digest='sha256')
+        r = requests.post('https://httpbin.org/post', data=encoder,
+                          headers={'Content-Type': encoder.content_type})
+        file_digest, = encoder.digests
+        body_digest = encoder.body_digest
+
+    When the server expects the digest of each part in its headers (e.g.,
+    ``Content-MD5``), pass the name of the header as ``digest_header``. The
+    bodies are then hashed in advance by ``digest_workers`` background
+    threads, in order, so that hashing the next parts overlaps sending the
+    current one. The value of the header is the base64-encoded digest:
+
+    .. code-block:: python
+
+        encoder = MultipartEncoder({'file': open('large.bin', 'rb')},
+                                   digest='md5', digest_header='Content-MD5')
+
+    :param fields: the fields of the form
+    :param str boundary: (optional), the boundary to use, a random one is
+        generated otherwise
+    :param str encoding: (optional), the encoding of strings
+    :param digest: (optional), the name of a :mod:`hashlib` algorithm (e.g.,
+        ``'md5'`` or ``'sha256'``) or a constructor of hash objects to
+        compute digests with
+    :param str digest_header: (optional), the name of a header holding the
+        base64-encoded digest of each part, which requires ``digest`` and
+        parts that can be rewound
+    :param int digest_workers: (optional), the number of threads hashing
+        parts in advance for ``digest_header``
+
     """
 
-    def __init__(self, fields, boundary=None, encoding='utf-8'):
+    #: Subtype of the ``multipart`` media type of the body
+    subtype = 'form-data'
+
+    def __init__(self, fields, boundary=None, encoding='utf-8', digest=None,
+                 digest_header=None, digest_workers=2):
+        if digest_header and digest is None:
+            raise ValueError('A digest_header requires a digest algorithm')
+
         #: Boundary value either passed in by the user or created
         self.boundary_value = boundary or uuid4().hex
 
@@ -106,8 +173,16 @@ class MultipartEncoder(object):
         #: Whether or not the encoder is finished
         self.finished = False
 
-        #: Pre-computed parts of the upload
-        self.parts = []
+        # Pre-computed parts of the upload, with InlinePart records for the
+        # small in-memory fields
+        self._fields_parts = []
+
+        # Cached list of Part objects, one per field
+        self._parts = None
+
+        # Parts in the order they are written, with runs of small in-memory
+        # parts joined into a single part
+        self._units = []
 
         # Pre-computed parts iterator
         self._iter_parts = iter([])
@@ -118,14 +193,37 @@ class MultipartEncoder(object):
         # Cached computation of the body's length
         self._len = None
 
+        # Number of bytes of the body already read
+        self._position = 0
+
         # Our buffer
-        self._buffer = CustomBytesIO(encoding=encoding)
+        self._buffer = ChunkBuffer()
+
+        # Constructor of the hash objects computing digests, if any
+        self._new_digest = None
+        if isinstance(digest, basestring):
+            self._new_digest = functools.partial(hashlib.new, digest)
+        elif digest is not None:
+            self._new_digest = digest
+
+        #: Name of the header holding the digest of each part
+        self.digest_header = digest_header
+
+        # Hash object of the whole body
+        self._body_hasher = None
+        if self._new_digest is not None:
+            self._body_hasher = self._new_digest()
+
+        # Parts whose body is hashed in advance for their digest header
+        self._digest_jobs = []
 
         # Pre-compute each part's headers
         self._prepare_parts()
 
-        # Load boundary into buffer
-        self._write_boundary()
+        if self._digest_jobs:
+            # The length must be measured before the threads read the bodies
+            self._calculate_length()
+            start_digest_jobs(self._digest_jobs, digest_workers)
 
     @property
     def len(self):
@@ -148,7 +246,12 @@ class MultipartEncoder(object):
         return self._len or self._calculate_length()
 
     def __repr__(self):
-        return '<MultipartEncoder: {!r}>'.format(self.fields)
+        return '<{}: {!r}>'.format(type(self).__name__, self.fields)
+
+    def __iter__(self):
+        # Besides iterating over the body, this lets requests record the
+        # encoder's position so that it can rewind it on redirects.
+        return iter(self.iter_chunks())
 
     def _calculate_length(self):
         """
@@ -159,7 +262,7 @@ class MultipartEncoder(object):
         boundary_len = len(self.boundary)  # Length of --{boundary}
         # boundary length + header length + body length + len('\r\n') * 2
         self._len = sum(
-            (boundary_len + total_len(p) + 4) for p in self.parts
+            (boundary_len + total_len(p) + 4) for p in self._units
             ) + boundary_len + 4
         return self._len
 
@@ -186,37 +289,82 @@ class MultipartEncoder(object):
 
     def _load(self, amount):
         """Load ``amount`` number of bytes into the buffer."""
-        self._buffer.smart_truncate()
-        part = self._current_part or self._next_part()
-        while amount == -1 or amount > 0:
-            written = 0
-            if part and not part.bytes_left_to_write():
-                written += self._write(b'\r\n')
-                written += self._write_boundary()
-                part = self._next_part()
-
-            if not part:
-                written += self._write_closing_boundary()
-                self.finished = True
-                break
-
-            written += part.write_to(self._buffer, amount)
+        while not self.finished and (amount == -1 or amount > 0):
+            part = self._current_part
+            if part is None or not part.bytes_left_to_write():
+                written = self._next_part()
+            else:
+                written = part.write_to(self._buffer, amount)
 
             if amount != -1:
                 amount -= written
 
     def _next_part(self):
+        """Move on to the next part and write the boundary preceding it.
+
+        Once every part has been written, this writes the closing boundary
+        and marks the encoder as finished.
+
+        :returns: int -- the number of bytes written to the buffer
+        """
+        written = 0
+        if self._current_part is not None:
+            written += self._write(b'\r\n')
+
         try:
-            p = self._current_part = next(self._iter_parts)
+            self._current_part = next(self._iter_parts)
         except StopIteration:
-            p = None
-        return p
+            self._current_part = None
+            self.finished = True
+            return written + self._write_closing_boundary()
+
+        return written + self._write_boundary()
+
+    def _iter_segments(self, block_size):
+        """Iterate over the rest of the body in segments.
+
+        Boundaries, part headers and in-memory part bodies are yielded as
+        ``bytes`` of at most ``block_size``. Part bodies wrapping a file
+        object are yielded as their :class:`FileWrapper` instead, so that
+        the consumer can send them by other means (e.g., ``sendfile``). The
+        consumer **must** read the wrapper to its end before resuming the
+        iteration.
+        """
+        while True:
+            part = self._current_part
+            if self._buffer.len >= block_size or (
+                    self.finished and self._buffer.len):
+                yield self._read_buffer(block_size)
+            elif self.finished:
+                return
+            elif part is None or not part.bytes_left_to_write():
+                self._next_part()
+            elif part.headers_unread:
+                part.write_headers_to(self._buffer)
+            elif (isinstance(part.body, FileWrapper) and
+                    self._body_hasher is None):
+                if self._buffer.len:
+                    yield self._read_buffer(-1)
+                remaining = part.body.len
+                yield part.body
+                self._position += remaining - part.body.len
+            else:
+                part.write_to(self._buffer, block_size - self._buffer.len)
 
     def _iter_fields(self):
+        """Iterate over the rendered headers and data of every field."""
         _fields = self.fields
         if hasattr(self.fields, 'items'):
             _fields = list(self.fields.items())
+        render_part = fields.RequestField(name='', data=b'')._render_part
         for k, v in _fields:
+            if isinstance(v, basestring):
+                # Plain values only get a Content-Disposition header, which
+                # is much cheaper to render without a RequestField.
+                yield ('Content-Disposition: form-data; {}\r\n\r\n'.format(
+                    render_part('name', k)), v)
+                continue
+
             file_name = None
             file_type = None
             file_headers = None
@@ -230,21 +378,170 @@ class MultipartEncoder(object):
             else:
                 file_pointer = v
 
+            if file_type is None and is_encoder(file_pointer):
+                file_type = file_pointer.content_type
+
             field = fields.RequestField(name=k, data=file_pointer,
                                         filename=file_name,
                                         headers=file_headers)
             field.make_multipart(content_type=file_type)
-            yield field
+            yield field.render_headers(), field.data
 
     def _prepare_parts(self):
         """This uses the fields provided by the user and creates Part objects.
 
-        It populates the `parts` attribute and uses that to create a
-        generator for iteration.
+        It creates a part for every field and uses them to create a generator
+        for iteration. Adjacent values that are small strings are kept as
+        :class:`InlinePart` records and joined into one block, so that they
+        are written in one go instead of one part at a time.
         """
         enc = self.encoding
-        self.parts = [Part.from_field(f, enc) for f in self._iter_fields()]
-        self._iter_parts = iter(self.parts)
+        separator = b'\r\n' + self._encoded_boundary
+        self._fields_parts = []
+        self._parts = None
+        self._units = []
+        run = []
+        for headers, data in self._iter_fields():
+            headers = encode_with(headers, enc)
+            digest = None
+            if self.digest_header and isinstance(data, basestring):
+                digest = self._new_digest(encode_with(data, enc)).digest()
+                headers = self._add_digest_header(headers, digest)[0]
+
+            if isinstance(data, basestring) and len(data) <= INLINE_PART_SIZE:
+                part = InlinePart(headers, encode_with(data, enc))
+                run.append(part)
+            else:
+                if run:
+                    self._units.append(Part.from_inline_parts(run, separator))
+                    run = []
+                part = self._prepare_part(headers, coerce_data(data, enc),
+                                          digest)
+                self._units.append(part)
+            self._fields_parts.append(part)
+
+        if run:
+            self._units.append(Part.from_inline_parts(run, separator))
+        self._iter_parts = iter(self._units)
+
+    @property
+    def parts(self):
+        """Pre-computed parts of the upload, one per field.
+
+        The small string fields are written as part of a block joining them
+        with their neighbours, so their parts are created when this is first
+        accessed and are not read by the encoder.
+        """
+        if self._parts is None:
+            self._parts = [
+                Part(p.headers, CustomBytesIO(p.body))
+                if isinstance(p, InlinePart) else p
+                for p in self._fields_parts
+            ]
+        return self._parts
+
+    @parts.setter
+    def parts(self, parts):
+        self._parts = parts
+
+    def _prepare_part(self, headers, body, digest=None):
+        """Create the :class:`Part` of a field that is not inline.
+
+        Its body is hashed as it is written, or in advance by a
+        :class:`DigestJob` when the digest goes in its headers.
+        """
+        if not self.digest_header:
+            part = Part(headers, body)
+            if self._new_digest is not None:
+                part.hasher = self._new_digest()
+            return part
+
+        if digest is not None:
+            part = Part(headers, body)
+            part.digest = digest
+            return part
+
+        headers, offset = self._add_digest_header(
+            headers, b'\0' * self._new_digest().digest_size
+        )
+        part = Part(headers, body)
+        if not part.seekable():
+            raise ValueError(
+                'The body of a part must be seekable to be hashed before it '
+                'is sent'
+            )
+        part._digest_job = DigestJob(part, self._new_digest, offset)
+        self._digest_jobs.append(part._digest_job)
+        return part
+
+    def _add_digest_header(self, headers, digest):
+        """Add the digest header to the rendered ``headers`` of a part.
+
+        :returns: tuple -- the new headers and the offset of the header's
+            value in them
+        """
+        prefix = b''.join([
+            headers[:-2], encode_with(self.digest_header, self.encoding),
+            b': '
+        ])
+        return (prefix + base64.b64encode(digest) + b'\r\n\r\n',
+                len(prefix))
+
+    def _read_buffer(self, size):
+        """Read up to ``size`` bytes from the buffer, keeping our position."""
+        data = self._buffer.read(size)
+        self._position += len(data)
+        if self._body_hasher is not None:
+            self._body_hasher.update(data)
+        return data
+
+    def _rewind(self):
+        """Go back to the beginning of the body.
+
+        Every part that has already been started is rewound to the position
+        its body had when the encoder was created.
+        """
+        started = [p for p in self._units if not p.headers_unread]
+        if not all(p.seekable() for p in started):
+            raise io.UnsupportedOperation(
+                'A part that was already read cannot be rewound'
+            )
+        for part in started:
+            part.rewind()
+        if self._body_hasher is not None:
+            self._body_hasher = self._new_digest()
+            for part in self._units:
+                if part.hasher is not None:
+                    part.hasher = self._new_digest()
+
+        self._iter_parts = iter(self._units)
+        self._current_part = None
+        self._buffer = ChunkBuffer()
+        self.finished = False
+        self._position = 0
+
+    def _skip(self, amount):
+        """Skip ``amount`` bytes of the body.
+
+        The bodies of seekable parts are sought over, everything else is read
+        and discarded. When digests are computed, everything is read.
+        """
+        scratch = memoryview(bytearray(min(amount, 64 * 1024)))
+        while amount > 0:
+            part = self._current_part
+            if (part is not None and not part.headers_unread and
+                    not self._buffer.len and part.seekable() and
+                    self._body_hasher is None):
+                skipped = min(amount, total_len(part.body))
+                part.body.seek(skipped, os.SEEK_CUR)
+                self._position += skipped
+                amount -= skipped
+                if amount <= 0:
+                    break
+            skipped = self.readinto(scratch[:amount])
+            if not skipped:
+                break
+            amount -= skipped
 
     def _write(self, bytes_to_write):
         """Write the bytes to the end of the buffer.
@@ -261,20 +558,54 @@ class MultipartEncoder(object):
 
     def _write_closing_boundary(self):
         """Write the bytes necessary to finish a multipart/form-data body."""
-        with reset(self._buffer):
-            self._buffer.seek(-2, 2)
-            self._buffer.write(b'--\r\n')
-        return 2
+        return self._write(encode_with(
+            '{}--\r\n'.format(self.boundary), self.encoding
+        ))
 
     def _write_headers(self, headers):
         """Write the current part's headers to the buffer."""
         return self._write(encode_with(headers, self.encoding))
 
+    @property
+    def digests(self):
+        """Digests of the fields, in order.
+
+        The digest of a field is ``None`` until its body has been read to
+        the end, unless it was computed in advance for the
+        ``digest_header``. This is ``None`` when the encoder was created
+        without a ``digest``.
+
+        :returns: list -- the digests as ``bytes`` or ``None``
+        """
+        if self._new_digest is None:
+            return None
+        return [self._part_digest(p) for p in self._fields_parts]
+
+    def _part_digest(self, part):
+        if isinstance(part, InlinePart):
+            return self._new_digest(part.body).digest()
+        if part.digest is not None:
+            return part.digest
+        if part.hasher is None or part.bytes_left_to_write():
+            return None
+        return part.hasher.digest()
+
+    @property
+    def body_digest(self):
+        """Digest of the whole body, once it has been read to the end.
+
+        :returns: bytes -- the digest, or ``None`` if the body has not been
+            read to the end or the encoder was created without a ``digest``
+        """
+        if self._body_hasher is None or not self.finished or self._buffer.len:
+            return None
+        return self._body_hasher.digest()
+
     @property
     def content_type(self):
-        return str(
-            'multipart/form-data; boundary={}'.format(self.boundary_value)
-            )
+        return str('multipart/{}; boundary={}'.format(
+            self.subtype, self.boundary_value
+            ))
 
     def to_string(self):
         """Return the entirety of the data in the encoder.
@@ -305,14 +636,255 @@ class MultipartEncoder(object):
         :returns: bytes
         """
         if self.finished:
-            return self._buffer.read(size)
+            return self._read_buffer(size)
 
         bytes_to_load = size
         if bytes_to_load != -1 and bytes_to_load is not None:
             bytes_to_load = self._calculate_load_amount(int(size))
 
         self._load(bytes_to_load)
-        return self._buffer.read(size)
+        return self._read_buffer(size)
+
+    def readinto(self, buffer):
+        """Read data from the streaming encoder into a writable buffer.
+
+        Unlike :meth:`read`, this does not copy part bodies through the
+        encoder's internal buffer. Boundaries and part headers are copied
+        into ``buffer`` as usual, but the bodies are read directly into it
+        using their own ``readinto`` method when one is available.
+
+        .. code-block:: python
+
+            encoder = MultipartEncoder({'file': open('large.bin', 'rb')})
+            buf = bytearray(1024 * 1024)
+            while True:
+                n = encoder.readinto(buf)
+                if not n:
+                    break
+                send(memoryview(buf)[:n])
+
+        :param buffer: a pre-allocated, writable bytes-like object (e.g., a
+            ``bytearray`` or ``memoryview``)
+        :returns: int -- the number of bytes written to ``buffer``, ``0``
+            once the encoder is exhausted
+        """
+        view = memoryview(buffer)
+        if view.format != 'B':
+            view = view.cast('B')
+        size = len(view)
+
+        written = self._buffer.readinto(view)
+        while written < size and not self.finished:
+            part = self._current_part
+            if part is None or not part.bytes_left_to_write():
+                self._next_part()
+            elif part.headers_unread:
+                part.write_headers_to(self._buffer)
+            else:
+                # The internal buffer is empty at this point, so the body can
+                # go straight into the caller's buffer.
+                written += part.readinto(view[written:])
+                continue
+            written += self._buffer.readinto(view[written:])
+
+        self._position += written
+        if self._body_hasher is not None:
+            self._body_hasher.update(view[:written])
+        return written
+
+    def tell(self):
+        """Return the number of bytes of the body already read."""
+        return self._position
+
+    def seekable(self):
+        """Whether every part can be rewound (see :meth:`seek`)."""
+        return all(p.seekable() for p in self._units)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        """Move to a new position in the body.
+
+        Seeking backwards resets the parts and seeks their underlying file
+        objects back to where they were when the encoder was created, so
+        that the body can be sent again (e.g., for a retry, a 307/308
+        redirect or an authentication challenge) without creating a new
+        encoder. Seeking to a position other than the start then reads and
+        discards the bytes up to that position.
+
+        :param int offset: the position to move to, relative to ``whence``
+        :param int whence: (optional), one of ``os.SEEK_SET`` (the
+            default), ``os.SEEK_CUR`` or ``os.SEEK_END``
+        :returns: int -- the new position
+        :raises io.UnsupportedOperation: if a part that must be rewound is
+            not seekable, e.g., a :class:`FileFromURLWrapper`
+        """
+        if whence == os.SEEK_SET:
+            position = offset
+        elif whence == os.SEEK_CUR:
+            position = self._position + offset
+        elif whence == os.SEEK_END:
+            position = self.len + offset
+        else:
+            raise ValueError('Invalid whence ({!r})'.format(whence))
+
+        if position < 0:
+            raise ValueError('Negative seek position {}'.format(position))
+
+        if position < self._position:
+            self._rewind()
+        self._skip(position - self._position)
+        return self._position
+
+    def iter_chunks(self, block_size=DEFAULT_BLOCK_SIZE):
+        """Iterate over the body in blocks of ``block_size`` bytes.
+
+        The returned object has the same ``len`` as the encoder but no
+        ``read`` method, so requests will still send a ``Content-Length``
+        header while :mod:`httplib` sends each block as it is instead of
+        reading the body 8192 bytes at a time.
+
+        :param int block_size: (optional), the size of each block. Only the
+            last block may be shorter.
+        :returns: an iterable of bytes-like objects with a ``len`` attribute
+        """
+        return BlockIterator(self, block_size)
+
+
+class MultipartMixedEncoder(MultipartEncoder):
+
+    """
+
+    Streaming encoder for ``multipart`` bodies other than
+    ``multipart/form-data``, e.g., ``multipart/mixed`` or
+    ``multipart/related``.
+
+    Instead of form fields, it takes a list of parts given as
+    ``(headers, body)`` tuples. The headers are a dictionary (or a list of
+    tuples) that is written as is, and the body can be anything a
+    :class:`MultipartEncoder` field accepts, including another encoder:
+
+    .. code-block:: python
+
+        import requests
+        from requests_toolbelt.multipart.encoder import MultipartMixedEncoder
+
+        batch = MultipartMixedEncoder([
+            ({'Content-Type': 'application/http', 'Content-ID': '<1>'},
+             b'GET /items/1 HTTP/1.1\r\n\r\n'),
+            ({'Content-Type': 'application/http', 'Content-ID': '<2>'},
+             b'GET /items/2 HTTP/1.1\r\n\r\n'),
+        ])
+        r = requests.post('https://example.com/batch', data=batch,
+                          headers={'Content-Type': batch.content_type})
+
+    Nested encoders are streamed as they are read, and a ``Content-Type``
+    header with their boundary is added for them unless one is given:
+
+    .. code-block:: python
+
+        alternatives = MultipartMixedEncoder(
+            [({'Content-Type': 'text/plain'}, 'Hello'),
+             ({'Content-Type': 'text/html'}, '<p>Hello</p>')],
+            subtype='alternative')
+        related = MultipartMixedEncoder(
+            [({'Content-ID': '<body>'}, alternatives),
+             ({'Content-Type': 'image/png', 'Content-ID': '<logo>'},
+              open('logo.png', 'rb'))],
+            subtype='related', parameters={'type': 'multipart/alternative'})
+
+    :param list parts: ``(headers, body)`` tuples, or bodies without
+        headers
+    :param str boundary: (optional), the boundary to use, a random one is
+        generated otherwise
+    :param str encoding: (optional), the encoding of strings
+    :param str subtype: (optional), the subtype of the media type,
+        ``'mixed'`` by default
+    :param dict parameters: (optional), additional parameters of the
+        ``Content-Type``, e.g., the ``type`` and ``start`` parameters of
+        ``multipart/related``
+    :param digest: (optional), see :class:`MultipartEncoder`
+    :param str digest_header: (optional), see :class:`MultipartEncoder`
+    :param int digest_workers: (optional), see :class:`MultipartEncoder`
+
+    """
+
+    def __init__(self, parts, boundary=None, encoding='utf-8',
+                 subtype='mixed', parameters=None, digest=None,
+                 digest_header=None, digest_workers=2):
+        #: Subtype of the ``multipart`` media type of the body
+        self.subtype = subtype
+
+        #: Additional parameters of the content type
+        self.parameters = parameters or {}
+
+        super(MultipartMixedEncoder, self).__init__(
+            parts, boundary, encoding, digest=digest,
+            digest_header=digest_header, digest_workers=digest_workers
+        )
+
+    def _iter_fields(self):
+        """Iterate over the rendered headers and body of every part."""
+        for part in self.fields:
+            headers = None
+            body = part
+            if isinstance(part, tuple):
+                headers, body = part
+
+            headers = to_list(headers or [])
+            if is_encoder(body) and not any(
+                    name.lower() == 'content-type' for name, _ in headers):
+                headers.append(('Content-Type', body.content_type))
+
+            yield ''.join(
+                ['{}: {}\r\n'.format(name, value) for name, value in headers]
+                + ['\r\n']
+            ), body
+
+    @property
+    def content_type(self):
+        parameters = ''.join(
+            '; {}="{}"'.format(name, quote_parameter(value))
+            for name, value in to_list(self.parameters)
+        )
+        return str('multipart/{}; boundary={}{}'.format(
+            self.subtype, self.boundary_value, parameters
+            ))
+
+
+class BlockIterator(object):
+    """Iterate over a body in blocks filled with its ``readinto`` method.
+
+    This is returned by :meth:`MultipartEncoder.iter_chunks` and
+    :meth:`MultipartEncoderMonitor.iter_chunks`.
+    """
+
+    def __init__(self, reader, block_size=DEFAULT_BLOCK_SIZE):
+        #: The object the blocks are read from
+        self.reader = reader
+
+        #: Size of the blocks to yield
+        self.block_size = int(block_size)
+
+        if self.block_size <= 0:
+            raise ValueError('The block size must be a positive integer')
+
+    @property
+    def len(self):
+        return self.reader.len - self.reader.tell()
+
+    @property
+    def content_type(self):
+        return self.reader.content_type
+
+    def __iter__(self):
+        block_size = self.block_size
+        while True:
+            block = bytearray(block_size)
+            read = self.reader.readinto(block)
+            if not read:
+                break
+            if read < block_size:
+                block = block[:read]
+            yield block
 
 
 def IDENTITY(monitor):
@@ -368,9 +940,28 @@ class MultipartEncoderMonitor(object):
         r = requests.post('https://httpbin.org/post', data=monitor,
                           headers=headers)
 
+    By default, the callback is called after every read, i.e., every 8192
+    bytes when :mod:`httplib` reads the body. To call it less often, pass a
+    minimum number of bytes and/or a minimum number of seconds between two
+    calls. The callback is still called once everything has been read:
+
+    .. code-block:: python
+
+        def callback(monitor):
+            print('{:.0%} uploaded, {:.1f} MB/s, {:.0f}s left'.format(
+                monitor.bytes_read / float(monitor.len),
+                monitor.throughput / 1e6, monitor.eta or 0))
+
+        monitor = MultipartEncoderMonitor(m, callback, min_bytes=1024 * 1024,
+                                          min_interval=0.5)
+
     """
 
-    def __init__(self, encoder, callback=None):
+    #: Number of calls to the callback that :attr:`throughput` is measured
+    #: over
+    throughput_window = 10
+
+    def __init__(self, encoder, callback=None, min_bytes=0, min_interval=0):
         #: Instance of the :class:`MultipartEncoder` being monitored
         self.encoder = encoder
 
@@ -384,11 +975,74 @@ class MultipartEncoderMonitor(object):
         #: Avoid the same problem in bug #80
         self.len = self.encoder.len
 
+        #: Minimum number of bytes read between two calls to the callback
+        self.min_bytes = min_bytes
+
+        #: Minimum number of seconds between two calls to the callback
+        self.min_interval = min_interval
+
+        # Time of the first read, and (time, bytes_read) samples taken when
+        # the callback was called
+        self._start = None
+        self._samples = collections.deque(maxlen=self.throughput_window)
+
     @classmethod
     def from_fields(cls, fields, boundary=None, encoding='utf-8',
-                    callback=None):
+                    callback=None, min_bytes=0, min_interval=0):
         encoder = MultipartEncoder(fields, boundary, encoding)
-        return cls(encoder, callback)
+        return cls(encoder, callback, min_bytes, min_interval)
+
+    def _start_clock(self):
+        if self._start is None:
+            self._start = _clock()
+            self._samples.append((self._start, self.bytes_read))
+
+    def _notify(self):
+        """Call the callback unless it was called too recently."""
+        now = _clock()
+        last_time, last_bytes_read = self._samples[-1]
+        if self.bytes_read < self.len and (
+                self.bytes_read - last_bytes_read < self.min_bytes or
+                now - last_time < self.min_interval):
+            return
+        self._samples.append((now, self.bytes_read))
+        self.callback(self)
+
+    @property
+    def elapsed(self):
+        """Number of seconds since the first read."""
+        if self._start is None:
+            return 0.0
+        return _clock() - self._start
+
+    @property
+    def average_throughput(self):
+        """Average number of bytes read per second since the first read."""
+        elapsed = self.elapsed
+        return self.bytes_read / elapsed if elapsed else 0.0
+
+    @property
+    def throughput(self):
+        """Number of bytes read per second recently.
+
+        This is measured over the last :attr:`throughput_window` calls to
+        the callback.
+        """
+        if len(self._samples) < 2:
+            return self.average_throughput
+        first_time, first_bytes_read = self._samples[0]
+        last_time, last_bytes_read = self._samples[-1]
+        if last_time <= first_time:
+            return self.average_throughput
+        return (last_bytes_read - first_bytes_read) / (last_time - first_time)
+
+    @property
+    def eta(self):
+        """Estimated number of seconds left, ``None`` if it is unknown."""
+        throughput = self.throughput
+        if not throughput:
+            return None
+        return (self.len - self.bytes_read) / throughput
 
     @property
     def content_type(self):
@@ -398,11 +1052,39 @@ class MultipartEncoderMonitor(object):
         return self.read()
 
     def read(self, size=-1):
+        self._start_clock()
         string = self.encoder.read(size)
         self.bytes_read += len(string)
-        self.callback(self)
+        self._notify()
         return string
 
+    def readinto(self, buffer):
+        self._start_clock()
+        written = self.encoder.readinto(buffer)
+        self.bytes_read += written
+        self._notify()
+        return written
+
+    def iter_chunks(self, block_size=DEFAULT_BLOCK_SIZE):
+        return BlockIterator(self, block_size)
+
+    def __iter__(self):
+        return iter(self.iter_chunks())
+
+    def tell(self):
+        return self.encoder.tell()
+
+    def seekable(self):
+        return self.encoder.seekable()
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self.bytes_read = self.encoder.seek(offset, whence)
+        if self._start is not None:
+            # The throughput is measured from the new position
+            self._samples.clear()
+            self._samples.append((_clock(), self.bytes_read))
+        return self.bytes_read
+
 
 def encode_with(string, encoding):
     """Encoding ``string`` with ``encoding`` if necessary.
@@ -445,6 +1127,38 @@ def total_len(o):
         return len(o.getvalue())
 
 
+def readinto_buffer(o, buffer):
+    """Read from ``o`` into the writable ``buffer``.
+
+    This uses ``o.readinto`` when it exists and falls back to copying the
+    result of ``o.read`` otherwise.
+
+    :param o: object with a ``read`` (and optionally ``readinto``) method
+    :param memoryview buffer: byte-formatted view to fill
+    :returns: int -- the number of bytes written to ``buffer``
+    """
+    if hasattr(o, 'readinto'):
+        return o.readinto(buffer) or 0
+
+    data = o.read(len(buffer))
+    if not data:
+        return 0
+    buffer[:len(data)] = data
+    return len(data)
+
+
+def _tell(o):
+    """Return the position of ``o`` if it can be sought to later."""
+    if not (hasattr(o, 'tell') and hasattr(o, 'seek')):
+        return None
+    try:
+        if hasattr(o, 'seekable') and not o.seekable():
+            return None
+        return o.tell()
+    except (IOError, OSError, ValueError):
+        return None
+
+
 @contextlib.contextmanager
 def reset(buffer):
     """Keep track of the buffer's current position and write to the end.
@@ -468,12 +1182,35 @@ def coerce_data(data, encoding):
         if hasattr(data, 'fileno'):
             return FileWrapper(data)
 
+        if isinstance(data, PathLike):
+            return LazyFileWrapper(data)
+
+        if is_encoder(data):
+            return EncoderWrapper(data)
+
         if not hasattr(data, 'read'):
             return CustomBytesIO(data, encoding)
 
     return data
 
 
+def quote_parameter(value):
+    """Escape ``value`` to be used as a quoted-string header parameter."""
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def is_encoder(o):
+    """Whether ``o`` is a multipart encoder (or a monitor wrapping one)."""
+    return isinstance(o, (MultipartEncoder, MultipartEncoderMonitor))
+
+
+def _has_length(response):
+    """Whether the length of the response's body is known in advance."""
+    if 'chunked' in response.headers.get('transfer-encoding', '').lower():
+        return False
+    return response.headers.get('content-length', '').isdigit()
+
+
 def to_list(fields):
     if hasattr(fields, 'items'):
         return list(fields.items())
@@ -486,6 +1223,14 @@ class Part(object):
         self.body = body
         self.headers_unread = True
         self.len = len(self.headers) + total_len(self.body)
+        # Where the body starts, if it can be rewound
+        self._body_start = _tell(self.body)
+        #: Hash object updated with the body as it is written
+        self.hasher = None
+        #: Digest of the body computed in advance
+        self.digest = None
+        # Job computing the digest for the headers, until they are written
+        self._digest_job = None
 
     @classmethod
     def from_field(cls, field, encoding):
@@ -494,6 +1239,30 @@ class Part(object):
         body = coerce_data(field.data, encoding)
         return cls(headers, body)
 
+    @classmethod
+    def from_inline_parts(cls, parts, separator):
+        """Create a single part out of a run of :class:`InlinePart` records.
+
+        The headers and bodies of the records are joined with ``separator``
+        (the CRLF and boundary between two parts), so that the resulting
+        part can be written in place of the whole run.
+        """
+        chunks = []
+        for part in parts:
+            chunks.extend((separator, part.headers, part.body))
+        return cls(b'', CustomBytesIO(b''.join(chunks[1:])))
+
+    def seekable(self):
+        """Whether the part can be rewound with :meth:`rewind`."""
+        return self._body_start is not None
+
+    def rewind(self):
+        """Rewind the part so that it can be written again."""
+        if not self.seekable():
+            raise io.UnsupportedOperation('The part body is not seekable')
+        self.body.seek(self._body_start, os.SEEK_SET)
+        self.headers_unread = True
+
     def bytes_left_to_write(self):
         """Determine if there are bytes left to write.
 
@@ -512,23 +1281,139 @@ class Part(object):
         The number of bytes written may exceed size on the first read since we
         load the headers ambitiously.
 
-        :param CustomBytesIO buffer: buffer we want to write bytes to
+        :param ChunkBuffer buffer: buffer we want to write bytes to
         :param int size: number of bytes requested to be written to the buffer
         :returns: int -- number of bytes actually written
         """
-        written = 0
-        if self.headers_unread:
-            written += buffer.append(self.headers)
-            self.headers_unread = False
+        written = self.write_headers_to(buffer)
 
         while total_len(self.body) > 0 and (size == -1 or written < size):
             amount_to_read = size
             if size != -1:
                 amount_to_read = size - written
-            written += buffer.append(self.body.read(amount_to_read))
+            data = self.body.read(amount_to_read)
+            if self.hasher is not None:
+                self.hasher.update(data)
+            written += buffer.append(data)
 
         return written
 
+    def write_headers_to(self, buffer):
+        """Write the part's headers to the buffer if they are still unread.
+
+        :param ChunkBuffer buffer: buffer we want to write the headers to
+        :returns: int -- number of bytes written
+        """
+        if not self.headers_unread:
+            return 0
+        if self._digest_job is not None:
+            self._digest_job.fill_headers()
+            self._digest_job = None
+        self.headers_unread = False
+        return buffer.append(self.headers)
+
+    def readinto(self, buffer):
+        """Read the part's body directly into ``buffer``.
+
+        The headers are expected to have been written already with
+        :meth:`write_headers_to`.
+
+        :param memoryview buffer: byte-formatted view to fill
+        :returns: int -- number of bytes actually written
+        """
+        written = 0
+        size = len(buffer)
+        while written < size and total_len(self.body) > 0:
+            read = readinto_buffer(self.body, buffer[written:])
+            if not read:
+                break
+            if self.hasher is not None:
+                self.hasher.update(buffer[written:written + read])
+            written += read
+
+        return written
+
+
+class DigestJob(object):
+    """Hash the body of a part before its headers are written.
+
+    The headers of the part hold a placeholder of the same length as the
+    base64-encoded digest, which is filled in once the job is done.
+    """
+
+    def __init__(self, part, new_digest, offset):
+        self.part = part
+        self.new_digest = new_digest
+        # Where the value of the digest header starts in the headers
+        self.offset = offset
+        self.done = threading.Event()
+        self.error = None
+
+    def run(self):
+        """Read the whole body to hash it, then rewind it."""
+        part = self.part
+        try:
+            hasher = self.new_digest()
+            view = memoryview(bytearray(64 * 1024))
+            while True:
+                read = readinto_buffer(part.body, view)
+                if not read:
+                    break
+                hasher.update(view[:read])
+            part.body.seek(part._body_start, os.SEEK_SET)
+            part.digest = hasher.digest()
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self.done.set()
+
+    def fill_headers(self):
+        """Wait for the digest and write it into the part's headers."""
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        value = base64.b64encode(self.part.digest)
+        headers = self.part.headers
+        self.part.headers = b''.join([
+            headers[:self.offset], value, headers[self.offset + len(value):]
+        ])
+
+
+def start_digest_jobs(jobs, workers):
+    """Run the :class:`DigestJob` instances in order in daemon threads."""
+    pending = queue.Queue()
+    for job in jobs:
+        pending.put(job)
+
+    def work():
+        while True:
+            try:
+                job = pending.get_nowait()
+            except queue.Empty:
+                return
+            job.run()
+
+    for _ in range(min(workers, len(jobs))):
+        thread = threading.Thread(target=work)
+        thread.daemon = True
+        thread.start()
+
+
+class InlinePart(object):
+    """Record of a small in-memory part.
+
+    The bytes of an inline part are written as part of a block joining it
+    with its neighbours (see :meth:`Part.from_inline_parts`), so the record
+    only keeps its encoded headers and body.
+    """
+
+    __slots__ = ('headers', 'body', 'len')
+
+    def __init__(self, headers, body):
+        self.headers = headers
+        self.body = body
+        self.len = len(headers) + len(body)
+
 
 class CustomBytesIO(io.BytesIO):
     def __init__(self, buffer=None, encoding='utf-8'):
@@ -564,16 +1449,271 @@ class CustomBytesIO(io.BytesIO):
             self.seek(0, 0)  # We want to be at the beginning
 
 
+class ChunkBuffer(object):
+    """A FIFO byte buffer made of a deque of immutable chunks.
+
+    Appending stores a reference to the chunk instead of copying it into a
+    contiguous buffer, and reads slice the chunks at the front of the deque
+    using a read offset. Chunks are dropped as soon as they have been read
+    completely, so the buffer never needs to be compacted.
+    """
+
+    def __init__(self):
+        self._chunks = collections.deque()
+        # Offset of the first unread byte in the first chunk
+        self._offset = 0
+        #: Number of bytes that have not been read yet
+        self.len = 0
+
+    def append(self, data):
+        """Add ``data`` to the end of the buffer.
+
+        :param data: bytes-like object to append
+        :returns: int -- the number of bytes appended
+        """
+        if not isinstance(data, bytes):
+            data = bytes(data)
+        if data:
+            self._chunks.append(data)
+            self.len += len(data)
+        return len(data)
+
+    def read(self, size=-1):
+        """Read and remove up to ``size`` bytes from the buffer.
+
+        :param int size: (optional), number of bytes to read. If it is not
+            provided or negative, every unread byte is returned.
+        :returns: bytes
+        """
+        if size is None or size < 0 or size > self.len:
+            size = self.len
+
+        chunks = self._chunks
+        pieces = []
+        remaining = size
+        while remaining:
+            chunk = chunks[0]
+            start = self._offset
+            end = start + remaining
+            if end >= len(chunk):
+                pieces.append(chunk[start:] if start else chunk)
+                remaining -= len(chunk) - start
+                chunks.popleft()
+                self._offset = 0
+            else:
+                pieces.append(chunk[start:end])
+                remaining = 0
+                self._offset = end
+
+        self.len -= size
+        if len(pieces) == 1:
+            return pieces[0]
+        return b''.join(pieces)
+
+    def readinto(self, buffer):
+        """Read and remove bytes from the buffer into ``buffer``.
+
+        :param memoryview buffer: byte-formatted view to fill
+        :returns: int -- the number of bytes written to ``buffer``
+        """
+        size = min(len(buffer), self.len)
+        chunks = self._chunks
+        written = 0
+        while written < size:
+            chunk = chunks[0]
+            start = self._offset
+            amount = min(len(chunk) - start, size - written)
+            buffer[written:written + amount] = (
+                memoryview(chunk)[start:start + amount]
+            )
+            written += amount
+            if start + amount == len(chunk):
+                chunks.popleft()
+                self._offset = 0
+            else:
+                self._offset = start + amount
+
+        self.len -= written
+        return written
+
+
 class FileWrapper(object):
+    """Wrap a file object as the body of a :class:`Part`.
+
+    The size of the file is measured once, when the wrapper is created.
+    After that, the number of bytes left to read is tracked from what is
+    read instead of calling ``os.fstat`` and ``tell`` on every access.
+    """
+
     def __init__(self, file_object):
         self.fd = file_object
+        # Size of the file when the wrapper was created
+        self._end = total_len(file_object)
+        #: Number of bytes left to read
+        self.len = self._end - file_object.tell()
+
+    def _consumed(self, amount):
+        if amount:
+            self.len -= amount
+        else:
+            # The file ended early (e.g., it was truncated), there is nothing
+            # left to read.
+            self.len = 0
+        return amount
+
+    def read(self, length=-1):
+        chunk = self.fd.read(length)
+        if length != 0:
+            self._consumed(len(chunk))
+        return chunk
+
+    def tell(self):
+        return self.fd.tell()
+
+    def seekable(self):
+        if not (hasattr(self.fd, 'seek') and hasattr(self.fd, 'tell')):
+            return False
+        if hasattr(self.fd, 'seekable'):
+            return self.fd.seekable()
+        return True
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self.fd.seek(offset, whence)
+        position = self.fd.tell()
+        self.len = self._end - position
+        return position
+
+    def readinto(self, buffer):
+        if not len(buffer):
+            return 0
+        return self._consumed(readinto_buffer(self.fd, buffer))
+
+
+class LazyFileWrapper(FileWrapper):
+    """Wrap the path of a file that is only opened while it is being read.
+
+    The size of the file comes from ``os.stat`` when the length of the part
+    is computed, the file is opened when the encoder starts reading its body
+    and it is closed as soon as it has been read to the end. This makes it
+    possible to upload many files without holding a file descriptor for
+    each of them for the whole upload:
+
+    .. code-block:: python
+
+        import os
+
+        import requests
+        from requests_toolbelt import MultipartEncoder
+        from requests_toolbelt.multipart.encoder import LazyFileWrapper
+
+        encoder = MultipartEncoder([
+            ('files', (name, LazyFileWrapper(os.path.join('data', name))))
+            for name in os.listdir('data')
+        ])
+        r = requests.post('https://httpbin.org/post', data=encoder,
+                          headers={'Content-Type': encoder.content_type})
+
+    :class:`MultipartEncoder` also wraps :class:`os.PathLike` values (e.g.,
+    :class:`pathlib.Path` objects) with this class automatically. Plain
+    strings are always sent as the value of the field.
+    """
+
+    def __init__(self, path):
+        #: Path of the wrapped file
+        self.path = path
+        self._fd = None
+        self._position = 0
+        self._end = None
+
+    @property
+    def fd(self):
+        """The file object, opened the first time it is needed."""
+        if self._fd is None:
+            self._fd = open(self.path, 'rb')
+            if self._position:
+                self._fd.seek(self._position)
+        return self._fd
 
     @property
     def len(self):
-        return total_len(self.fd) - self.fd.tell()
+        if self._end is None:
+            self._end = os.stat(self.path).st_size
+        return max(self._end - self._position, 0)
+
+    def _consumed(self, amount):
+        self._position += amount
+        if not amount:
+            # The file ended early (e.g., it was truncated)
+            self._end = self._position
+        if not self.len:
+            self.close()
+        return amount
 
     def read(self, length=-1):
-        return self.fd.read(length)
+        chunk = self.fd.read(length)
+        if length != 0:
+            self._consumed(len(chunk))
+        return chunk
+
+    def readinto(self, buffer):
+        if not len(buffer):
+            return 0
+        return self._consumed(readinto_buffer(self.fd, buffer))
+
+    def tell(self):
+        return self._position
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self._position + self.len
+        self._position = offset
+        if self._fd is not None:
+            self._fd.seek(offset)
+        if not self.len:
+            self.close()
+        return offset
+
+    def close(self):
+        """Close the file if it is open. It is reopened if read again."""
+        if self._fd is not None:
+            self._fd.close()
+            self._fd = None
+
+
+class EncoderWrapper(object):
+    """Wrap an encoder that is nested in another one.
+
+    The ``len`` of an encoder is the length of its whole body, while the
+    parts of an encoder expect their bodies' ``len`` to be the number of
+    bytes left to read.
+    """
+
+    def __init__(self, encoder):
+        self.encoder = encoder
+
+    @property
+    def len(self):
+        return self.encoder.len - self.encoder.tell()
+
+    def read(self, length=-1):
+        return self.encoder.read(length)
+
+    def readinto(self, buffer):
+        return self.encoder.readinto(buffer)
+
+    def tell(self):
+        return self.encoder.tell()
+
+    def seekable(self):
+        return self.encoder.seekable()
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self.encoder.seek(offset, whence)
 
 
 class FileFromURLWrapper(object):
@@ -620,19 +1760,96 @@ class FileFromURLWrapper(object):
             headers={'Content-Type': streaming_encoder.content_type}
         )
 
+    By default, the file is downloaded as it is read, so the time spent
+    waiting for the download and the time spent uploading add up. With
+    ``read_ahead``, a background thread keeps downloading up to that many
+    chunks of ``chunk_size`` bytes ahead of the upload, so that the relay
+    runs at about the speed of the slower of the two connections:
+
+    .. code-block:: python
+
+        streaming_encoder = MultipartEncoder(
+            fields={
+                'file': FileFromURLWrapper(url, session=session,
+                                           read_ahead=8)
+            }
+        )
+
+    The length of the file must be known before the upload starts, so files
+    served without a ``Content-Length`` header (e.g., with a chunked
+    transfer-encoding) are not supported by default. With ``spool``, such
+    files are downloaded completely first, into a
+    :class:`tempfile.SpooledTemporaryFile` that is kept in memory up to
+    ``spool_max_size`` bytes and written to disk beyond that. With
+    ``spool_in_background``, the download happens in a background thread, so
+    that several files can be spooled at the same time. Only ``len`` and
+    reads then wait for the download to finish:
+
+    .. code-block:: python
+
+        wrappers = [FileFromURLWrapper(url, session=session, spool=True,
+                                       spool_in_background=True)
+                    for url in urls]
+        streaming_encoder = MultipartEncoder(
+            fields=[('file', wrapper) for wrapper in wrappers]
+        )
+
+    :param str file_url: URL of the file to stream
+    :param session: (optional), the :class:`requests.Session` used to
+        download the file
+    :param int read_ahead: (optional), the number of chunks to download
+        ahead of time, ``0`` (the default) downloads the file as it is read
+    :param int chunk_size: (optional), the size of the chunks downloaded
+        ahead of time or spooled
+    :param bool spool: (optional), whether to spool files that are served
+        without a ``Content-Length`` instead of raising
+        :class:`FileNotSupportedError`
+    :param int spool_max_size: (optional), the size above which spooled
+        files are written to disk
+    :param bool spool_in_background: (optional), whether to spool files in
+        a background thread
     """
 
-    def __init__(self, file_url, session=None):
+    def __init__(self, file_url, session=None, read_ahead=0,
+                 chunk_size=64 * 1024, spool=False,
+                 spool_max_size=1024 * 1024, spool_in_background=False):
         self.session = session or requests.Session()
+        self.spool = spool
         requested_file = self._request_for_file(file_url)
-        self.len = int(requested_file.headers['content-length'])
         self.raw_data = requested_file.raw
 
+        self.read_ahead = read_ahead
+        self.chunk_size = chunk_size
+
+        # Thread spooling the file and the exception it raised, if any
+        self._spooler = None
+        self._spool_error = None
+        if not spool or _has_length(requested_file):
+            self._len = int(requested_file.headers['content-length'])
+        elif spool_in_background:
+            self._len = None
+            self._spooler = threading.Thread(
+                target=self._spool_in_background, args=(spool_max_size,),
+                name='FileFromURLWrapper spool')
+            self._spooler.daemon = True
+            self._spooler.start()
+        else:
+            self._len = None
+            self._spool_file(spool_max_size)
+        # Chunks downloaded ahead of time, the download is started by the
+        # first read
+        self._queue = None
+        self._buffer = ChunkBuffer()
+        self._downloaded = False
+        self._closed = threading.Event()
+
     def _request_for_file(self, file_url):
         """Make call for file under provided URL."""
         response = self.session.get(file_url, stream=True)
         content_length = response.headers.get('content-length', None)
-        if content_length is None:
+        if self.spool:
+            return response
+        elif content_length is None:
             error_msg = (
                 "Data from provided URL {url} is not supported. Lack of "
                 "content-length Header in requested file response.".format(
@@ -647,9 +1864,129 @@ class FileFromURLWrapper(object):
             raise FileNotSupportedError(error_msg)
         return response
 
+    def _spool_file(self, max_size):
+        """Download the whole file and read it from a spooled file instead."""
+        spooled = tempfile.SpooledTemporaryFile(max_size)
+        try:
+            while True:
+                chunk = self.raw_data.read(self.chunk_size)
+                if not chunk:
+                    break
+                spooled.write(chunk)
+        except Exception:
+            spooled.close()
+            raise
+        finally:
+            self.raw_data.close()
+
+        self._len = spooled.tell()
+        spooled.seek(0)
+        self.raw_data = spooled
+
+    def _spool_in_background(self, max_size):
+        try:
+            self._spool_file(max_size)
+        except Exception as exc:
+            self._spool_error = exc
+
+    def _wait_for_spooler(self):
+        """Wait for the file to be spooled in the background, if it is."""
+        if self._spooler is not None:
+            self._spooler.join()
+            self._spooler = None
+            if self._spool_error is not None:
+                raise self._spool_error
+
+    @property
+    def len(self):
+        """Number of bytes of the file left to read."""
+        self._wait_for_spooler()
+        return self._len
+
+    @len.setter
+    def len(self, length):
+        self._wait_for_spooler()
+        self._len = length
+
+    def _download(self):
+        """Download the file into the queue until it is full or closed."""
+        try:
+            while not self._closed.is_set():
+                chunk = self.raw_data.read(self.chunk_size) or b''
+                self._queue.put(chunk)
+                if not chunk:
+                    break
+        except Exception as exc:
+            self._queue.put(exc)
+
+    def _fill_buffer(self, size, wait=False):
+        """Move downloaded chunks to the buffer until it holds ``size`` bytes.
+
+        Unless ``wait`` is true, this only waits for the download when the
+        buffer is empty.
+        """
+        if self._queue is None:
+            self._queue = queue.Queue(self.read_ahead)
+            thread = threading.Thread(target=self._download,
+                                      name='FileFromURLWrapper read-ahead')
+            thread.daemon = True
+            thread.start()
+
+        while self._buffer.len < size and not self._downloaded:
+            try:
+                chunk = self._queue.get(block=wait or not self._buffer.len)
+            except queue.Empty:
+                break
+            if isinstance(chunk, Exception):
+                self._downloaded = True
+                raise chunk
+            if not chunk:
+                self._downloaded = True
+            self._buffer.append(chunk)
+
     def read(self, chunk_size):
         """Read file in chunks."""
+        self._wait_for_spooler()
+        wait = chunk_size < 0
         chunk_size = chunk_size if chunk_size >= 0 else self.len
-        chunk = self.raw_data.read(chunk_size) or b''
-        self.len -= len(chunk) if chunk else 0  # left to read
+        if self.read_ahead:
+            self._fill_buffer(min(chunk_size, self.len), wait)
+            chunk = self._buffer.read(chunk_size)
+        else:
+            chunk = self.raw_data.read(chunk_size) or b''
+        self._consumed(len(chunk), chunk_size)
         return chunk
+
+    def readinto(self, buffer):
+        """Read file into a pre-allocated, writable buffer."""
+        self._wait_for_spooler()
+        # Slicing a bytearray would copy it, slicing a view does not
+        view = memoryview(buffer)
+        if self.read_ahead:
+            self._fill_buffer(min(len(buffer), self.len))
+            written = self._buffer.readinto(view[:self.len])
+        else:
+            written = readinto_buffer(self.raw_data, view[:self.len])
+        self._consumed(written, len(view))
+        return written
+
+    def _consumed(self, amount, requested):
+        if amount:
+            self._len -= amount  # left to read
+        elif requested:
+            # The download ended early (e.g., the connection was closed),
+            # there is nothing left to read.
+            self._len = 0
+
+    def close(self):
+        """Stop downloading the file and close the response."""
+        self._closed.set()
+        if self._queue is not None:
+            # Let the download thread put its last chunk and notice that
+            # the wrapper is closed
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+        self.raw_data.close()
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+
+requests_toolbelt.ratelimit
+===========================
+
+This holds the implementation of the :class:`TokenBucket` and of the
+:class:`RateLimitedBody` that uses it to limit the bandwidth of uploads.
+
+"""
+import os
+import threading
+import time
+
+from .multipart.encoder import readinto_buffer
+
+# Clock used to refill the buckets
+_clock = getattr(time, 'monotonic', time.time)
+
+
+class TokenBucket(object):
+
+    """
+    A token bucket limiting the number of bytes sent per second.
+
+    The bucket holds up to ``burst`` tokens and is refilled with ``rate``
+    tokens per second. Sending ``n`` bytes takes ``n`` tokens, and waits for
+    them when the bucket does not hold enough. A bucket is thread-safe, so a
+    single bucket can be shared by every upload that should respect the
+    same budget, e.g., all the uploads of a process or all the uploads to a
+    given host.
+
+    Both the rate and the burst size can be changed while the bucket is in
+    use:
+
+    .. code-block:: python
+
+        bucket = TokenBucket(rate=1024 * 1024)  # 1 MiB/s
+        ...
+        bucket.rate = 10 * 1024 * 1024  # 10 MiB/s from now on
+
+    :param rate: number of bytes per second
+    :param burst: (optional), maximum number of bytes that can be sent at
+        once after the bucket has been idle, ``rate`` by default
+    """
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError('The rate must be a positive number')
+        if burst is not None and burst <= 0:
+            raise ValueError('The burst size must be a positive number')
+
+        self._lock = threading.Lock()
+        self._rate = rate
+        self._burst = burst or rate
+        self._tokens = self._burst
+        self._updated = _clock()
+
+    def _refill(self):
+        now = _clock()
+        self._tokens = min(
+            self._burst, self._tokens + (now - self._updated) * self._rate
+        )
+        self._updated = now
+
+    @property
+    def rate(self):
+        """Number of bytes per second."""
+        return self._rate
+
+    @rate.setter
+    def rate(self, rate):
+        if rate <= 0:
+            raise ValueError('The rate must be a positive number')
+        with self._lock:
+            self._refill()
+            self._rate = rate
+
+    @property
+    def burst(self):
+        """Maximum number of bytes that can be sent at once."""
+        return self._burst
+
+    @burst.setter
+    def burst(self, burst):
+        if burst <= 0:
+            raise ValueError('The burst size must be a positive number')
+        with self._lock:
+            self._refill()
+            self._burst = burst
+            self._tokens = min(self._tokens, burst)
+
+    def consume(self, amount):
+        """Take ``amount`` tokens, waiting until they are available.
+
+        The tokens are reserved before waiting, so that threads sharing the
+        bucket wait in turn instead of competing for the next tokens.
+
+        :param int amount: the number of tokens (bytes) to take
+        :returns: float -- the number of seconds spent waiting
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            wait = -self._tokens / float(self._rate)
+
+        if wait > 0:
+            time.sleep(wait)
+            return wait
+        return 0.0
+
+
+class RateLimitedBody(object):
+
+    """
+    Wrap a streaming body so that it is uploaded at a limited rate.
+
+    The body can be a
+    :class:`~requests_toolbelt.multipart.encoder.MultipartEncoder`, a
+    :class:`~requests_toolbelt.multipart.encoder.MultipartEncoderMonitor`,
+    a :class:`~requests_toolbelt.streaming_iterator.StreamingIterator` or any
+    other object with a ``read`` method and a ``len`` attribute. Every read
+    takes as many tokens from the :class:`TokenBucket` as bytes it returns.
+
+    .. code-block:: python
+
+        import requests
+        from requests_toolbelt import MultipartEncoder
+        from requests_toolbelt.ratelimit import RateLimitedBody, TokenBucket
+
+        bucket = TokenBucket(rate=1024 * 1024)
+        encoder = MultipartEncoder({'file': open('large.iso', 'rb')})
+        r = requests.post('https://httpbin.org/post',
+                          data=RateLimitedBody(encoder, bucket),
+                          headers={'Content-Type': encoder.content_type})
+
+    Share the same bucket between bodies to limit their combined rate, e.g.,
+    between the uploads of a :class:`~requests_toolbelt.threaded.pool.Pool`.
+
+    :param body: the body to upload
+    :param TokenBucket bucket: the bucket limiting the rate of the upload
+    """
+
+    def __init__(self, body, bucket):
+        #: The wrapped body
+        self.body = body
+
+        #: The :class:`TokenBucket` limiting the rate of the upload
+        self.bucket = bucket
+
+        # Number of bytes read, for bodies that cannot tell their position
+        self._bytes_read = 0
+
+    @property
+    def len(self):
+        return self.body.len
+
+    def read(self, size=-1):
+        data = self.body.read(size)
+        self._bytes_read += len(data)
+        self.bucket.consume(len(data))
+        return data
+
+    def readinto(self, buffer):
+        written = readinto_buffer(self.body, buffer)
+        self._bytes_read += written
+        self.bucket.consume(written)
+        return written
+
+    def tell(self):
+        if hasattr(self.body, 'tell'):
+            return self.body.tell()
+        return self._bytes_read
+
+    def seekable(self):
+        return hasattr(self.body, 'seek') and self.body.seekable()
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self.body.seek(offset, whence)
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+
+requests_toolbelt.resumable
+===========================
+
+This holds the implementation of the :class:`SegmentedUpload`, which uploads
+a body in byte-range segments that can be resumed after a failure, and of
+the protocols it can speak.
+
+"""
+import json
+import os
+import re
+import threading
+
+import requests
+
+from ._compat import queue
+from .multipart.encoder import total_len
+
+#: Default size of the segments of a :class:`SegmentedUpload`
+DEFAULT_SEGMENT_SIZE = 8 * 1024 * 1024
+
+
+class ContentRangeProtocol(object):
+    """Upload segments with ``PUT`` requests and ``Content-Range`` headers.
+
+    This is the protocol of, e.g., the resumable uploads of Google Cloud
+    Storage. The server answers ``308 Resume Incomplete`` with a
+    ``Range: bytes=0-<last byte>`` header while the upload is incomplete,
+    and ``200`` or ``201`` once it has every byte. Segments can be sent in
+    any order if the server accepts it.
+    """
+
+    #: Whether segments can be sent in parallel
+    parallel = True
+
+    def _stored(self, response, size):
+        """Return the number of bytes the server has from its response."""
+        if response.status_code in (200, 201):
+            return size
+        if response.status_code != 308:
+            response.raise_for_status()
+            raise requests.HTTPError(
+                'Unexpected status code {}'.format(response.status_code),
+                response=response,
+            )
+        match = re.match(r'bytes=0-(\d+)$',
+                         response.headers.get('Range', '').strip())
+        return int(match.group(1)) + 1 if match else 0
+
+    def offset(self, session, url, size, headers=None):
+        """Ask the server how many bytes of the upload it has."""
+        headers = dict(headers or {})
+        headers['Content-Range'] = 'bytes */{}'.format(size)
+        response = session.put(url, data=b'', headers=headers)
+        return response, self._stored(response, size)
+
+    def send(self, session, url, data, offset, size, headers=None):
+        """Send the ``data`` starting at ``offset``."""
+        headers = dict(headers or {})
+        headers['Content-Range'] = 'bytes {}-{}/{}'.format(
+            offset, offset + len(data) - 1, size
+        )
+        response = session.put(url, data=data, headers=headers)
+        return response, self._stored(response, size)
+
+
+class TusProtocol(object):
+    """Upload segments with the core `tus`_ protocol.
+
+    The offset is read from the ``Upload-Offset`` header of a ``HEAD``
+    request, and segments are sent with ``PATCH`` requests. tus requires the
+    segments to be sent in order, so they cannot be sent in parallel.
+
+    .. _tus: https://tus.io/protocols/resumable-upload
+    """
+
+    #: Whether segments can be sent in parallel
+    parallel = False
+
+    #: Version of the protocol
+    version = '1.0.0'
+
+    def _stored(self, response):
+        response.raise_for_status()
+        return int(response.headers['Upload-Offset'])
+
+    def offset(self, session, url, size, headers=None):
+        """Ask the server how many bytes of the upload it has."""
+        headers = dict(headers or {})
+        headers['Tus-Resumable'] = self.version
+        response = session.head(url, headers=headers)
+        return response, self._stored(response)
+
+    def send(self, session, url, data, offset, size, headers=None):
+        """Send the ``data`` starting at ``offset``."""
+        headers = dict(headers or {})
+        headers.update({
+            'Tus-Resumable': self.version,
+            'Upload-Offset': str(offset),
+            'Content-Type': 'application/offset+octet-stream',
+        })
+        response = session.patch(url, data=data, headers=headers)
+        return response, self._stored(response)
+
+
+class SegmentedUpload(object):
+
+    """
+    Upload a body in segments that can be resumed after a failure.
+
+    The body, a :class:`~requests_toolbelt.multipart.encoder.MultipartEncoder`
+    or a file opened in binary mode, is split into segments of
+    ``segment_size`` bytes that are sent with separate requests to an upload
+    URL that was already created. Failed segments are retried after asking
+    the server how many bytes it has, and the segments that were uploaded are
+    recorded in a ``checkpoint`` file so that the upload can be resumed by
+    another process:
+
+    .. code-block:: python
+
+        import requests
+        from requests_toolbelt.resumable import SegmentedUpload
+
+        with open('large.iso', 'rb') as fd:
+            upload = SegmentedUpload(upload_url, fd,
+                                     session=requests.Session(),
+                                     parallelism=4,
+                                     checkpoint='large.iso.upload')
+            r = upload.upload()
+
+    Segments are read from the body in order, and the body is only sought
+    backwards to retry a segment, so a :class:`MultipartEncoder` never needs
+    to be read again from its start when its parts are seekable.
+
+    :param str url: the upload URL
+    :param body: the body to upload
+    :param session: (optional), the :class:`requests.Session` used to
+        upload the segments
+    :param int segment_size: (optional), the size of the segments
+    :param int parallelism: (optional), the number of segments sent at the
+        same time, only supported by protocols that allow it
+    :param protocol: (optional), a :class:`ContentRangeProtocol` (the
+        default) or a :class:`TusProtocol`
+    :param str checkpoint: (optional), the path of a file where the
+        uploaded segments are recorded
+    :param int retries: (optional), the number of times a segment is retried
+    :param dict headers: (optional), headers sent with every request
+    """
+
+    def __init__(self, url, body, session=None,
+                 segment_size=DEFAULT_SEGMENT_SIZE, parallelism=1,
+                 protocol=None, checkpoint=None, retries=3, headers=None):
+        self.url = url
+        self.body = body
+        self.session = session or requests.Session()
+        self.segment_size = segment_size
+        self.protocol = protocol or ContentRangeProtocol()
+        if parallelism > 1 and not self.protocol.parallel:
+            raise ValueError(
+                '{} does not support parallel segments'.format(
+                    type(self.protocol).__name__)
+            )
+        self.parallelism = parallelism
+        self.checkpoint = checkpoint
+        self.retries = retries
+        self.headers = headers or {}
+
+        #: Size of the body
+        self.size = total_len(body)
+
+        #: Number of segments
+        self.segments = -(-self.size // segment_size)
+
+        #: Indexes of the segments that were uploaded
+        self.completed = set()
+
+        # Number of bytes at the start of the body the server reported it has
+        self._offset = 0
+        # Response to the request that completed the upload
+        self._response = None
+        self._lock = threading.Lock()
+        self._read_lock = threading.Lock()
+
+        self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        if not (self.checkpoint and os.path.exists(self.checkpoint)):
+            return
+        with open(self.checkpoint) as fd:
+            state = json.load(fd)
+        # Ignore checkpoints of other uploads
+        if (state.get('url'), state.get('size'),
+                state.get('segment_size')) == (self.url, self.size,
+                                               self.segment_size):
+            self.completed.update(state['completed'])
+
+    def _save_checkpoint(self):
+        if not self.checkpoint:
+            return
+        state = {
+            'url': self.url,
+            'size': self.size,
+            'segment_size': self.segment_size,
+            'completed': sorted(self.completed),
+        }
+        temporary = self.checkpoint + '.tmp'
+        with open(temporary, 'w') as fd:
+            json.dump(state, fd)
+        getattr(os, 'replace', os.rename)(temporary, self.checkpoint)
+
+    def _bounds(self, index):
+        start = index * self.segment_size
+        return start, min(start + self.segment_size, self.size)
+
+    def _stored(self, response, offset):
+        """Record that the server has the first ``offset`` bytes."""
+        with self._lock:
+            self._offset = max(self._offset, offset)
+            self.completed.update(
+                range(min(self._offset // self.segment_size, self.segments))
+            )
+            if self._offset >= self.size and self._response is None:
+                self._response = response
+
+    def _read(self, offset, size):
+        """Read ``size`` bytes of the body starting at ``offset``."""
+        with self._read_lock:
+            if self.body.tell() != offset:
+                self.body.seek(offset)
+            chunks = []
+            while size > 0:
+                chunk = self.body.read(size)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                size -= len(chunk)
+        return b''.join(chunks)
+
+    def offset(self):
+        """Ask the server how many bytes of the upload it has.
+
+        :returns: int -- the number of bytes at the start of the body the
+            server has
+        """
+        response, offset = self.protocol.offset(
+            self.session, self.url, self.size, self.headers
+        )
+        self._stored(response, offset)
+        return offset
+
+    def _upload_segment(self, index):
+        start, end = self._bounds(index)
+        error = None
+        for _ in range(self.retries + 1):
+            try:
+                if error is not None:
+                    self.offset()
+                # Do not send again what the server already has
+                offset = max(start, min(self._offset, end))
+                if offset < end:
+                    data = self._read(offset, end - offset)
+                    response, stored = self.protocol.send(
+                        self.session, self.url, data, offset, self.size,
+                        self.headers
+                    )
+                    self._stored(response, stored)
+            except (requests.RequestException, IOError) as exc:
+                error = exc
+                continue
+
+            if self._offset >= end:
+                with self._lock:
+                    self.completed.add(index)
+                    self._save_checkpoint()
+                return
+            if self._offset >= start:
+                # The server only kept part of the segment, send the rest
+                error = requests.HTTPError(
+                    'The server has {} bytes after segment {} was sent, '
+                    'instead of {}'.format(self._offset, index, end)
+                )
+                continue
+            # The server only reports the bytes it has from the start, so a
+            # segment sent before the previous ones arrived is only recorded
+            # as completed once they have (see _stored)
+            return
+        raise error
+
+    def _worker(self, indexes, errors):
+        while not errors:
+            try:
+                index = indexes.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self._upload_segment(index)
+            except Exception as exc:
+                errors.append(exc)
+
+    def upload(self):
+        """Upload the segments the server does not have yet.
+
+        The server is asked how many bytes it has first, so an upload that
+        failed can be resumed by calling this again (or by creating a new
+        :class:`SegmentedUpload` with the same checkpoint).
+
+        :returns: the response to the request that completed the upload
+        :raises: the last exception raised while uploading a segment that
+            failed more than ``retries`` times
+        """
+        self.offset()
+        for _ in range(2):
+            self._upload_pending()
+            if self._response is None:
+                # Every segment was uploaded earlier, or out of order
+                self.offset()
+            if self._response is not None:
+                break
+            # The server lost segments recorded in the checkpoint
+            with self._lock:
+                self.completed = set(range(self._offset // self.segment_size))
+        else:
+            raise requests.HTTPError(
+                'The server has {} of {} bytes after every segment was '
+                'uploaded'.format(self._offset, self.size)
+            )
+
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        return self._response
+
+    def _upload_pending(self):
+        pending = [i for i in range(self.segments) if i not in self.completed]
+        if self.parallelism <= 1:
+            for index in pending:
+                self._upload_segment(index)
+            return
+
+        indexes = queue.Queue()
+        for index in pending:
+            indexes.put(index)
+        errors = []
+        threads = [
+            threading.Thread(target=self._worker, args=(indexes, errors))
+            for _ in range(min(self.parallelism, len(pending)))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
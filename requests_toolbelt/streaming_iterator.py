@@ -10,9 +10,10 @@ need to provide the data as an iterator. This class will allow you to specify
 the size and stream the data without using a chunked transfer-encoding.
 
 """
-from requests.utils import super_len
+from .multipart.encoder import ChunkBuffer, encode_with
 
-from .multipart.encoder import CustomBytesIO, encode_with
+#: Size of the reads from file objects that do not support ``readinto``
+FILE_CHUNK_SIZE = 64 * 1024
 
 
 class StreamingIterator(object):
@@ -50,6 +51,10 @@ class StreamingIterator(object):
 
     Naturally, you should also set the `Content-Type` of your upload
     appropriately because the toolbelt will not attempt to guess that for you.
+
+    Besides ``read``, the data can be read into a pre-allocated buffer with
+    :meth:`readinto`, which copies the chunks of the iterator straight into
+    it.
     """
 
     def __init__(self, size, iterator, encoding='utf-8'):
@@ -71,36 +76,61 @@ class StreamingIterator(object):
         #: The iterator used to generate the upload data
         self.iterator = iterator
 
-        if hasattr(iterator, 'read'):
+        if hasattr(iterator, 'readinto'):
             self._file = iterator
+        elif hasattr(iterator, 'read'):
+            # Text files return characters, which may encode to more bytes
+            # than were asked for
+            self._file = _IteratorAsBinaryFile(_read_chunks(iterator),
+                                               encoding)
         else:
             self._file = _IteratorAsBinaryFile(iterator, encoding)
 
     def read(self, size=-1):
         return encode_with(self._file.read(size), self.encoding)
 
+    def readinto(self, buffer):
+        """Read data into a writable buffer.
+
+        :param buffer: a pre-allocated, writable bytes-like object (e.g., a
+            ``bytearray`` or ``memoryview``)
+        :returns: int -- the number of bytes written to ``buffer``, ``0``
+            once the data is exhausted
+        """
+        return self._file.readinto(buffer) or 0
+
+
+def _read_chunks(fd):
+    """Iterate over the chunks read from the file object ``fd``."""
+    while True:
+        chunk = fd.read(FILE_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
 
 class _IteratorAsBinaryFile(object):
     def __init__(self, iterator, encoding='utf-8'):
         #: The iterator used to generate the upload data
-        self.iterator = iterator
+        self.iterator = iter(iterator)
 
         #: Encoding the iterator is using
         self.encoding = encoding
 
         # The buffer we use to provide the correct number of bytes requested
         # during a read
-        self._buffer = CustomBytesIO()
+        self._buffer = ChunkBuffer()
 
     def _get_bytes(self):
-        try:
-            return encode_with(next(self.iterator), self.encoding)
-        except StopIteration:
-            return b''
+        # Empty chunks are skipped, they do not mean the iterator is done
+        for chunk in self.iterator:
+            chunk = encode_with(chunk, self.encoding)
+            if chunk:
+                return chunk
+        return b''
 
     def _load_bytes(self, size):
-        self._buffer.smart_truncate()
-        amount_to_load = size - super_len(self._buffer)
+        amount_to_load = size - self._buffer.len
         bytes_to_append = True
 
         while amount_to_load > 0 and bytes_to_append:
@@ -109,8 +139,31 @@ class _IteratorAsBinaryFile(object):
 
     def read(self, size=-1):
         size = int(size)
-        if size == -1:
-            return b''.join(self.iterator)
-
+        if size < 0:
+            chunks = [self._buffer.read()]
+            chunks.extend(encode_with(chunk, self.encoding)
+                          for chunk in self.iterator)
+            return b''.join(chunks)
+
+        if not self._buffer.len:
+            chunk = self._get_bytes()
+            if len(chunk) == size:
+                # The chunk is exactly what was asked for, pass it through
+                return chunk
+            self._buffer.append(chunk)
         self._load_bytes(size)
         return self._buffer.read(size)
+
+    def readinto(self, buffer):
+        view = memoryview(buffer)
+        if view.format != 'B':
+            view = view.cast('B')
+        written = self._buffer.readinto(view)
+        while written < len(view):
+            chunk = self._get_bytes()
+            if not chunk:
+                break
+            # The rest of chunks larger than the buffer stays in the buffer
+            self._buffer.append(chunk)
+            written += self._buffer.readinto(view[written:])
+        return written
@@ -1,13 +1,21 @@
 # -*- coding: utf-8 -*-
+import base64
+import binascii
 import io
+import mmap
+import os
 import sys
+import tempfile
 import unittest
+import zlib
 try:
     from unittest import mock
 except ImportError:
     import mock
 import pytest
 import requests
+from requests.structures import CaseInsensitiveDict
+from requests_toolbelt.multipart import decoder as decoder_module
 from requests_toolbelt.multipart.decoder import BodyPart
 from requests_toolbelt.multipart.decoder import (
     ImproperBodyPartContentException
@@ -16,8 +24,10 @@ from requests_toolbelt.multipart.decoder import MultipartDecoder
 from requests_toolbelt.multipart.decoder import (
     NonMultipartContentTypeException
 )
+from requests_toolbelt.multipart.decoder import StreamingMultipartDecoder
 from requests_toolbelt.multipart.encoder import encode_with
 from requests_toolbelt.multipart.encoder import MultipartEncoder
+from requests_toolbelt.multipart.encoder import MultipartMixedEncoder
 
 
 class TestBodyPart(unittest.TestCase):
@@ -191,3 +201,502 @@ class TestMultipartDecoder(unittest.TestCase):
         assert decoder_2.parts[0].headers[b'Header-1'] == b'Header-Value-1'
         assert len(decoder_2.parts[1].headers) == 0
         assert decoder_2.parts[1].content == b'Body 2, Line 1'
+
+
+class TestHeaderParsers(unittest.TestCase):
+    blocks = [
+        b'Content-Disposition: form-data; name="a:b"\r\nContent-Type: a/b',
+        b'A: 1  \r\nB:\t 2 \t',
+        b'A: 1\r\n  folded\r\n\tmore\r\nB: x',
+        b'A: 1\r\nA: 2',
+        b'A:',
+        b'Snowman: \xe2\x98\x83',
+    ]
+    fallback_blocks = [
+        b'Not a header\r\nA: 1',
+        b'A: 1\r\nnot a header\r\nB: 2',
+        b'A : 1',
+        b' A: 1',
+        b'A: 1\nB: 2',
+        b'A: 1\r\n\r\nB: 2',
+        b'From someone\r\nA: 1',
+        b'X-\xc3\xa9: 1',
+    ]
+
+    def test_fast_parser_matches_the_email_parser(self):
+        for block in self.blocks:
+            fast = decoder_module._fast_header_parser(block, 'utf-8')
+            assert fast == list(decoder_module._header_parser(block, 'utf-8'))
+
+    def test_falls_back_to_the_email_parser(self):
+        for block in self.fallback_blocks:
+            assert decoder_module._fast_header_parser(block, 'utf-8') is None
+            headers = decoder_module._parse_headers(block, 'utf-8')
+            assert headers == CaseInsensitiveDict(
+                decoder_module._header_parser(block, 'utf-8'))
+
+    def test_only_falls_back_when_needed(self):
+        with mock.patch.object(decoder_module, '_header_parser') as parser:
+            parser.return_value = []
+            for block in self.blocks:
+                decoder_module._parse_headers(block, 'utf-8')
+            assert not parser.called
+            decoder_module._parse_headers(self.fallback_blocks[0], 'utf-8')
+            assert parser.called
+
+    def test_parses_headers_in_other_encodings(self):
+        block = u'Snowman: \u2603\r\n  folded'.encode('utf-16-le')
+        headers = decoder_module._parse_headers(block, 'utf-16-le')
+        assert headers[u'snowman'.encode('utf-16-le')] == (
+            u'\u2603\r\n  folded'.encode('utf-16-le'))
+
+    def test_folded_headers_of_parts(self):
+        part = BodyPart(b'\r\nA: 1\r\n 2\r\n\r\ncontent', 'utf-8')
+        assert part.headers[b'a'] == b'1\r\n 2'
+        assert part.content == b'content'
+
+
+class TestMultipartDecoderZeroCopy(unittest.TestCase):
+    def setUp(self):
+        self.sample = [
+            ('field 1', 'value 1'),
+            ('file', ('file.bin', b'\x00\r\n--tes' * 1000,
+                      'application/octet-stream')),
+            ('field 3', ''),
+        ]
+        encoder = MultipartEncoder(self.sample, 'test boundary')
+        self.content_type = encoder.content_type
+        self.content = encoder.to_string()
+        self.expected = MultipartDecoder(self.content, self.content_type)
+
+    def test_decodes_like_the_default_mode(self):
+        for content in (self.content, bytearray(self.content)):
+            decoder = MultipartDecoder(content, self.content_type,
+                                       zero_copy=True)
+            assert [(p.headers, p.content) for p in decoder.parts] == [
+                (p.headers, p.content) for p in self.expected.parts]
+
+    def test_parts_are_windows_of_the_content(self):
+        decoder = MultipartDecoder(self.content, self.content_type,
+                                   zero_copy=True)
+        part = decoder.parts[1]
+        view = part.content_view
+        assert isinstance(view, memoryview)
+        assert view.obj is self.content
+        assert part._content is None
+        assert part.content == self.expected.parts[1].content
+        assert part.content is part.content
+
+    def test_content_view_of_copied_parts(self):
+        part = self.expected.parts[0]
+        assert part.content_view.tobytes() == b'value 1'
+        part.content = b'other'
+        assert part.content_view.tobytes() == b'other'
+
+    def test_sample_of_from_response(self):
+        content = (b'\r\n--samp1\r\nHeader-1: Header-Value-1\r\n\r\n'
+                   b'Body 1\r\n--samp1\r\n\r\nBody 2\r\n--samp1--\r\n')
+        decoder = MultipartDecoder(content,
+                                   'multipart/related; boundary="samp1"',
+                                   zero_copy=True)
+        assert [(dict(p.headers), p.content) for p in decoder.parts] == [
+            ({b'Header-1': b'Header-Value-1'}, b'Body 1'), ({}, b'Body 2')]
+
+    def test_from_file(self):
+        fd, path = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, 'wb') as fd:
+                fd.write(self.content)
+            for lazy in (False, True):
+                decoder = MultipartDecoder.from_file(path, self.content_type,
+                                                     lazy=lazy)
+                assert decoder.zero_copy
+                assert isinstance(decoder[1].content_view.obj, mmap.mmap)
+                assert [(p.headers, p.content) for p in decoder.parts] == [
+                    (p.headers, p.content) for p in self.expected.parts]
+                assert decoder.get('field 3').content == b''
+                del decoder
+        finally:
+            os.remove(path)
+
+    def test_from_empty_file(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            decoder = MultipartDecoder.from_file(path, self.content_type)
+            assert decoder.parts == ()
+        finally:
+            os.remove(path)
+
+    def test_body_parts_have_slots(self):
+        assert not hasattr(self.expected.parts[0], '__dict__')
+
+    def test_improper_parts(self):
+        with pytest.raises(ImproperBodyPartContentException):
+            MultipartDecoder(b'--b\r\nno headers end\r\n--b--',
+                             'multipart/mixed; boundary=b', zero_copy=True)
+
+
+class TestMultipartDecoderLazy(unittest.TestCase):
+    def setUp(self):
+        self.sample = [
+            ('field 1', 'value 1'),
+            ('file', ('file.bin', b'\x00\r\n--tes' * 1000,
+                      'application/octet-stream')),
+            ('field 3', ''),
+            ('field 1', 'value 4'),
+        ]
+        encoder = MultipartEncoder(self.sample, 'test boundary')
+        self.content_type = encoder.content_type
+        self.content = encoder.to_string()
+        self.expected = MultipartDecoder(self.content, self.content_type)
+
+    def decoder(self, **kwargs):
+        return MultipartDecoder(self.content, self.content_type, lazy=True,
+                                **kwargs)
+
+    def test_decodes_like_the_default_mode(self):
+        decoder = self.decoder()
+        assert [(p.headers, p.content) for p in decoder.parts] == [
+            (p.headers, p.content) for p in self.expected.parts]
+        assert [p.content for p in decoder] == [
+            p.content for p in self.expected.parts]
+
+    def test_nothing_is_parsed_up_front(self):
+        with mock.patch.object(decoder_module, '_iter_part_offsets') as scan:
+            decoder = self.decoder()
+        assert not scan.called
+        with mock.patch.object(decoder_module, '_parse_headers') as parse:
+            assert len(decoder) == 4
+        assert not parse.called
+
+    def test_indexing(self):
+        decoder = self.decoder()
+        assert decoder[1].content == self.expected.parts[1].content
+        assert decoder[-1].content == b'value 4'
+        assert decoder[1] is decoder[1]
+        assert [p.content for p in decoder[::2]] == [b'value 1', b'']
+        assert sorted(decoder._lazy_parts) == [0, 1, 2, 3]
+        with pytest.raises(IndexError):
+            decoder[4]
+        with pytest.raises(IndexError):
+            decoder[-5]
+
+    def test_get_only_parses_the_part_it_returns(self):
+        decoder = self.decoder()
+        part = decoder.get('file')
+        assert part.content == self.expected.parts[1].content
+        assert list(decoder._lazy_parts) == [1]
+        assert decoder.get(b'field 3').content == b''
+        assert decoder.get('field 1').content == b'value 1'
+        assert decoder.get('missing') is None
+        assert decoder.get('missing', 'default') == 'default'
+
+    def test_get_parses_disposition_names(self):
+        content = (
+            b'--b\r\nContent-Type: text/plain\r\n'
+            b'CONTENT-DISPOSITION: attachment; filename="a.txt";\r\n'
+            b' name="\\"quoted\\""\r\n\r\n1\r\n'
+            b'--b\r\nContent-Disposition: form-data; name=token\r\n\r\n2\r\n'
+            b'--b\r\nContent-Disposition: attachment; filename=name\r\n'
+            b'\r\n3\r\n--b--\r\n'
+        )
+        for lazy in (True, False):
+            decoder = MultipartDecoder(content, 'multipart/mixed; boundary=b',
+                                       lazy=lazy)
+            assert decoder.get('"quoted"').content == b'1'
+            assert decoder.get('token').content == b'2'
+            assert decoder.get('name') is None
+
+    def test_get_on_eager_decoders(self):
+        assert self.expected.get('file') is self.expected.parts[1]
+        assert len(self.expected) == 4
+        assert self.expected[-1] is self.expected.parts[-1]
+
+    def test_nested_multipart_bodies(self):
+        alternative = MultipartMixedEncoder(
+            [({'Content-Type': 'text/plain'}, 'Hello'),
+             ({'Content-Type': 'text/html'}, '<p>Hello</p>')],
+            boundary='inner', subtype='alternative')
+        related = MultipartMixedEncoder(
+            [({'Content-ID': '<body>'}, alternative),
+             ({'Content-Type': 'image/png'}, b'\x89PNG--inner')],
+            boundary='middle', subtype='related')
+        batch = MultipartMixedEncoder(
+            [({'Content-ID': '<1>'}, related), ({}, b'plain')],
+            boundary='outer')
+        content = batch.to_string()
+
+        for lazy in (True, False):
+            decoder = MultipartDecoder(content, batch.content_type,
+                                       lazy=lazy)
+            nested = decoder[0].multipart
+            assert decoder[0].multipart is nested
+            assert len(nested) == 2
+            assert nested[1].content == b'\x89PNG--inner'
+            assert nested[1].multipart is None
+            innermost = nested[0].multipart
+            assert [p.content for p in innermost] == [
+                b'Hello', b'<p>Hello</p>']
+            assert decoder[1].multipart is None
+            if lazy:
+                # The nested parts are windows of the outer body
+                assert innermost[1].content_view.obj is content
+
+    def test_multipart_parts_without_boundary(self):
+        content = (b'--b\r\nContent-Type: multipart/mixed\r\n\r\n'
+                   b'data\r\n--b--')
+        decoder = MultipartDecoder(content, 'multipart/mixed; boundary=b')
+        assert decoder[0].multipart is None
+
+    def test_from_response(self):
+        response = requests.Response()
+        response.headers['content-type'] = self.content_type
+        response._content = self.content
+        decoder = MultipartDecoder.from_response(response, lazy=True)
+        assert decoder.lazy and decoder.zero_copy
+        assert decoder.get('field 3').content == b''
+
+
+class TestMultipartDecoderContentDecoding(unittest.TestCase):
+    def setUp(self):
+        self.data = b'decoded \xff content\r\n' * 100
+        encoded = base64.b64encode(self.data)
+        # Base64 bodies are split in lines of 76 characters
+        lines = b'\r\n'.join(encoded[i:i + 76]
+                             for i in range(0, len(encoded), 76))
+        self.sample = [
+            ({'Content-Transfer-Encoding': 'base64'}, lines),
+            ({'Content-Transfer-Encoding': 'quoted-printable'},
+             binascii.b2a_qp(self.data)),
+            ({'Content-Encoding': 'gzip'},
+             self.compress(self.data, 16 + zlib.MAX_WBITS)),
+            ({'Content-Encoding': 'deflate'}, zlib.compress(self.data)),
+            ({'Content-Encoding': 'deflate'},
+             self.compress(self.data, -zlib.MAX_WBITS)),
+            ({'Content-Transfer-Encoding': 'BASE64',
+              'Content-Encoding': 'gzip'},
+             base64.b64encode(self.compress(self.data, 16 + zlib.MAX_WBITS))),
+            ({'Content-Transfer-Encoding': 'binary'}, self.data),
+            ({'Content-Encoding': 'br'}, b'unknown'),
+            ({}, b'plain'),
+        ]
+        encoder = MultipartMixedEncoder(self.sample, boundary='b')
+        self.content_type = encoder.content_type
+        self.content = encoder.to_string()
+
+    @staticmethod
+    def compress(data, wbits):
+        compressor = zlib.compressobj(9, zlib.DEFLATED, wbits)
+        return compressor.compress(data) + compressor.flush()
+
+    def test_decodes_the_parts(self):
+        expected = [self.data] * 7 + [b'unknown', b'plain']
+        for kwargs in ({}, {'zero_copy': True}, {'lazy': True},
+                       {'decode_workers': 4},
+                       {'lazy': True, 'decode_workers': 4}):
+            decoder = MultipartDecoder(self.content, self.content_type,
+                                       decode_content=True, **kwargs)
+            assert [p.content for p in decoder.parts] == expected
+            assert decoder[0].headers[b'Content-Transfer-Encoding'] == (
+                b'base64')
+
+    def test_decodes_memoryviews(self):
+        compressed = memoryview(self.compress(self.data, 16 + zlib.MAX_WBITS))
+        for py3 in (True, False):
+            with mock.patch.object(decoder_module, 'PY3', py3):
+                assert decoder_module._decode_content_encoding(
+                    compressed, b'gzip') == self.data
+                assert decoder_module._decode_content_encoding(
+                    memoryview(zlib.compress(self.data)),
+                    b'deflate') == self.data
+
+    def test_lazy_parts_are_decoded_when_accessed(self):
+        decoder = MultipartDecoder(self.content, self.content_type,
+                                   lazy=True, decode_content=True)
+        assert decoder[2].content == self.data
+        assert list(decoder._lazy_parts) == [2]
+
+    def test_content_is_not_decoded_by_default(self):
+        decoder = MultipartDecoder(self.content, self.content_type)
+        assert [p.content for p in decoder.parts] == [
+            body for _, body in self.sample]
+
+    def test_invalid_content(self):
+        content = (b'--b\r\nContent-Encoding: gzip\r\n\r\nnot gzip\r\n'
+                   b'--b\r\n\r\nplain\r\n--b--')
+        for workers in (1, 4):
+            with pytest.raises(ImproperBodyPartContentException):
+                MultipartDecoder(content, 'multipart/mixed; boundary=b',
+                                 decode_content=True, decode_workers=workers)
+
+
+def chunked(content, size):
+    return (content[i:i + size] for i in range(0, len(content), size))
+
+
+class TestStreamingMultipartDecoder(unittest.TestCase):
+    def setUp(self):
+        self.sample = [
+            ('field 1', 'value 1'),
+            ('file', ('file.bin', b'\r\n--test bound\r\n' * 100,
+                      'application/octet-stream')),
+            ('field 3', ''),
+            ('field 4', 'value 4\r\n'),
+        ]
+        self.boundary = 'test boundary'
+        encoder = MultipartEncoder(self.sample, self.boundary)
+        self.content_type = encoder.content_type
+        self.content = encoder.to_string()
+        self.expected = MultipartDecoder(self.content, self.content_type)
+
+    def decode(self, chunks):
+        return StreamingMultipartDecoder(chunks, self.content_type)
+
+    def test_decodes_like_the_multipart_decoder(self):
+        for size in (1, 2, 3, 7, 17, 100, len(self.content)):
+            parts = [(part.headers, part.content)
+                     for part in self.decode(chunked(self.content, size))]
+            assert parts == [(part.headers, part.content)
+                             for part in self.expected.parts]
+
+    def test_streams_the_content_of_parts(self):
+        decoder = self.decode(chunked(self.content, 5))
+        next(decoder)
+        part = next(decoder)
+        assert part.headers[b'Content-Type'] == b'application/octet-stream'
+        chunks = list(part.iter_content(10))
+        assert max(len(chunk) for chunk in chunks) <= 10
+        assert b''.join(chunks) == self.expected.parts[1].content
+        assert part.finished
+        assert part.read() == b''
+
+    def test_skips_the_rest_of_parts(self):
+        decoder = self.decode(chunked(self.content, 5))
+        first = next(decoder)
+        file_part = next(decoder)
+        assert file_part.read(3) == b'\r\n-'
+        assert [p.text for p in decoder] == ['', 'value 4\r\n']
+        with pytest.raises(RuntimeError):
+            first.content
+        assert decoder.finished
+
+    def test_ignores_the_preamble_and_epilogue(self):
+        content = (b'preamble\r\n--b\r\n\r\nbody\r\n--b--\r\nepilogue\r\n'
+                   b'--b\r\n\r\nignored')
+        decoder = StreamingMultipartDecoder([content],
+                                            'multipart/mixed; boundary=b')
+        parts = [(part.headers, part.content) for part in decoder]
+        assert parts == [({}, b'body')]
+
+    def test_body_without_closing_boundary(self):
+        content = b'--b\r\nA: 1\r\n\r\nfirst\r\n--b\r\n\r\nlast'
+        decoder = StreamingMultipartDecoder(chunked(content, 4),
+                                            'multipart/mixed; boundary=b')
+        assert [p.content for p in decoder] == [b'first', b'last']
+        assert not decoder.finished
+
+    def test_memory_is_bounded_by_the_chunk_size(self):
+        chunk_size = 64 * 1024
+        data = b'a' * chunk_size
+
+        def chunks():
+            yield b'--b\r\n\r\n'
+            for _ in range(160):
+                yield data
+            yield b'\r\n--b--\r\n'
+
+        decoder = StreamingMultipartDecoder(chunks(),
+                                            'multipart/mixed; boundary=b')
+        part = next(decoder)
+        largest = 0
+        total = 0
+        for chunk in part.iter_content(4096):
+            total += len(chunk)
+            largest = max(largest, len(decoder._buffer))
+        assert total == 160 * chunk_size
+        assert largest <= chunk_size + len(b'\r\n--b')
+
+    def test_rejects_large_headers(self):
+        content = b'--b\r\nA: ' + b'a' * 1000 + b'\r\n\r\nbody\r\n--b--'
+        decoder = StreamingMultipartDecoder(chunked(content, 10),
+                                            'multipart/mixed; boundary=b',
+                                            max_header_size=100)
+        with pytest.raises(ImproperBodyPartContentException):
+            next(decoder)
+
+    def test_rejects_non_multipart_content(self):
+        with pytest.raises(NonMultipartContentTypeException):
+            StreamingMultipartDecoder([], 'image/jpeg')
+        with pytest.raises(NonMultipartContentTypeException):
+            StreamingMultipartDecoder([], 'multipart/mixed')
+
+    def test_from_response(self):
+        response = mock.NonCallableMagicMock(spec=requests.Response)
+        response.headers = {'content-type': self.content_type}
+        response.iter_content.return_value = chunked(self.content, 1000)
+        decoder = StreamingMultipartDecoder.from_response(response,
+                                                          chunk_size=1000)
+        response.iter_content.assert_called_once_with(1000)
+        assert [p.content for p in decoder] == [
+            p.content for p in self.expected.parts]
+
+    def test_spooled_parts_outlive_the_decoder(self):
+        decoder = StreamingMultipartDecoder(chunked(self.content, 7),
+                                            self.content_type, spool=True,
+                                            spool_max_size=100)
+        parts = list(decoder)
+        assert decoder.finished
+        assert [p.content for p in parts] == [
+            p.content for p in self.expected.parts]
+        # Only the large part was written to disk
+        assert [p.stream._rolled for p in parts] == [
+            False, True, False, False]
+
+    def test_spooled_parts_read_from_their_stream(self):
+        decoder = StreamingMultipartDecoder(chunked(self.content, 7),
+                                            self.content_type, spool=True)
+        next(decoder)
+        part = next(decoder)
+        assert part.read(2) == b'\r\n'
+        assert b''.join(part.iter_content(1000)) == (
+            self.expected.parts[1].content[2:])
+        part.stream.seek(0)
+        assert part.text == self.expected.parts[1].text
+
+    def test_content_of_spooled_parts_after_reads(self):
+        decoder = StreamingMultipartDecoder(chunked(self.content, 7),
+                                            self.content_type, spool=True)
+        next(decoder)
+        part = next(decoder)
+        assert part.read(2) == b'\r\n'
+        assert part.content == self.expected.parts[1].content
+        # Reads resume where they were
+        assert part.read(3) == self.expected.parts[1].content[2:5]
+
+    def test_content_after_reads_raises(self):
+        decoder = self.decode(chunked(self.content, 7))
+        next(decoder)
+        part = next(decoder)
+        part.read(2)
+        with pytest.raises(RuntimeError):
+            part.content
+        # Parts that were skipped were consumed as well
+        next(decoder)
+        with pytest.raises(RuntimeError):
+            part.content
+
+    def test_spools_to_a_sink(self):
+        sinks = []
+
+        def sink(part):
+            sinks.append((part.headers, io.BytesIO()))
+            return sinks[-1][1]
+
+        decoder = StreamingMultipartDecoder(chunked(self.content, 7),
+                                            self.content_type, sink=sink)
+        parts = list(decoder)
+        assert [(h, fd.getvalue()) for h, fd in sinks] == [
+            (p.headers, p.content) for p in self.expected.parts]
+        assert parts[3].stream is sinks[3][1]
+        assert parts[3].content == b'value 4\r\n'
@@ -1,12 +1,24 @@
 # -*- coding: utf-8 -*-
 import unittest
+import base64
+import hashlib
 import io
+import os
+import tempfile
+import threading
+import time
+try:
+    from unittest import mock
+except ImportError:
+    import mock
 
 import requests
 
 import pytest
 from requests_toolbelt.multipart.encoder import (
-    CustomBytesIO, MultipartEncoder, FileFromURLWrapper, FileNotSupportedError)
+    ChunkBuffer, CustomBytesIO, MultipartEncoder, FileFromURLWrapper,
+    FileNotSupportedError, FileWrapper, InlinePart, INLINE_PART_SIZE,
+    LazyFileWrapper, MultipartMixedEncoder, Part)
 from requests_toolbelt._compat import filepost
 from . import get_betamax
 
@@ -90,6 +102,155 @@ class TestCustomBytesIO(unittest.TestCase):
         assert self.instance.read() == s
 
 
+class TestChunkBuffer(unittest.TestCase):
+    def setUp(self):
+        self.instance = ChunkBuffer()
+        for chunk in (b'abc', bytearray(b'defgh'), b'', b'ijklmnop'):
+            self.instance.append(chunk)
+
+    def test_append_returns_length(self):
+        assert self.instance.append(b'qrs') == 3
+        assert self.instance.append(b'') == 0
+
+    def test_can_get_length(self):
+        assert self.instance.len == 16
+
+    def test_reads_everything(self):
+        assert self.instance.read() == b'abcdefghijklmnop'
+        assert self.instance.len == 0
+        assert self.instance.read() == b''
+        assert self.instance.read(10) == b''
+
+    def test_reads_across_chunks(self):
+        assert self.instance.read(2) == b'ab'
+        assert self.instance.read(4) == b'cdef'
+        assert self.instance.len == 10
+        assert self.instance.read(100) == b'ghijklmnop'
+        assert self.instance.len == 0
+
+    def test_readinto_across_chunks(self):
+        buf = bytearray(6)
+        assert self.instance.read(1) == b'a'
+        assert self.instance.readinto(memoryview(buf)) == 6
+        assert buf == bytearray(b'bcdefg')
+        assert self.instance.readinto(memoryview(buf)) == 6
+        assert buf == bytearray(b'hijklm')
+        assert self.instance.readinto(memoryview(buf)) == 3
+        assert buf[:3] == bytearray(b'nop')
+        assert self.instance.len == 0
+        assert self.instance.readinto(memoryview(buf)) == 0
+
+    def test_interleaves_appends_and_reads(self):
+        assert self.instance.read(5) == b'abcde'
+        self.instance.append(b'qrs')
+        assert self.instance.read() == b'fghijklmnopqrs'
+
+
+class TestFileWrapper(unittest.TestCase):
+    def setUp(self):
+        self.fd = tempfile.TemporaryFile()
+        self.fd.write(b'a' * 1000)
+        self.fd.seek(100)
+
+    def tearDown(self):
+        self.fd.close()
+
+    def test_measures_the_file_once(self):
+        with mock.patch('os.fstat', wraps=os.fstat) as fstat:
+            instance = FileWrapper(self.fd)
+            assert instance.len == 900
+            assert len(instance.read(300)) == 300
+            assert instance.len == 600
+            assert instance.readinto(memoryview(bytearray(100))) == 100
+            assert instance.len == 500
+            assert len(instance.read()) == 500
+            assert instance.len == 0
+        assert fstat.call_count == 1
+
+    def test_seek_updates_the_length(self):
+        instance = FileWrapper(self.fd)
+        instance.read()
+        assert instance.seek(250) == 250
+        assert instance.len == 750
+
+    def test_file_ending_early(self):
+        instance = FileWrapper(self.fd)
+        self.fd.truncate(500)
+        assert len(instance.read(1000)) == 400
+        assert instance.len == 500
+        assert instance.read(1000) == b''
+        assert instance.len == 0
+
+
+class TestLazyFileWrapper(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.paths = []
+        for i in range(20):
+            path = os.path.join(self.directory, 'file{}.txt'.format(i))
+            with open(path, 'wb') as fd:
+                fd.write(str(i).encode('ascii') * (i * 100))
+            self.paths.append(path)
+        self.boundary = 'this-is-a-boundary'
+
+    def tearDown(self):
+        for path in self.paths:
+            os.remove(path)
+        os.rmdir(self.directory)
+
+    def eager_string(self):
+        fds = [open(path, 'rb') for path in self.paths]
+        try:
+            return MultipartEncoder(
+                [('file', (os.path.basename(fd.name), fd)) for fd in fds],
+                boundary=self.boundary).to_string()
+        finally:
+            for fd in fds:
+                fd.close()
+
+    def test_does_not_open_files_until_read(self):
+        wrappers = [LazyFileWrapper(path) for path in self.paths]
+        m = MultipartEncoder(
+            [('file', (os.path.basename(w.path), w)) for w in wrappers],
+            boundary=self.boundary)
+        assert m.len == len(self.eager_string())
+        assert all(w._fd is None for w in wrappers)
+
+        chunks = []
+        while True:
+            chunk = m.read(100)
+            if not chunk:
+                break
+            assert sum(w._fd is not None for w in wrappers) <= 1
+            chunks.append(chunk)
+
+        assert b''.join(chunks) == self.eager_string()
+        assert all(w._fd is None for w in wrappers)
+
+    def test_rewinds_closed_files(self):
+        m = MultipartEncoder(
+            [('file', (os.path.basename(p), LazyFileWrapper(p)))
+             for p in self.paths],
+            boundary=self.boundary)
+        expected = self.eager_string()
+        assert m.read() == expected
+        m.seek(0)
+        assert readinto_all(m, 1000) == expected
+        m.seek(1000)
+        assert m.read() == expected[1000:]
+
+    @pytest.mark.skipif(not hasattr(os, 'PathLike'),
+                        reason='os.PathLike is not available')
+    def test_wraps_path_like_objects(self):
+        import pathlib
+        m = MultipartEncoder(
+            [('file', (os.path.basename(p), pathlib.Path(p)))
+             for p in self.paths],
+            boundary=self.boundary)
+        assert all(isinstance(p.body, LazyFileWrapper) for p in m.parts)
+        assert m.to_string() == self.eager_string()
+
+
 class TestFileFromURLWrapper(unittest.TestCase):
     def setUp(self):
         self.session = requests.Session()
@@ -128,6 +289,150 @@ class TestFileFromURLWrapper(unittest.TestCase):
             )
 
 
+class TestFileFromURLWrapperDownloads(unittest.TestCase):
+    def setUp(self):
+        self.data = os.urandom(100 * 1000)
+        self.raw = io.BytesIO(self.data)
+        response = mock.Mock(headers={'content-length': str(len(self.data))},
+                             raw=self.raw)
+        self.session = mock.Mock(**{'get.return_value': response})
+
+    def wrapper(self, read_ahead=4):
+        return FileFromURLWrapper('http://example.com/file', self.session,
+                                  read_ahead=read_ahead, chunk_size=1000)
+
+    def wait_for(self, condition):
+        for _ in range(500):
+            if condition():
+                return
+            time.sleep(0.01)
+        raise AssertionError('timed out')
+
+    def test_reads_the_same_bytes(self):
+        instance = self.wrapper()
+        buf = bytearray(2500)
+        assert instance.read(10) == self.data[:10]
+        read = instance.readinto(memoryview(buf))
+        # Only the chunks downloaded so far are returned
+        assert 0 < read <= 2500
+        assert bytes(buf[:read]) == self.data[10:10 + read]
+        assert instance.len == len(self.data) - 10 - read
+        assert instance.read(-1) == self.data[10 + read:]
+        assert instance.len == 0
+        assert instance.read(10) == b''
+
+    def test_len_can_be_set(self):
+        instance = self.wrapper(read_ahead=0)
+        instance.len = 10
+        assert instance.len == 10
+        assert instance.read(-1) == self.data[:10]
+        assert instance.len == 0
+
+    def test_readinto_a_bytearray(self):
+        for read_ahead in (0, 2):
+            self.session.get.return_value.raw = io.BytesIO(self.data)
+            instance = self.wrapper(read_ahead=read_ahead)
+            buf = bytearray(50)
+            assert instance.readinto(buf) == 50
+            assert bytes(buf) == self.data[:50]
+            assert instance.len == len(self.data) - 50
+            instance.close()
+
+    def test_truncated_downloads_end_the_body(self):
+        for read_ahead in (0, 4):
+            for read in ('read', 'readinto'):
+                self.session.get.return_value.raw = io.BytesIO(
+                    self.data[:5000])
+                m = MultipartEncoder([('file', self.wrapper(read_ahead))],
+                                     boundary='b')
+                if read == 'read':
+                    body = m.to_string()
+                else:
+                    body = readinto_all(m, 8192)
+                assert self.data[:5000] + b'\r\n--b--\r\n' in body
+                assert m.parts[0].body.len == 0
+
+    def test_encoder_body(self):
+        m = MultipartEncoder([('file', self.wrapper())], boundary='b')
+        assert m.to_string().startswith(
+            b'--b\r\nContent-Disposition: form-data; name="file"\r\n\r\n' +
+            self.data)
+
+    def test_downloads_ahead(self):
+        instance = self.wrapper(read_ahead=4)
+        assert self.raw.tell() == 0
+        instance.read(10)
+        # One chunk is in the buffer, four are in the queue and one more is
+        # waiting for room in the queue
+        self.wait_for(lambda: self.raw.tell() == 6 * 1000)
+        time.sleep(0.05)
+        assert self.raw.tell() == 6 * 1000
+        instance.close()
+
+    def test_raises_download_errors(self):
+        self.raw.read = mock.Mock(side_effect=IOError('connection reset'))
+        instance = self.wrapper()
+        with pytest.raises(IOError):
+            instance.read(10)
+
+    def test_spools_files_without_a_length(self):
+        self.session.get.return_value.headers = {
+            'transfer-encoding': 'chunked'}
+        instance = FileFromURLWrapper('http://example.com/file',
+                                      self.session, chunk_size=1000,
+                                      spool=True, spool_max_size=10 * 1000)
+        assert self.raw.closed
+        assert instance.raw_data._rolled
+        assert instance.len == len(self.data)
+        m = MultipartEncoder([('file', instance)], boundary='b')
+        assert m.len == len(m.to_string())
+        assert instance.len == 0
+
+    def test_spools_small_files_in_memory(self):
+        self.session.get.return_value.headers = {}
+        instance = FileFromURLWrapper('http://example.com/file',
+                                      self.session, spool=True,
+                                      spool_max_size=len(self.data))
+        assert not instance.raw_data._rolled
+        assert instance.read(-1) == self.data
+
+    def test_spools_in_background(self):
+        self.session.get.return_value.headers = {}
+        started = threading.Event()
+        release = threading.Event()
+        read = self.raw.read
+
+        def blocking_read(size):
+            started.set()
+            release.wait()
+            return read(size)
+
+        self.raw.read = blocking_read
+        instance = FileFromURLWrapper('http://example.com/file',
+                                      self.session, spool=True,
+                                      spool_in_background=True)
+        assert started.wait(5)
+        release.set()
+        assert instance.len == len(self.data)
+        assert instance.read(10) == self.data[:10]
+
+    def test_raises_background_spool_errors(self):
+        self.session.get.return_value.headers = {}
+        self.raw.read = mock.Mock(side_effect=IOError('connection reset'))
+        instance = FileFromURLWrapper('http://example.com/file',
+                                      self.session, spool=True,
+                                      spool_in_background=True)
+        with pytest.raises(IOError):
+            instance.len
+
+    def test_close_stops_the_download(self):
+        instance = self.wrapper(read_ahead=1)
+        instance.read(10)
+        self.wait_for(lambda: self.raw.tell() == 3 * 1000)
+        instance.close()
+        assert self.raw.closed
+
+
 class TestMultipartEncoder(unittest.TestCase):
     def setUp(self):
         self.parts = [('field', 'value'), ('other_field', 'other_value')]
@@ -166,10 +471,10 @@ class TestMultipartEncoder(unittest.TestCase):
         while True:
             read = encoder.read(read_size)
             already_read += len(read)
+            assert encoder._buffer.len <= read_size
             if not read:
                 break
 
-        assert encoder._buffer.tell() <= read_size
         assert already_read == total_size
 
     def test_length_is_correct(self):
@@ -319,5 +624,426 @@ class TestMultipartEncoder(unittest.TestCase):
         output = m.read().decode('utf-8')
         assert output == '----90967316f8404798963cce746a4f4ef9--\r\n'
 
+
+class TestMultipartEncoderManyFields(unittest.TestCase):
+    def setUp(self):
+        self.boundary = 'this-is-a-boundary'
+        self.fields = [('field{}'.format(i), 'value {}'.format(i))
+                       for i in range(1000)]
+        self.fields[10] = ('quoted "name"\r\n', u'välue')
+        self.fields[20] = ('bytes', b'\x00\xff')
+        self.fields[30] = ('file', ('name.txt', b'contents', 'text/plain'))
+        self.fields[40] = ('large', 'x' * (INLINE_PART_SIZE + 1))
+
+    def test_encodes_data_the_same(self):
+        encoded = filepost.encode_multipart_formdata(self.fields,
+                                                     self.boundary)[0]
+        m = MultipartEncoder(self.fields, boundary=self.boundary)
+        assert m.len == len(encoded)
+        assert m.to_string() == encoded
+
+    def test_joins_runs_of_small_values(self):
+        m = MultipartEncoder(self.fields, boundary=self.boundary)
+        assert all(isinstance(p, InlinePart)
+                   for p in m._fields_parts[:40])
+        assert not isinstance(m._fields_parts[40], InlinePart)
+        assert len(m._units) == 3
+
+    def test_parts_are_part_objects(self):
+        m = MultipartEncoder(self.fields, boundary=self.boundary)
+        assert len(m.parts) == len(self.fields)
+        assert all(isinstance(p, Part) for p in m.parts)
+        assert m.parts[0].body.read() == b'value 0'
+        assert m.parts[40] is m._fields_parts[40]
+
+    def test_streams_and_rewinds(self):
+        expected = MultipartEncoder(self.fields, self.boundary).to_string()
+        m = MultipartEncoder(self.fields, boundary=self.boundary)
+        body = b''.join(iter(lambda: m.read(1000), b''))
+        assert body == expected
+        m.seek(5000)
+        assert m.read() == expected[5000:]
+
+
+class TestMultipartMixedEncoder(unittest.TestCase):
+    def setUp(self):
+        self.alternative = MultipartMixedEncoder(
+            [({'Content-Type': 'text/plain'}, 'Hello'),
+             ({'Content-Type': 'text/html'}, u'<p>Héllo</p>')],
+            boundary='alternative', subtype='alternative')
+        self.image = io.BytesIO(b'png' * 1000)
+        self.instance = MultipartMixedEncoder(
+            [({'Content-ID': '<body>'}, self.alternative),
+             ([('Content-Type', 'image/png')], self.image),
+             b'no headers'],
+            boundary='related', subtype='related',
+            parameters={'type': 'multipart/alternative'})
+
+    def test_content_type(self):
+        assert self.instance.content_type == (
+            'multipart/related; boundary=related; '
+            'type="multipart/alternative"'
+        )
+        assert MultipartMixedEncoder([], 'b').content_type == (
+            'multipart/mixed; boundary=b'
+        )
+
+    def test_to_string(self):
+        assert self.instance.to_string() == (
+            u'--related\r\n'
+            u'Content-ID: <body>\r\n'
+            u'Content-Type: multipart/alternative; boundary=alternative\r\n'
+            u'\r\n'
+            u'--alternative\r\n'
+            u'Content-Type: text/plain\r\n\r\n'
+            u'Hello\r\n'
+            u'--alternative\r\n'
+            u'Content-Type: text/html\r\n\r\n'
+            u'<p>Héllo</p>\r\n'
+            u'--alternative--\r\n'
+            u'\r\n'
+            u'--related\r\n'
+            u'Content-Type: image/png\r\n\r\n'
+            u'{}\r\n'
+            u'--related\r\n'
+            u'\r\n'
+            u'no headers\r\n'
+            u'--related--\r\n'
+        ).format(u'png' * 1000).encode('utf-8')
+
+    def test_streams_nested_encoders(self):
+        expected_len = self.instance.len
+        chunks = []
+        while True:
+            chunk = self.instance.read(100)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            assert self.instance._buffer.len <= 100
+        assert len(b''.join(chunks)) == expected_len
+
+    def test_rewinds_nested_encoders(self):
+        expected = self.instance.to_string()
+        assert self.instance.seekable()
+        assert self.instance.seek(0) == 0
+        assert self.instance.read() == expected
+        self.instance.seek(100)
+        assert self.instance.read() == expected[100:]
+
+    def test_nests_in_form_data(self):
+        m = MultipartEncoder([('files', self.alternative)], boundary='form')
+        assert m.to_string().startswith(
+            b'--form\r\n'
+            b'Content-Disposition: form-data; name="files"\r\n'
+            b'Content-Type: multipart/alternative; boundary=alternative\r\n'
+            b'\r\n'
+            b'--alternative\r\n'
+        )
+
+
+class TestMultipartEncoderDigests(unittest.TestCase):
+    def setUp(self):
+        self.fd = tempfile.TemporaryFile()
+        self.fd.write(b'file contents ' * 10000)
+        self.fd.seek(0)
+        self.large = b'b' * (INLINE_PART_SIZE + 1)
+        self.bodies = [b'value', self.large, b'file contents ' * 10000]
+        self.fields = [('field', 'value'),
+                       ('large', self.large),
+                       ('file', ('file.txt', self.fd, 'text/plain'))]
+        self.boundary = 'this-is-a-boundary'
+        self.expected = self.encoder().to_string()
+        self.fd.seek(0)
+
+    def tearDown(self):
+        self.fd.close()
+
+    def encoder(self, **kwargs):
+        return MultipartEncoder(self.fields, boundary=self.boundary,
+                                **kwargs)
+
+    def expected_digests(self, algorithm='sha256'):
+        return [hashlib.new(algorithm, body).digest() for body in self.bodies]
+
+    def test_no_digests_by_default(self):
+        m = self.encoder()
+        m.read()
+        assert m.digests is None
+        assert m.body_digest is None
+
+    def test_computes_digests_while_reading(self):
+        m = self.encoder(digest='sha256')
+        assert m.digests[2] is None
+        assert m.body_digest is None
+        body = m.read()
+        assert body == self.expected
+        assert m.digests == self.expected_digests()
+        assert m.body_digest == hashlib.sha256(body).digest()
+
+    def test_computes_digests_with_readinto(self):
+        m = self.encoder(digest=hashlib.md5)
+        body = readinto_all(m, 1000)
+        assert m.digests == self.expected_digests('md5')
+        assert m.body_digest == hashlib.md5(body).digest()
+
+    def test_computes_digests_with_iter_chunks(self):
+        m = self.encoder(digest='sha256')
+        body = b''.join(bytes(chunk) for chunk in m.iter_chunks(1000))
+        assert m.digests == self.expected_digests()
+        assert m.body_digest == hashlib.sha256(body).digest()
+
+    def test_partial_reads(self):
+        m = self.encoder(digest='sha256')
+        m.read(INLINE_PART_SIZE * 2)
+        assert m.digests[:2] == self.expected_digests()[:2]
+        assert m.digests[2] is None
+        assert m.body_digest is None
+
+    def test_resets_digests_when_rewound(self):
+        m = self.encoder(digest='sha256')
+        body = m.read(100000)
+        m.seek(0)
+        body = m.read()
+        assert m.digests == self.expected_digests()
+        assert m.body_digest == hashlib.sha256(body).digest()
+
+    def test_reads_the_bytes_it_seeks_over(self):
+        m = self.encoder(digest='sha256')
+        m.seek(m.len - 10)
+        m.read()
+        assert m.digests == self.expected_digests()
+        assert m.body_digest == hashlib.sha256(self.expected).digest()
+
+    def test_digest_headers(self):
+        m = self.encoder(digest='md5', digest_header='Content-MD5',
+                         digest_workers=1)
+        for job in m._digest_jobs:
+            assert job.done.wait(5)
+        assert m.digests == self.expected_digests('md5')
+
+        body = m.to_string()
+        assert len(body) == m.len
+        for digest in self.expected_digests('md5'):
+            header = b'Content-MD5: ' + base64.b64encode(digest) + b'\r\n'
+            assert body.count(header) == 1
+        assert body.endswith(b'file contents \r\n--this-is-a-boundary--\r\n')
+        m.seek(0)
+        assert m.read() == body
+
+    def test_digest_headers_of_mixed_parts(self):
+        m = MultipartMixedEncoder([b'abc', ({'X-Name': 'fd'}, self.fd)],
+                                  boundary=self.boundary, digest='sha256',
+                                  digest_header='Digest')
+        body = m.to_string()
+        assert len(body) == m.len
+        assert body.startswith(
+            b'--this-is-a-boundary\r\nDigest: ' +
+            base64.b64encode(hashlib.sha256(b'abc').digest()) +
+            b'\r\n\r\nabc\r\n--this-is-a-boundary\r\nX-Name: fd\r\n'
+            b'Digest: ' + base64.b64encode(self.expected_digests()[2]))
+
+    def test_digest_header_requires_a_digest(self):
+        with pytest.raises(ValueError):
+            self.encoder(digest_header='Content-MD5')
+
+    def test_digest_header_requires_seekable_bodies(self):
+        unseekable = LargeFileMock()
+        unseekable.bytes_max = 1000
+        with pytest.raises(ValueError):
+            MultipartEncoder({'file': unseekable}, digest='md5',
+                             digest_header='Content-MD5')
+
+    def test_raises_errors_of_digest_jobs(self):
+        m = self.encoder(digest='md5', digest_header='Content-MD5')
+        m._digest_jobs[0].done.wait(5)
+        m._digest_jobs[0].error = IOError('read error')
+        with pytest.raises(IOError):
+            m.read()
+
+
+class TestMultipartEncoderIterChunks(unittest.TestCase):
+    def setUp(self):
+        self.parts = [('field', 'value'), ('other_field', 'x' * 100)]
+        self.boundary = 'this-is-a-boundary'
+        self.expected = MultipartEncoder(self.parts, self.boundary).read()
+        self.instance = MultipartEncoder(self.parts, boundary=self.boundary)
+
+    def test_yields_blocks_of_the_requested_size(self):
+        chunks = list(self.instance.iter_chunks(16))
+        assert all(len(c) == 16 for c in chunks[:-1])
+        assert 0 < len(chunks[-1]) <= 16
+        assert b''.join(chunks) == self.expected
+
+    def test_default_block_size(self):
+        chunks = list(self.instance.iter_chunks())
+        assert len(chunks) == 1
+        assert chunks[0] == self.expected
+
+    def test_has_the_encoder_length(self):
+        assert self.instance.iter_chunks().len == self.instance.len
+
+    def test_rejects_invalid_block_sizes(self):
+        with pytest.raises(ValueError):
+            self.instance.iter_chunks(0)
+
+    def test_requests_sends_a_content_length(self):
+        chunks = self.instance.iter_chunks(16)
+        request = requests.Request(
+            'POST', 'http://example.com/', data=chunks,
+            headers={'Content-Type': chunks.content_type}).prepare()
+        assert request.headers['Content-Length'] == str(len(self.expected))
+        assert 'Transfer-Encoding' not in request.headers
+        assert request.headers['Content-Type'] == self.instance.content_type
+
+
+class TestMultipartEncoderSeek(unittest.TestCase):
+    def setUp(self):
+        self.boundary = 'this-is-a-boundary'
+        self.fd = open('setup.py', 'rb')
+        self.fd.read(10)
+        self.parts = [('field', 'value'),
+                      ('file', ('setup.py', self.fd, 'text/plain')),
+                      ('bytes', io.BytesIO(b'a' * 10000))]
+        self.instance = MultipartEncoder(self.parts, boundary=self.boundary)
+        self.expected = self.instance.read()
+        self.instance.seek(0)
+
+    def tearDown(self):
+        self.fd.close()
+
+    def test_tell(self):
+        assert self.instance.tell() == 0
+        self.instance.read(100)
+        assert self.instance.tell() == 100
+        self.instance.readinto(bytearray(50))
+        assert self.instance.tell() == 150
+        self.instance.read()
+        assert self.instance.tell() == self.instance.len
+
+    def test_rewinds_after_exhaustion(self):
+        assert self.instance.read() == self.expected
+        assert self.instance.seek(0) == 0
+        assert self.instance.read() == self.expected
+        assert self.instance.seek(0) == 0
+        assert readinto_all(self.instance, 1000) == self.expected
+
+    def test_seeks_to_a_position(self):
+        self.instance.read(500)
+        assert self.instance.seek(123) == 123
+        assert self.instance.read() == self.expected[123:]
+        assert self.instance.seek(-10, os.SEEK_END) == len(self.expected) - 10
+        assert self.instance.read() == self.expected[-10:]
+        self.instance.seek(5)
+        assert self.instance.seek(20, os.SEEK_CUR) == 25
+        assert self.instance.read(10) == self.expected[25:35]
+
+    def test_seeks_over_part_bodies(self):
+        class CountingBytesIO(io.BytesIO):
+            bytes_read = 0
+
+            def read(self, size=-1):
+                data = super(CountingBytesIO, self).read(size)
+                self.bytes_read += len(data)
+                return data
+
+            def readinto(self, buffer):
+                written = super(CountingBytesIO, self).readinto(buffer)
+                self.bytes_read += written
+                return written
+
+        body = CountingBytesIO(b'a' * 100000)
+        m = MultipartEncoder([('field', 'value'), ('file', body)],
+                             boundary=self.boundary)
+        expected = m.to_string()
+        m.seek(0)
+        body.bytes_read = 0
+        position = len(expected) - 5000
+        assert m.seek(position) == position
+        # The bytes before the position are sought over, not read
+        assert body.bytes_read < 5000
+        assert m.read() == expected[position:]
+
+    def test_rejects_invalid_positions(self):
+        with pytest.raises(ValueError):
+            self.instance.seek(-1)
+        with pytest.raises(ValueError):
+            self.instance.seek(0, 3)
+
+    def test_unseekable_parts(self):
+        unseekable = LargeFileMock()
+        unseekable.bytes_max = 1000
+        m = MultipartEncoder([('field', 'value'), ('file', unseekable)])
+        assert not m.seekable()
+        m.read(10)
+        assert m.seek(0) == 0
+        m.read(m.len - 10)
+        with pytest.raises(io.UnsupportedOperation):
+            m.seek(0)
+
+    def test_requests_rewinds_the_encoder(self):
+        request = requests.Request(
+            'POST', 'http://example.com/', data=self.instance,
+            headers={'Content-Type': self.instance.content_type}).prepare()
+        assert request.headers['Content-Length'] == str(len(self.expected))
+        assert self.instance.read() == self.expected
+        requests.utils.rewind_body(request)
+        assert self.instance.read() == self.expected
+
+
+def readinto_all(encoder, buffer_size):
+    buf = bytearray(buffer_size)
+    chunks = []
+    while True:
+        n = encoder.readinto(buf)
+        if not n:
+            break
+        chunks.append(bytes(buf[:n]))
+    return b''.join(chunks)
+
+
+class TestMultipartEncoderReadinto(unittest.TestCase):
+    def setUp(self):
+        self.boundary = 'this-is-a-boundary'
+
+    def fields(self, fd):
+        return [('field', 'value'),
+                ('file', ('setup.py', fd, 'text/plain')),
+                ('bytes', io.BytesIO(b'a' * 10000))]
+
+    def test_readinto_matches_read(self):
+        for buffer_size in (1, 7, 100, 8192, 1024 * 1024):
+            with open('setup.py', 'rb') as fd:
+                expected = MultipartEncoder(
+                    self.fields(fd), boundary=self.boundary).read()
+            with open('setup.py', 'rb') as fd:
+                m = MultipartEncoder(self.fields(fd), boundary=self.boundary)
+                assert readinto_all(m, buffer_size) == expected
+
+    def test_readinto_after_read(self):
+        with open('setup.py', 'rb') as fd:
+            expected = MultipartEncoder(
+                self.fields(fd), boundary=self.boundary).read()
+        with open('setup.py', 'rb') as fd:
+            m = MultipartEncoder(self.fields(fd), boundary=self.boundary)
+            start = m.read(50)
+            assert start + readinto_all(m, 8192) == expected
+
+    def test_readinto_no_parts(self):
+        m = MultipartEncoder([], boundary=self.boundary)
+        assert readinto_all(m, 8192) == b'--this-is-a-boundary--\r\n'
+
+    def test_readinto_large_file(self):
+        m = MultipartEncoder({'some file': LargeFileMock()})
+        total_size = m.len
+        buf = bytearray(1024 * 1024 * 128)
+        already_read = 0
+        while True:
+            n = m.readinto(buf)
+            if not n:
+                break
+            already_read += n
+
+        assert already_read == total_size
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
 import math
 import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
 from requests_toolbelt.multipart.encoder import (
     IDENTITY, MultipartEncoder, MultipartEncoderMonitor
     )
@@ -37,6 +42,35 @@ class TestMultipartEncoderMonitor(unittest.TestCase):
             pass
         assert callback.called == 5
 
+    def test_readinto(self):
+        new_encoder = MultipartEncoder(self.fields, self.boundary)
+        expected = new_encoder.read()
+        callback = Callback(self.monitor)
+        self.monitor.callback = callback
+        buf = bytearray(self.encoder.len)
+        assert self.monitor.readinto(buf) == len(expected)
+        assert bytes(buf) == expected
+        assert self.monitor.bytes_read == len(expected)
+        assert callback.called == 1
+
+    def test_iter_chunks(self):
+        new_encoder = MultipartEncoder(self.fields, self.boundary)
+        expected = new_encoder.read()
+        callback = Callback(self.monitor)
+        self.monitor.callback = callback
+        chunks = self.monitor.iter_chunks(10)
+        assert chunks.len == self.monitor.len
+        assert b''.join(chunks) == expected
+        assert callback.called == int(math.ceil(len(expected) / 10.0)) + 1
+
+    def test_seek(self):
+        expected = self.monitor.read()
+        assert self.monitor.tell() == self.monitor.len
+        assert self.monitor.seek(0) == 0
+        assert self.monitor.bytes_read == 0
+        assert self.monitor.read() == expected
+        assert self.monitor.bytes_read == len(expected)
+
     def test_bytes_read(self):
         bytes_to_read = self.encoder.len
         self.monitor.read()
@@ -55,6 +89,74 @@ class TestMultipartEncoderMonitor(unittest.TestCase):
         assert monitor.encoder.boundary_value == self.boundary
 
 
+class TestMultipartEncoderMonitorThrottling(unittest.TestCase):
+    def setUp(self):
+        self.encoder = MultipartEncoder({'a': 'b' * 10000}, 'thisisaboundary')
+        self.now = 100.0
+        patcher = mock.patch(
+            'requests_toolbelt.multipart.encoder._clock', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_min_bytes(self):
+        monitor = MultipartEncoderMonitor(self.encoder, min_bytes=1000)
+        callback = Callback(monitor)
+        monitor.callback = callback
+        while monitor.read(100):
+            pass
+        # Every 1000 bytes, then once everything has been read and on the
+        # last, empty, read
+        assert callback.called == monitor.len // 1000 + 2
+
+    def test_min_interval(self):
+        monitor = MultipartEncoderMonitor(self.encoder, min_interval=1)
+        callback = Callback(monitor)
+        monitor.callback = callback
+        for _ in range(10):
+            monitor.read(100)
+            self.now += 0.25
+        assert callback.called == 2
+
+    def test_min_bytes_and_min_interval(self):
+        monitor = MultipartEncoderMonitor(self.encoder, min_bytes=1000,
+                                          min_interval=1)
+        callback = Callback(monitor)
+        monitor.callback = callback
+        monitor.read(2000)
+        assert callback.called == 0
+        self.now += 1
+        monitor.read(100)
+        assert callback.called == 1
+        self.now += 1
+        monitor.read(100)
+        assert callback.called == 1
+
+    def test_statistics(self):
+        monitor = MultipartEncoderMonitor(self.encoder)
+        assert monitor.elapsed == 0
+        assert monitor.throughput == 0
+        assert monitor.eta is None
+
+        monitor.read(1000)
+        self.now += 1
+        monitor.read(1000)
+        self.now += 1
+        assert monitor.elapsed == 2
+        assert monitor.average_throughput == 1000
+        assert monitor.throughput == 2000
+        assert monitor.eta == (monitor.len - 2000) / 2000.0
+
+    def test_throughput_window(self):
+        class Monitor(MultipartEncoderMonitor):
+            throughput_window = 2
+
+        monitor = Monitor(self.encoder)
+        for size in (100, 100, 100, 1000):
+            monitor.read(size)
+            self.now += 1
+        assert monitor.throughput == 1000
+
+
 class Callback(object):
     def __init__(self, monitor):
         self.called = 0
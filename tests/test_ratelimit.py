@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""Tests for the TokenBucket and RateLimitedBody."""
+import threading
+import time
+import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import pytest
+import requests
+
+from requests_toolbelt import MultipartEncoder, StreamingIterator
+from requests_toolbelt.multipart.encoder import MultipartEncoderMonitor
+from requests_toolbelt.ratelimit import RateLimitedBody, TokenBucket
+
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        self.sleeps = []
+        for target, replacement in [
+                ('requests_toolbelt.ratelimit._clock', lambda: self.now),
+                ('time.sleep', self.sleeps.append)]:
+            patcher = mock.patch(target, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_rejects_invalid_rates(self):
+        with pytest.raises(ValueError):
+            TokenBucket(0)
+        bucket = TokenBucket(1000)
+        with pytest.raises(ValueError):
+            bucket.rate = -1
+
+    def test_rejects_invalid_bursts(self):
+        with pytest.raises(ValueError):
+            TokenBucket(1000, burst=-1)
+        bucket = TokenBucket(1000)
+        with pytest.raises(ValueError):
+            bucket.burst = 0
+        assert bucket.burst == 1000
+
+    def test_burst_defaults_to_the_rate(self):
+        bucket = TokenBucket(1000)
+        assert bucket.burst == 1000
+        assert bucket.consume(1000) == 0
+        assert self.sleeps == []
+
+    def test_waits_for_tokens(self):
+        bucket = TokenBucket(1000, burst=500)
+        assert bucket.consume(500) == 0
+        assert bucket.consume(250) == 0.25
+        # The 250 tokens reserved in advance are refilled first
+        self.now += 0.5
+        assert bucket.consume(1000) == 0.75
+        assert self.sleeps == [0.25, 0.75]
+
+    def test_refills_up_to_the_burst(self):
+        bucket = TokenBucket(1000, burst=500)
+        bucket.consume(500)
+        self.now += 10
+        assert bucket.consume(500) == 0
+        assert bucket.consume(100) == 0.1
+
+    def test_changes_the_rate(self):
+        bucket = TokenBucket(1000)
+        bucket.consume(1000)
+        bucket.rate = 100
+        assert bucket.rate == 100
+        assert bucket.consume(100) == 1
+
+    def test_changes_the_burst(self):
+        bucket = TokenBucket(1000)
+        bucket.burst = 100
+        assert bucket.burst == 100
+        assert bucket.consume(200) == 0.1
+
+    def test_threads_wait_in_turn(self):
+        bucket = TokenBucket(1000, burst=1000)
+        bucket.consume(1000)
+        threads = [threading.Thread(target=bucket.consume, args=(500,))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(self.sleeps) == [0.5, 1, 1.5, 2]
+
+
+class TestRateLimitedBody(unittest.TestCase):
+    def setUp(self):
+        self.fields = {'file': 'a' * 10000}
+        self.boundary = 'thisisaboundary'
+        self.expected = MultipartEncoder(self.fields, self.boundary).read()
+        self.bucket = mock.Mock(spec=TokenBucket)
+
+    def test_rate_limits_encoders(self):
+        encoder = MultipartEncoder(self.fields, self.boundary)
+        body = RateLimitedBody(encoder, self.bucket)
+        assert body.len == encoder.len
+        chunks = []
+        while True:
+            chunk = body.read(1000)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        assert b''.join(chunks) == self.expected
+        consumed = [c[0][0] for c in self.bucket.consume.call_args_list]
+        assert consumed == [len(chunk) for chunk in chunks] + [0]
+        assert body.tell() == len(self.expected)
+
+    def test_rate_limits_monitors(self):
+        monitor = MultipartEncoderMonitor.from_fields(self.fields,
+                                                      self.boundary)
+        body = RateLimitedBody(monitor, self.bucket)
+        buf = bytearray(len(self.expected))
+        assert body.readinto(buf) == len(self.expected)
+        assert bytes(buf) == self.expected
+        assert monitor.bytes_read == len(self.expected)
+        self.bucket.consume.assert_called_once_with(len(self.expected))
+
+    def test_rewinds_encoders(self):
+        body = RateLimitedBody(MultipartEncoder(self.fields, self.boundary),
+                               self.bucket)
+        body.read()
+        assert body.seekable()
+        assert body.seek(0) == 0
+        assert body.read() == self.expected
+
+    def test_rate_limits_streaming_iterators(self):
+        iterator = StreamingIterator(1000, iter([b'a' * 100] * 10))
+        body = RateLimitedBody(iterator, self.bucket)
+        assert body.len == 1000
+        assert body.tell() == 0
+        assert not body.seekable()
+        buf = bytearray(300)
+        assert body.readinto(buf) == 300
+        assert body.tell() == 300
+        self.bucket.consume.assert_called_once_with(300)
+
+    def test_requests_sends_a_content_length(self):
+        encoder = MultipartEncoder(self.fields, self.boundary)
+        request = requests.Request(
+            'POST', 'http://example.com', data=RateLimitedBody(
+                encoder, self.bucket)).prepare()
+        assert request.headers['Content-Length'] == str(len(self.expected))
+
+    def test_limits_the_rate(self):
+        bucket = TokenBucket(200 * 1000, burst=1000)
+        body = RateLimitedBody(MultipartEncoder(self.fields, self.boundary),
+                               bucket)
+        start = time.time()
+        while body.read(1000):
+            pass
+        # Everything but the burst is sent at 200kB/s
+        assert time.time() - start >= (len(self.expected) - 1000) / 200000.0
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""Tests for the SegmentedUpload against a stand-in upload server."""
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+import pytest
+import requests
+
+from requests_toolbelt import MultipartEncoder
+from requests_toolbelt.resumable import (
+    ContentRangeProtocol, SegmentedUpload, TusProtocol
+)
+
+
+class Upload(object):
+    """State of an upload on the stand-in server."""
+
+    def __init__(self, size):
+        self.data = bytearray(size)
+        self.received = bytearray(size)
+
+    @property
+    def offset(self):
+        """Number of contiguous bytes received from the start."""
+        index = self.received.find(b'\x00')
+        return len(self.received) if index == -1 else index
+
+    def store(self, offset, data):
+        self.data[offset:offset + len(data)] = data
+        self.received[offset:offset + len(data)] = b'\x01' * len(data)
+
+
+class UploadHandler(BaseHTTPRequestHandler):
+    """Serve resumable uploads with the Content-Range and tus protocols.
+
+    The server fails the requests whose number is in ``server.failures``
+    with a 503 after storing the first half of their body, and only stores
+    the first half of the body of those in ``server.partial``.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def _respond(self, status, headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _accept(self, upload, offset, body):
+        """Store the body, or what the server keeps of it.
+
+        :returns: bool -- ``False`` if the request failed
+        """
+        with self.server.lock:
+            self.server.requests += 1
+            number = self.server.requests
+        if number in self.server.failures:
+            upload.store(offset, body[:len(body) // 2])
+            self._respond(503)
+            return False
+        if number in self.server.partial:
+            body = body[:len(body) // 2]
+        upload.store(offset, body)
+        return True
+
+    def do_PUT(self):
+        body = self._body()
+        upload = self.server.uploads[self.path]
+        self.server.received += len(body)
+        match = re.match(r'bytes (\d+)-\d+/\d+',
+                         self.headers['Content-Range'])
+        if match:
+            offset = int(match.group(1))
+            if not self._accept(upload, offset, body):
+                return
+
+        offset = upload.offset
+        if offset == len(upload.data):
+            self._respond(201)
+        elif offset:
+            self._respond(308, [('Range', 'bytes=0-{}'.format(offset - 1))])
+        else:
+            self._respond(308)
+
+    def do_HEAD(self):
+        upload = self.server.uploads[self.path]
+        self._respond(200, [('Upload-Offset', str(upload.offset))])
+
+    def do_PATCH(self):
+        body = self._body()
+        upload = self.server.uploads[self.path]
+        self.server.received += len(body)
+        offset = int(self.headers['Upload-Offset'])
+        if offset != upload.offset:
+            self._respond(409)
+            return
+        if not self._accept(upload, offset, body):
+            return
+        self._respond(204, [('Upload-Offset', str(upload.offset))])
+
+    def log_message(self, *args):
+        pass
+
+
+class UploadServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class TestSegmentedUpload(unittest.TestCase):
+    def setUp(self):
+        self.server = UploadServer(('127.0.0.1', 0), UploadHandler)
+        self.server.uploads = {}
+        self.server.failures = set()
+        self.server.partial = set()
+        self.server.requests = 0
+        self.server.received = 0
+        self.server.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.session = requests.Session()
+        self.directory = tempfile.mkdtemp()
+
+        self.data = os.urandom(100 * 1000 + 7)
+        self.fields = [('field', 'value'),
+                       ('file', ('data.bin', io.BytesIO(self.data)))]
+
+    def tearDown(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def create(self, size):
+        self.server.uploads['/upload'] = Upload(size)
+        return 'http://127.0.0.1:{}/upload'.format(self.server.server_port)
+
+    def uploaded(self):
+        return bytes(self.server.uploads['/upload'].data)
+
+    def encoder(self):
+        return MultipartEncoder(self.fields, boundary='boundary')
+
+    def test_uploads_files(self):
+        fd = io.BytesIO(self.data)
+        url = self.create(len(self.data))
+        upload = SegmentedUpload(url, fd, session=self.session,
+                                 segment_size=10 * 1000)
+        r = upload.upload()
+        assert r.status_code == 201
+        assert upload.segments == 11
+        assert upload.completed == set(range(11))
+        assert self.uploaded() == self.data
+        assert self.server.received == len(self.data)
+
+    def test_uploads_encoders_in_parallel(self):
+        expected = self.encoder().to_string()
+        url = self.create(len(expected))
+        upload = SegmentedUpload(url, self.encoder(), session=self.session,
+                                 segment_size=7 * 1000, parallelism=4)
+        assert upload.upload().status_code == 201
+        assert self.uploaded() == expected
+
+    def test_uploads_with_tus(self):
+        expected = self.encoder().to_string()
+        url = self.create(len(expected))
+        upload = SegmentedUpload(url, self.encoder(), session=self.session,
+                                 segment_size=10 * 1000,
+                                 protocol=TusProtocol())
+        r = upload.upload()
+        assert r.headers['Upload-Offset'] == str(len(expected))
+        assert self.uploaded() == expected
+
+    def test_tus_does_not_support_parallel_segments(self):
+        with pytest.raises(ValueError):
+            SegmentedUpload('http://example.com', io.BytesIO(b'data'),
+                            parallelism=2, protocol=TusProtocol())
+
+    def test_resumes_from_the_server_offset(self):
+        for protocol in (ContentRangeProtocol(), TusProtocol()):
+            self.server.requests = 0
+            self.server.received = 0
+            self.server.failures = {3, 4}
+            url = self.create(len(self.data))
+            upload = SegmentedUpload(url, io.BytesIO(self.data),
+                                     session=self.session,
+                                     segment_size=20 * 1000,
+                                     protocol=protocol)
+            upload.upload()
+            assert self.uploaded() == self.data
+            # The halves of the failed segments the server stored are not
+            # sent again
+            assert self.server.received == len(self.data) + 10 * 1000 + 5000
+
+    def test_resumes_from_a_checkpoint(self):
+        checkpoint = os.path.join(self.directory, 'checkpoint')
+        expected = self.encoder().to_string()
+        url = self.create(len(expected))
+        self.server.failures = {5}
+        upload = SegmentedUpload(url, self.encoder(), session=self.session,
+                                 segment_size=10 * 1000, parallelism=2,
+                                 checkpoint=checkpoint, retries=0)
+        with pytest.raises(requests.HTTPError):
+            upload.upload()
+        assert os.path.exists(checkpoint)
+        # Which segment failed depends on the order of the parallel requests
+        assert len(upload.completed) < upload.segments
+
+        self.server.received = 0
+        upload = SegmentedUpload(url, self.encoder(), session=self.session,
+                                 segment_size=10 * 1000, parallelism=2,
+                                 checkpoint=checkpoint)
+        completed = set(upload.completed)
+        assert completed
+        assert upload.upload().status_code == 201
+        assert self.uploaded() == expected
+        assert not os.path.exists(checkpoint)
+        # Only the segments that were not uploaded were sent again
+        assert self.server.received <= len(expected) - 10 * 1000 * (
+            len(completed) - 1)
+
+    def test_ignores_checkpoints_of_other_uploads(self):
+        checkpoint = os.path.join(self.directory, 'checkpoint')
+        with open(checkpoint, 'w') as fd:
+            fd.write('{"url": "http://example.com", "size": 1, '
+                     '"segment_size": 1, "completed": [0]}')
+        url = self.create(len(self.data))
+        upload = SegmentedUpload(url, io.BytesIO(self.data),
+                                 session=self.session, checkpoint=checkpoint)
+        assert upload.completed == set()
+        upload.upload()
+        assert self.uploaded() == self.data
+
+    def test_recovers_segments_lost_by_the_server(self):
+        checkpoint = os.path.join(self.directory, 'checkpoint')
+        url = self.create(len(self.data))
+        upload = SegmentedUpload(url, io.BytesIO(self.data),
+                                 session=self.session, checkpoint=checkpoint,
+                                 segment_size=10 * 1000)
+        # The checkpoint claims segments the server does not have
+        upload.completed.update(range(5))
+        upload.upload()
+        assert self.uploaded() == self.data
+
+    def test_resends_the_rest_of_partly_stored_segments(self):
+        for protocol in (ContentRangeProtocol(), TusProtocol()):
+            self.server.requests = 0
+            self.server.received = 0
+            self.server.partial = {2}
+            url = self.create(len(self.data))
+            upload = SegmentedUpload(url, io.BytesIO(self.data),
+                                     session=self.session,
+                                     segment_size=20 * 1000,
+                                     protocol=protocol)
+            upload.upload()
+            assert self.uploaded() == self.data
+            # Only the half of the segment the server dropped is sent again
+            assert self.server.received == len(self.data) + 10 * 1000
+
+    def test_does_not_record_partly_stored_segments(self):
+        checkpoint = os.path.join(self.directory, 'checkpoint')
+        self.server.partial = {2}
+        url = self.create(len(self.data))
+        upload = SegmentedUpload(url, io.BytesIO(self.data),
+                                 session=self.session, segment_size=20 * 1000,
+                                 checkpoint=checkpoint, retries=0)
+        with pytest.raises(requests.HTTPError):
+            upload.upload()
+        assert upload.completed == {0}
+        with open(checkpoint) as fd:
+            assert json.load(fd)['completed'] == [0]
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""Tests for the SendfileAdapter."""
+import hashlib
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import pytest
+import requests
+
+from requests_toolbelt.adapters.sendfile import (
+    SendfileAdapter, SendfileHTTPConnection
+)
+from requests_toolbelt.multipart.encoder import (
+    LazyFileWrapper, MultipartEncoder, MultipartEncoderMonitor
+)
+
+
+class DigestHandler(BaseHTTPRequestHandler):
+    """Reply with the SHA-256 of the request body."""
+
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        digest = hashlib.sha256()
+        while length > 0:
+            chunk = self.rfile.read(min(length, 65536))
+            if not chunk:
+                break
+            digest.update(chunk)
+            length -= len(chunk)
+        body = digest.hexdigest().encode('ascii')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.mark.skipif(not hasattr(os, 'sendfile'),
+                    reason='os.sendfile is not available')
+class TestSendfileAdapter(unittest.TestCase):
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), DigestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:{}/'.format(self.server.server_port)
+
+        self.session = requests.Session()
+        self.session.mount('http://', SendfileAdapter())
+
+        self.file = tempfile.TemporaryFile()
+        self.file.write(os.urandom(256 * 1024 + 7))
+        self.file.seek(0)
+
+        self.boundary = 'this-is-a-boundary'
+
+    def tearDown(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.file.close()
+
+    def fields(self):
+        return [('field', 'value'),
+                ('file', ('random.bin', self.file, 'application/octet-stream')),
+                ('other_field', 'other_value')]
+
+    def expected_digest(self):
+        body = MultipartEncoder(self.fields(), self.boundary).to_string()
+        self.file.seek(0)
+        return hashlib.sha256(body).hexdigest()
+
+    def post(self, data):
+        return self.session.post(self.url, data=data,
+                                 headers={'Content-Type': data.content_type})
+
+    def test_sends_identical_bytes_using_sendfile(self):
+        expected = self.expected_digest()
+        encoder = MultipartEncoder(self.fields(), self.boundary)
+        with mock.patch.object(socket.socket, 'sendfile', autospec=True,
+                               side_effect=socket.socket.sendfile) as sendfile:
+            r = self.post(encoder)
+        assert r.text == expected
+        assert sendfile.call_count == 1
+
+    def test_sends_lazy_files_using_sendfile(self):
+        self.file.close()
+        self.file = tempfile.NamedTemporaryFile()
+        self.file.write(os.urandom(1000))
+        self.file.flush()
+        fields = [('field', 'value'),
+                  ('file', ('random.bin', LazyFileWrapper(self.file.name)))]
+        with open(self.file.name, 'rb') as fd:
+            expected = hashlib.sha256(MultipartEncoder(
+                [fields[0], ('file', ('random.bin', fd))],
+                self.boundary).to_string()).hexdigest()
+        encoder = MultipartEncoder(fields, self.boundary)
+        with mock.patch.object(socket.socket, 'sendfile', autospec=True,
+                               side_effect=socket.socket.sendfile) as sendfile:
+            r = self.post(encoder)
+        assert r.text == expected
+        assert sendfile.call_count == 1
+        assert encoder.parts[1].body._fd is None
+
+    def test_monitor_uses_buffered_path(self):
+        expected = self.expected_digest()
+        monitor = MultipartEncoderMonitor(
+            MultipartEncoder(self.fields(), self.boundary))
+        with mock.patch.object(socket.socket, 'sendfile', autospec=True,
+                               side_effect=socket.socket.sendfile) as sendfile:
+            r = self.post(monitor)
+        assert r.text == expected
+        assert sendfile.call_count == 0
+        assert monitor.bytes_read == monitor.len
+
+    def test_non_file_parts(self):
+        fields = [('field', 'value'), ('other_field', 'x' * 200000)]
+        expected = hashlib.sha256(
+            MultipartEncoder(fields, self.boundary).to_string()).hexdigest()
+        r = self.post(MultipartEncoder(fields, self.boundary))
+        assert r.text == expected
+
+    def test_stops_at_the_end_of_truncated_files(self):
+        encoder = MultipartEncoder(self.fields(), self.boundary)
+        self.file.truncate(1000)
+        connection = SendfileHTTPConnection('127.0.0.1')
+        connection.sock, receiver = socket.socketpair()
+        received = []
+
+        def receive():
+            while True:
+                chunk = receiver.recv(65536)
+                if not chunk:
+                    break
+                received.append(chunk)
+
+        reader = threading.Thread(target=receive)
+        reader.daemon = True
+        reader.start()
+        sender = threading.Thread(target=connection._send_encoder,
+                                  args=(encoder,))
+        sender.daemon = True
+        sender.start()
+        sender.join(5)
+        assert not sender.is_alive()
+        connection.sock.close()
+        reader.join(5)
+        receiver.close()
+
+        self.file.seek(0)
+        body = b''.join(received)
+        assert self.file.read() in body
+        assert body.endswith(b'other_value\r\n--this-is-a-boundary--\r\n')
@@ -66,3 +66,48 @@ class TestStreamingIteratorWithLargeChunks(object):
             bytes_read += len(b)
 
         assert bytes_read == self.size
+
+
+class TestStreamingIteratorReads(object):
+    def test_passes_chunks_of_the_requested_size_through(self):
+        chunks = [b'a' * 10, b'b' * 10]
+        uploader = StreamingIterator(20, iter(chunks))
+        assert uploader.read(10) is chunks[0]
+        assert uploader.read(10) is chunks[1]
+        assert uploader.read(10) == b''
+
+    def test_skips_empty_chunks(self):
+        uploader = StreamingIterator(6, iter([b'abc', b'', u'', b'def']))
+        assert uploader.read(4) == b'abcd'
+        assert uploader.read(4) == b'ef'
+
+    def test_read_all_includes_the_buffered_bytes(self):
+        uploader = StreamingIterator(9, iter([b'abcd', u'ef', b'ghi']))
+        assert uploader.read(2) == b'ab'
+        assert uploader.read() == b'cdefghi'
+
+    def test_readinto(self, get_iterable):
+        chunks = [b'a' * 5, b'b' * 20, b'c' * 3]
+        uploader = StreamingIterator(28, get_iterable(chunks))
+        buffer = bytearray(8)
+        data = b''
+        while True:
+            read = uploader.readinto(buffer)
+            if not read:
+                break
+            data += bytes(buffer[:read])
+        assert data == b''.join(chunks)
+
+    def test_readinto_and_read_share_the_buffer(self):
+        uploader = StreamingIterator(9, iter([b'abcd', b'efghi']))
+        assert uploader.read(2) == b'ab'
+        buffer = bytearray(5)
+        assert uploader.readinto(buffer) == 5
+        assert buffer == b'cdefg'
+        assert uploader.read(5) == b'hi'
+
+    def test_text_files_are_read_as_encoded_bytes(self):
+        uploader = StreamingIterator(8, io.StringIO(u'\xe9t\xe9 ok'))
+        assert uploader.read(3) == u'\xe9t'.encode('utf-8')
+        assert uploader.read(5) == u'\xe9 ok'.encode('utf-8')
+        assert uploader.read(5) == b''